@@ -1,15 +1,16 @@
 from ai_traineree import DEVICE
-from ai_traineree.agents.utils import hard_update, soft_update
+from ai_traineree.agents.utils import hard_update, scheduled_updates, soft_update
 from ai_traineree.buffers import ReplayBuffer
+from ai_traineree.flat_checkpoint import load_checkpoint
 from ai_traineree.networks import ActorBody, CriticBody
-from ai_traineree.noise import GaussianNoise
+from ai_traineree.noise import GaussianNoise, GaussianNoiseBank, OUNoiseBank
 from ai_traineree.types import AgentType
 
 import numpy as np
 import torch
 from torch.optim import Adam
 from torch.nn.functional import mse_loss
-from typing import Any, Sequence, Tuple
+from typing import Any, Dict, Sequence, Tuple
 
 
 class DDPGAgent(AgentType):
@@ -37,8 +38,19 @@ class DDPGAgent(AgentType):
         self.target_actor = ActorBody(state_size, action_size, hidden_layers=hidden_layers).to(self.device)
         self.target_critic = CriticBody(state_size, action_size, hidden_layers=hidden_layers).to(self.device)
 
-        # Noise sequence initiation
-        self.noise = GaussianNoise(shape=(action_size,), mu=1e-8, sigma=noise_sigma, scale=noise_scale, device=device)
+        # Optionally keep each network's parameters and gradients in single contiguous tensors
+        if bool(config.get('flat_parameters', False)):
+            for net in (self.actor, self.critic, self.target_actor, self.target_critic):
+                net.use_flat_storage()
+
+        # Noise sequence initiation. Banks generate blocks of noise directly on the device.
+        noise_type = config.get('noise_type', 'gaussian')
+        if noise_type == 'gaussian_bank':
+            self.noise = GaussianNoiseBank(shape=(action_size,), mu=1e-8, sigma=noise_sigma, scale=noise_scale, device=self.device)
+        elif noise_type == 'ou_bank':
+            self.noise = OUNoiseBank(shape=(action_size,), sigma=noise_sigma, scale=noise_scale, device=self.device)
+        else:
+            self.noise = GaussianNoise(shape=(action_size,), mu=1e-8, sigma=noise_sigma, scale=noise_scale, device=device)
 
         # Target sequence initiation
         hard_update(self.target_actor, self.actor)
@@ -50,6 +62,7 @@ class DDPGAgent(AgentType):
         self.action_min = clip[0]
         self.action_max = clip[1]
         self.action_scale = config.get('action_scale', 1)
+        self.fast_inference: bool = bool(config.get('fast_inference', False))
 
         self.gamma: float = float(config.get('gamma', 0.99))
         self.tau: float = float(config.get('tau', 0.02))
@@ -72,7 +85,7 @@ class DDPGAgent(AgentType):
         self.target_critic.reset_parameters()
 
     def act(self, obs, noise: float=0.0):
-        with torch.no_grad():
+        with torch.inference_mode() if self.fast_inference else torch.no_grad():
             obs = torch.tensor(obs.astype(np.float32)).to(self.device)
             action = self.actor(obs)
             action += noise*self.noise.sample()
@@ -95,6 +108,16 @@ class DDPGAgent(AgentType):
             for _ in range(self.number_updates):
                 self.learn(self.buffer.sample_sars())
 
+    def step_batch(self, states, actions, rewards, next_states, dones):
+        prev_iteration = self.iteration
+        self.iteration += len(states)
+        self.buffer.add_batch(state=states, action=actions, reward=rewards, next_state=next_states, done=dones)
+
+        if len(self.buffer) > self.batch_size:
+            num_triggers = scheduled_updates(prev_iteration, self.iteration, self.update_freq, self.warm_up)
+            for _ in range(num_triggers * self.number_updates):
+                self.learn(self.buffer.sample_sars())
+
     def learn(self, samples):
         """update the critics and actors of all the agents """
 
@@ -113,7 +136,7 @@ class DDPGAgent(AgentType):
         critic_loss = mse_loss(Q_expected, Q_target)
 
         # Minimize the loss
-        self.critic_optimizer.zero_grad()
+        self.critic.zero_grad()
         critic_loss.backward()
         # torch.nn.utils.clip_grad_norm_(self.critic.parameters(), self.gradient_clip)
         self.critic_optimizer.step()
@@ -122,7 +145,7 @@ class DDPGAgent(AgentType):
         # Compute actor loss
         pred_actions = self.actor(states)
         actor_loss = -self.critic(states, pred_actions).mean()
-        self.actor_optimizer.zero_grad()
+        self.actor.zero_grad()
         actor_loss.backward()
         self.actor_optimizer.step()
         self.actor_loss = actor_loss.item()
@@ -141,15 +164,17 @@ class DDPGAgent(AgentType):
         writer.add_scalar("loss/actor", self.actor_loss, episode)
         writer.add_scalar("loss/critic", self.critic_loss, episode)
 
-    def save_state(self, path: str):
-        agent_state = dict(
+    def get_state(self) -> Dict[str, Any]:
+        return dict(
             actor=self.actor.state_dict(), target_actor=self.target_actor.state_dict(),
             critic=self.critic.state_dict(), target_critic=self.target_critic.state_dict(),
         )
-        torch.save(agent_state, path)
+
+    def save_state(self, path: str):
+        torch.save(self.get_state(), path)
 
     def load_state(self, path: str):
-        agent_state = torch.load(path)
+        agent_state = load_checkpoint(path)
         self.actor.load_state_dict(agent_state['actor'])
         self.critic.load_state_dict(agent_state['critic'])
         self.target_actor.load_state_dict(agent_state['target_actor'])
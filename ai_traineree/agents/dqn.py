@@ -1,6 +1,7 @@
 from ai_traineree import DEVICE
-from ai_traineree.agents.utils import soft_update
+from ai_traineree.agents.utils import scheduled_updates, soft_update
 from ai_traineree.buffers import NStepBuffer, PERBuffer, ReplayBuffer
+from ai_traineree.flat_checkpoint import load_checkpoint
 from ai_traineree.networks import DuelingNet, QNetwork, NetworkType
 from ai_traineree.types import AgentType
 
@@ -8,9 +9,9 @@ import numpy as np
 import torch
 import torch.nn.functional as F
 import torch.optim as optim
-from torch.nn.utils import clip_grad_norm_
 
-from typing import Callable, Dict, Optional, Sequence, Union
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
 
 
 class DQNAgent(AgentType):
@@ -54,9 +55,11 @@ class DQNAgent(AgentType):
         self.iteration: int = 0
         self.buffer = PERBuffer(self.batch_size)
         self.using_double_q = bool(kwargs.get("using_double_q", False))
+        self.fast_inference = bool(kwargs.get("fast_inference", False))
 
         self.n_steps = kwargs.get("n_steps", 1)
         self.n_buffer = NStepBuffer(n_steps=self.n_steps, gamma=self.gamma)
+        self.n_buffers: List[NStepBuffer] = []  # One per parallel env when using `step_batch`
 
         self.state_transform = state_transform if state_transform is not None else lambda x: x
         self.reward_transform = reward_transform if reward_transform is not None else lambda x: x
@@ -67,6 +70,11 @@ class DQNAgent(AgentType):
             hidden_layers = kwargs.get('hidden_layers', hidden_layers)
             self.net = DuelingNet(self.state_size[0], self.action_size, hidden_layers=hidden_layers).to(self.device)
             self.target_net = DuelingNet(self.state_size[0], self.action_size, hidden_layers=hidden_layers).to(self.device)
+
+        # Optionally keep parameters and gradients in single contiguous tensors, e.g. for fused gradient clipping
+        if bool(kwargs.get('flat_parameters', False)):
+            self.net.use_flat_storage()
+            self.target_net.use_flat_storage()
         self.optimizer = optim.SGD(self.net.parameters(), lr=self.lr)
 
     def step(self, state, action, reward, next_state, done) -> None:
@@ -89,6 +97,38 @@ class DQNAgent(AgentType):
             for _ in range(self.number_updates):
                 self.learn(self.buffer.sample())
 
+    def step_batch(self, states, actions, rewards, next_states, dones, priorities=None) -> None:
+        """Adds N transitions at once, e.g. one from each parallel env.
+
+        Optional `priorities` are initial priorities of the transitions, e.g. from `compute_priorities`.
+        They're only supported for `n_steps` equal 1 when every transition goes straight to the buffer.
+        """
+        if priorities is not None and self.n_steps > 1:
+            raise ValueError("Initial priorities are only supported with `n_steps` equal 1")
+        prev_iteration = self.iteration
+        self.iteration += len(states)
+
+        while len(self.n_buffers) < len(states):
+            self.n_buffers.append(NStepBuffer(n_steps=self.n_steps, gamma=self.gamma))
+
+        experiences = defaultdict(list)
+        for (n_buffer, state, action, reward, next_state, done) in zip(self.n_buffers, states, actions, rewards, next_states, dones):
+            n_buffer.add(
+                state=self.state_transform(state), action=[action], reward=[self.reward_transform(reward)], done=[done],
+                next_state=self.state_transform(next_state),
+            )
+            if n_buffer.available:
+                for (key, value) in n_buffer.get().get_dict().items():
+                    experiences[key].append(value)
+
+        if len(experiences):
+            self.buffer.add_batch(priority=priorities, **experiences)
+
+        if len(self.buffer) > self.batch_size:
+            num_triggers = scheduled_updates(prev_iteration, self.iteration, self.update_freq, self.warm_up)
+            for _ in range(num_triggers * self.number_updates):
+                self.learn(self.buffer.sample())
+
     def act(self, state, eps: float = 0.) -> int:
         """Returns actions for given state as per current policy.
 
@@ -103,9 +143,26 @@ class DQNAgent(AgentType):
 
         state = self.state_transform(state)
         state = torch.from_numpy(state).float().unsqueeze(0).to(self.device)
-        action_values = self.net.act(state)
+        action_values = self.net.inference(state) if self.fast_inference else self.net.act(state)
         return np.argmax(action_values.cpu().data.numpy())
 
+    def compute_priorities(self, states, actions, rewards, next_states, dones) -> np.ndarray:
+        """Initial priorities for new transitions, on the same scale as priorities set in `learn`.
+
+        Uses only the online network, so that actors with a copy of it can compute them on their own.
+        """
+        with torch.no_grad():
+            states = torch.tensor(np.array([self.state_transform(s) for s in states]), dtype=torch.float32).to(self.device)
+            next_states = torch.tensor(np.array([self.state_transform(s) for s in next_states]), dtype=torch.float32).to(self.device)
+            rewards = torch.tensor([self.reward_transform(r) for r in rewards], dtype=torch.float32).to(self.device)
+            dones = torch.tensor(dones, dtype=torch.float32).to(self.device)
+            actions = torch.tensor(actions, dtype=torch.long).to(self.device)
+
+            Q_expected = self.net(states).gather(1, actions.view(-1, 1)).view(-1)
+            Q_targets = rewards + self.gamma * self.net(next_states).max(1)[0] * (1 - dones)
+            td_error = Q_expected - Q_targets + 1e-9  # Tiny offset for zero-div
+        return (1./td_error.abs()).cpu().numpy()
+
     def learn(self, experiences) -> None:
         rewards = torch.tensor(experiences['reward'], dtype=torch.float32).to(self.device)
         dones = torch.tensor(experiences['done']).type(torch.int).to(self.device)
@@ -125,9 +182,9 @@ class DQNAgent(AgentType):
 
         loss = F.mse_loss(Q_expected, Q_targets)
 
-        self.optimizer.zero_grad()
+        self.net.zero_grad()
         loss.backward()
-        clip_grad_norm_(self.net.parameters(), self.max_grad_norm)
+        self.net.clip_grad_norm_(self.max_grad_norm)
         self.optimizer.step()
         self.loss = loss.item()
 
@@ -147,11 +204,13 @@ class DQNAgent(AgentType):
         writer.add_scalar("loss/actor", self.actor_loss, episode)
         writer.add_scalar("loss/critic", self.critic_loss, episode)
 
+    def get_state(self) -> Dict[str, Any]:
+        return dict(net=self.net.state_dict(), target_net=self.target_net.state_dict())
+
     def save_state(self, path: str):
-        agent_state = dict(net=self.net.state_dict(), target_net=self.target_net.state_dict())
-        torch.save(agent_state, path)
+        torch.save(self.get_state(), path)
 
     def load_state(self, path: str):
-        agent_state = torch.load(path)
+        agent_state = load_checkpoint(path)
         self.net.load_state_dict(agent_state['net'])
         self.target_net.load_state_dict(agent_state['target_net'])
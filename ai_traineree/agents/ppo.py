@@ -2,17 +2,26 @@ from collections import defaultdict
 from ai_traineree import DEVICE
 from ai_traineree.networks import ActorBody, CriticBody
 from ai_traineree.types import AgentType
-from ai_traineree.policies import GaussianPolicy
+from ai_traineree.policies import DiagGaussianPolicy, GaussianPolicy, StochasticActorCritic
 import torch
 import torch.nn as nn
 
 import numpy as np
 
-from ai_traineree.agents.utils import revert_norm_returns
-from ai_traineree.buffers import ReplayBuffer
+from ai_traineree.agents.utils import revert_norm_returns_tensor
+from ai_traineree.buffers import RolloutBuffer
+from ai_traineree.flat_checkpoint import load_checkpoint
+from typing import Any, Dict
 
 
 class PPOAgent(AgentType):
+    """
+    Proximal Policy Optimization with a Gaussian policy on top of an action mean network.
+
+    By default the mean and the value come from separate networks, `actor` and `critic`, each with its own optimizer
+    (`actor_lr`, `critic_lr`). With `shared_trunk` both come from a single `actor_critic` network trained with one
+    joint loss and one optimizer (`actor_lr`); there's no `actor` nor `critic` attribute and setting `critic_lr` is an error.
+    """
 
     name = "PPO"
 
@@ -30,47 +39,71 @@ class PPOAgent(AgentType):
         self.ppo_ratio_clip: float = float(config.get("ppo_ratio_clip", 0.2))
 
         self.rollout_length: int = int(config.get("rollout_length", 48))  # "Much less than the episode length"
+        self.num_envs: int = int(config.get("num_envs", 1))
         self.batch_size: int = int(config.get("batch_size", self.rollout_length // 2))
         self.number_updates: int = int(config.get("number_updates", 5))
+        # Each update (epoch) goes through the whole rollout split into this many minibatches
+        default_minibatches = max(1, self.rollout_length * self.num_envs // self.batch_size)
+        self.num_minibatches: int = int(config.get("num_minibatches", default_minibatches))
         self.entropy_weight: float = float(config.get("entropy_weight", 0.0005))
         self.value_loss_weight: float = float(config.get("value_loss_weight", 1.0))
 
         self.local_memory_buffer = {}
-        self.memory = ReplayBuffer(batch_size=self.batch_size, buffer_size=self.rollout_length)
+        self.memory = RolloutBuffer(self.rollout_length, num_envs=self.num_envs, device=self.device)
 
         self.action_scale: float = float(config.get("action_scale", 1))
         self.action_min: float = float(config.get("action_min", -2))
         self.action_max: float = float(config.get("action_max", 2))
         self.max_grad_norm_actor: float = float(config.get("max_grad_norm_actor", 100.0))
         self.max_grad_norm_critic: float = float(config.get("max_grad_norm_critic", 100.0))
+        self.fast_inference: bool = bool(config.get("fast_inference", False))
 
         self.hidden_layers = config.get('hidden_layers', hidden_layers)
-        self.actor = ActorBody(state_size, action_size, self.hidden_layers).to(self.device)
-        self.critic = CriticBody(state_size, action_size, self.hidden_layers).to(self.device)
-        self.policy = GaussianPolicy(action_size).to(self.device)
-
-        self.actor_params = list(self.actor.parameters()) + [self.policy.std]
-        self.critic_params = self.critic.parameters()
-        self.actor_opt = torch.optim.SGD(self.actor_params, lr=self.actor_lr)
-        self.critic_opt = torch.optim.SGD(self.critic_params, lr=self.critic_lr)
-
-    def __clear_memory(self):
-        self.memory = ReplayBuffer(batch_size=self.batch_size, buffer_size=self.rollout_length)
-
-    def act(self, state, noise=0):
-        with torch.no_grad():
-            state = torch.tensor(state.reshape(1, -1).astype(np.float32)).to(self.device)
-            action_mu = self.actor(state)
-            value = self.critic(state, action_mu)
-
-            dist = self.policy(action_mu)
-            action = dist.sample()
-            logprob = dist.log_prob(action)
-
-            self.local_memory_buffer['value'] = value
-            self.local_memory_buffer['logprob'] = logprob
-
-            action = action.cpu().numpy().flatten()
+        if bool(config.get('diagonal_policy', False)):
+            self.policy = DiagGaussianPolicy(action_size, squash=bool(config.get('tanh_squash', False))).to(self.device)
+        else:
+            self.policy = GaussianPolicy(action_size).to(self.device)
+
+        # Shared trunk computes action mean and value in a single pass and is trained with a joint loss
+        self.shared_trunk: bool = bool(config.get("shared_trunk", False))
+        if self.shared_trunk:
+            if 'critic_lr' in config:
+                raise ValueError("Shared trunk is trained with a single optimizer using `actor_lr`; `critic_lr` isn't used")
+            self.actor_critic = StochasticActorCritic(state_size, action_size, self.hidden_layers, policy=self.policy).to(self.device)
+            self.actor_params = list(self.actor_critic.parameters())
+            self.actor_opt = torch.optim.SGD(self.actor_params, lr=self.actor_lr)
+        else:
+            self.actor = ActorBody(state_size, action_size, self.hidden_layers).to(self.device)
+            self.critic = CriticBody(state_size, action_size, self.hidden_layers).to(self.device)
+
+            self.actor_params = list(self.actor.parameters()) + [self.policy.std]
+            self.critic_params = list(self.critic.parameters())
+            self.actor_opt = torch.optim.SGD(self.actor_params, lr=self.actor_lr)
+            self.critic_opt = torch.optim.SGD(self.critic_params, lr=self.critic_lr)
+
+    def act(self, state, noise=0, deterministic: bool=False):
+        """Returns action for given state. A 2D `state` is treated as a batch of states from parallel envs.
+
+        With `deterministic` the action is the policy's mean, e.g. for evaluation, and isn't kept for the following `step`.
+        """
+        with torch.inference_mode() if self.fast_inference else torch.no_grad():
+            state = torch.tensor(np.asarray(state, dtype=np.float32).reshape(-1, self.state_size)).to(self.device)
+            if self.shared_trunk:
+                dist, value = self.actor_critic(state)
+            else:
+                action_mu = self.actor(state)
+                value = self.critic(state, action_mu)
+                dist = self.policy(action_mu)
+
+            if deterministic:
+                action = dist.mean
+            else:
+                action = dist.sample()
+                self.local_memory_buffer['value'] = value
+                self.local_memory_buffer['logprob'] = dist.log_prob(action)
+
+            action = action.cpu().numpy()
+            action = action.flatten() if state.shape[0] == 1 else action
             return np.clip(action*self.action_scale, self.action_min, self.action_max)
 
     def step(self, states, actions, rewards, next_state, done, **kwargs):
@@ -81,15 +114,36 @@ class PPOAgent(AgentType):
             logprob=self.local_memory_buffer['logprob'], value=self.local_memory_buffer['value']
         )
 
-        if self.iteration % self.rollout_length == 0:
+        if self.memory.full:
             self.update()
-            self.__clear_memory()
+            self.memory.clear()
+
+    def step_batch(self, states, actions, rewards, next_states, dones):
+        """Adds one step from each of `num_envs` parallel envs.
 
-    def ppo_iter(self, mini_batch_size, states, actions, log_probs, returns, advantage):
-        all_indices = np.arange(self.batch_size)
-        for _ in range(self.batch_size // mini_batch_size):
-            rand_ids = np.random.choice(all_indices, mini_batch_size, replace=False)
-            yield states[rand_ids], actions[rand_ids], log_probs[rand_ids], returns[rand_ids], advantage[rand_ids]
+        Expects that `act` was called with the whole batch of `states` just before.
+        The rollout consists of `rollout_length` steps of each env, i.e. `rollout_length * num_envs` env steps.
+        """
+        self.iteration += len(states)
+
+        self.memory.add(
+            state=states, action=actions, reward=rewards, done=dones,
+            logprob=self.local_memory_buffer['logprob'], value=self.local_memory_buffer['value'],
+        )
+
+        if self.memory.full:
+            self.update()
+            self.memory.clear()
+
+    def ppo_iter(self, *tensors):
+        """Yields `num_minibatches` minibatches which together cover the whole rollout once, in random order.
+
+        A single permutation is split into `num_minibatches` chunks whose sizes differ by at most one.
+        """
+        size = len(tensors[0])
+        permutation = torch.randperm(size, device=tensors[0].device)
+        for indices in permutation.tensor_split(self.num_minibatches):
+            yield tuple(tensor[indices] for tensor in tensors)
 
     def _unpack_experiences(self, experiences):
         unpacked_experiences = defaultdict(lambda: [])
@@ -104,30 +158,35 @@ class PPOAgent(AgentType):
         return unpacked_experiences
 
     def update(self):
-        experiences = self.memory.sample()
-        rewards = torch.tensor(experiences['reward']).to(self.device)
-        dones = torch.tensor(experiences['done']).type(torch.int).to(self.device)
-        states = torch.tensor(experiences['state']).to(self.device)
-        actions = torch.tensor(experiences['action']).to(self.device)
-        values = torch.cat(experiences['value'])
-        log_probs = torch.cat(experiences['logprob'])
+        # All experiences come in time order as [rollout_length, num_envs, F] tensors
+        experiences = self.memory.get()
+        rewards = experiences['reward'][..., 0]
+        dones = experiences['done'][..., 0]
+
+        returns = revert_norm_returns_tensor(rewards, dones, self.gamma, device=self.device).view(-1)
+        advantages = returns - experiences['value'].reshape(-1)
 
-        returns = revert_norm_returns(rewards, dones, self.gamma, device=self.device).unsqueeze(1)
-        advantages = returns - values
+        states = experiences['state'].reshape(-1, self.state_size)
+        actions = experiences['action'].reshape(-1, self.action_size)
+        log_probs = experiences['logprob'].reshape(-1)
 
         for _ in range(self.number_updates):
-            for samples in self.ppo_iter(self.batch_size, states, actions, log_probs, returns, advantages):
+            for samples in self.ppo_iter(states, actions, log_probs, returns, advantages):
                 self.learn(samples)
 
     def learn(self, samples):
         state, action, old_log_probs, return_, advantage = samples
 
-        action_mu = self.actor(state.detach())
-        dist = self.policy(action_mu)
-        value = self.critic(state.detach(), action_mu.detach())
+        if self.shared_trunk:
+            dist, value = self.actor_critic(state.detach())
+            value = value.view(-1)
+        else:
+            action_mu = self.actor(state.detach())
+            dist = self.policy(action_mu)
+            value = self.critic(state.detach(), action_mu.detach()).view(-1)
 
         entropy = dist.entropy()
-        new_log_probs = dist.log_prob(action.detach())
+        new_log_probs = dist.log_prob(action.detach()).view(-1)
 
         r_theta = (new_log_probs - old_log_probs).exp()
         r_theta_clip = torch.clamp(r_theta, 1.0 - self.ppo_ratio_clip, 1.0 + self.ppo_ratio_clip)
@@ -135,15 +194,23 @@ class PPOAgent(AgentType):
         policy_loss = -torch.min(r_theta * advantage, r_theta_clip * advantage).mean()
         entropy_loss = -self.entropy_weight * entropy.mean()
         actor_loss = policy_loss + entropy_loss
+        value_loss = self.value_loss_weight * 0.5 * (return_ - value).pow(2).mean()
+
+        if self.shared_trunk:
+            loss = actor_loss + value_loss
+            self.actor_opt.zero_grad()
+            loss.backward()
+            nn.utils.clip_grad_norm_(self.actor_params, self.max_grad_norm_actor)
+            self.actor_opt.step()
+            self.actor_loss = actor_loss.item()
+            self.critic_loss = value_loss.item()
+            return
 
         self.actor_opt.zero_grad()
         actor_loss.backward()
         nn.utils.clip_grad_norm_(self.actor_params, self.max_grad_norm_actor)
         self.actor_opt.step()
         self.actor_loss = actor_loss.item()
-        # loss = policy_loss + value_loss + entropy_loss
-
-        value_loss = self.value_loss_weight * 0.5 * (return_ - value).pow(2).mean()
 
         self.critic_opt.zero_grad()
         value_loss.backward()
@@ -155,10 +222,15 @@ class PPOAgent(AgentType):
         writer.add_scalar("loss/actor", self.actor_loss, episode)
         writer.add_scalar("loss/critic", self.critic_loss, episode)
 
+    def get_state(self) -> Dict[str, Any]:
+        """Policy and networks, i.e. `actor_critic` with `shared_trunk` and `actor` with `critic` otherwise."""
+        networks = ('actor_critic',) if self.shared_trunk else ('actor', 'critic')
+        return dict(policy=self.policy.state_dict(), **{name: getattr(self, name).state_dict() for name in networks})
+
     def save_state(self, path: str):
-        agent_state = dict(policy=self.policy.state_dict())
-        torch.save(agent_state, path)
+        torch.save(self.get_state(), path)
 
     def load_state(self, path: str):
-        agent_state = torch.load(path)
-        self.policy.load_state_dict(agent_state['policy'])
+        agent_state = load_checkpoint(path)
+        for (name, module_state) in agent_state.items():
+            getattr(self, name).load_state_dict(module_state)
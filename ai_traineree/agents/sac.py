@@ -1,17 +1,19 @@
 from ai_traineree import DEVICE
-from ai_traineree.agents.utils import hard_update, soft_update
+from ai_traineree.agents.utils import hard_update, scheduled_updates, soft_update
 from ai_traineree.buffers import ReplayBuffer as Buffer
-from ai_traineree.networks import ActorBody, DoubleCritic
-from ai_traineree.policies import GaussianPolicy
+from ai_traineree.flat_checkpoint import load_checkpoint
+from ai_traineree.networks import ActorBody, DoubleCritic, EnsembleCritic
+from ai_traineree.policies import DiagGaussianPolicy, GaussianPolicy
 from ai_traineree.types import AgentType
 
 import numpy as np
 import torch
+from functools import reduce
 from torch import optim
 # from torch.optim import AdamW, SGD
 from torch.nn.functional import mse_loss
 from torch.nn.utils import clip_grad_norm_
-from typing import Sequence, Tuple
+from typing import Any, Dict, Sequence, Tuple
 
 
 class SACAgent(AgentType):
@@ -37,11 +39,26 @@ class SACAgent(AgentType):
 
         # Reason sequence initiation.
         self.hidden_layers = kwargs.get('hidden_layers', hidden_layers)
-        self.policy = GaussianPolicy(action_size).to(self.device)
+        if bool(kwargs.get('diagonal_policy', False)):
+            self.policy = DiagGaussianPolicy(action_size, squash=bool(kwargs.get('tanh_squash', False))).to(self.device)
+        else:
+            self.policy = GaussianPolicy(action_size).to(self.device)
         self.actor = ActorBody(state_size, action_size, hidden_layers=hidden_layers).to(self.device)
 
-        self.double_critic = DoubleCritic(state_size, action_size, hidden_layers).to(self.device)
-        self.target_double_critic = DoubleCritic(state_size, action_size, hidden_layers).to(self.device)
+        # Optionally, e.g. for REDQ, more than two critics evaluated in one batched pass
+        critic_ensemble_size = kwargs.get('critic_ensemble_size')
+        if critic_ensemble_size is None:
+            self.double_critic = DoubleCritic(state_size, action_size, hidden_layers).to(self.device)
+            self.target_double_critic = DoubleCritic(state_size, action_size, hidden_layers).to(self.device)
+        else:
+            num_critics = int(critic_ensemble_size)
+            self.double_critic = EnsembleCritic(state_size, action_size, hidden_layers, num_critics=num_critics).to(self.device)
+            self.target_double_critic = EnsembleCritic(state_size, action_size, hidden_layers, num_critics=num_critics).to(self.device)
+
+        # Optionally keep each network's parameters and gradients in single contiguous tensors
+        if bool(kwargs.get('flat_parameters', False)):
+            for net in (self.actor, self.double_critic, self.target_double_critic):
+                net.use_flat_storage()
 
         # Target sequence initiation
         hard_update(self.target_double_critic, self.double_critic)
@@ -61,6 +78,7 @@ class SACAgent(AgentType):
         self.action_min = clip[0]
         self.action_max = clip[1]
         self.action_scale = kwargs.get('action_scale', 1)
+        self.fast_inference: bool = bool(kwargs.get('fast_inference', False))
         self.max_grad_norm_alpha: float = float(kwargs.get("max_grad_norm_alpha", 1.0))
         self.max_grad_norm_actor: float = float(kwargs.get("max_grad_norm_actor", 20.0))
         self.max_grad_norm_critic: float = float(kwargs.get("max_grad_norm_critic", 20.0))
@@ -102,12 +120,13 @@ class SACAgent(AgentType):
         if np.random.random() < epsilon:
             return np.clip(self.action_scale*np.random.random(size=self.action_size), self.action_min, self.action_max)
 
-        with torch.no_grad():
+        with torch.inference_mode() if self.fast_inference else torch.no_grad():
             state = torch.tensor(state.reshape(1, -1).astype(np.float32)).to(self.device)
-            action_mu = self.actor.act(state.detach())
+            action_mu = self.actor.inference(state) if self.fast_inference else self.actor.act(state.detach())
 
             if deterministic:
-                action = action_mu
+                # Distribution's mean, i.e. with `tanh_squash` it's squashed like the samples are
+                action = self.policy(action_mu).mean
             else:
                 action = self.policy(action_mu).sample()
 
@@ -127,6 +146,16 @@ class SACAgent(AgentType):
             for _ in range(self.number_updates):
                 self.learn(self.memory.sample())
 
+    def step_batch(self, states, actions, rewards, next_states, dones):
+        prev_iteration = self.iteration
+        self.iteration += len(states)
+        self.memory.add_batch(state=states, action=actions, reward=rewards, next_state=next_states, done=dones)
+
+        if len(self.memory) > self.batch_size:
+            num_triggers = scheduled_updates(prev_iteration, self.iteration, self.update_freq, self.warm_up)
+            for _ in range(num_triggers * self.number_updates):
+                self.learn(self.memory.sample())
+
     def _update_value_function(self, states, actions, rewards, next_states, dones):
         # critic loss
         action_mu = self.actor(next_states)
@@ -136,18 +165,17 @@ class SACAgent(AgentType):
         log_prob = dist.log_prob(next_actions).unsqueeze(1)
 
         with torch.no_grad():
-            Q_target_next, Q2_target_next = self.double_critic.act(next_states, next_actions)
-            V_target = torch.min(Q_target_next, Q2_target_next) - self.alpha * log_prob
+            Q_target_next = reduce(torch.min, self.double_critic.act(next_states, next_actions))
+            V_target = Q_target_next - self.alpha * log_prob
             Q_target = rewards + self.gamma * V_target * (1 - dones)
             Q_target = Q_target.type(torch.float32)
 
-        Q_expected, Q2_expected = self.double_critic(states, actions)
-        critic_loss = mse_loss(Q_expected, Q_target) + mse_loss(Q2_expected, Q_target)
+        critic_loss = sum(mse_loss(Q_expected, Q_target) for Q_expected in self.double_critic(states, actions))
 
         # Minimize the loss
-        self.critic_optimizer.zero_grad()
+        self.double_critic.zero_grad()
         critic_loss.backward()
-        clip_grad_norm_(self.critic_params, self.max_grad_norm_critic)
+        self.double_critic.clip_grad_norm_(self.max_grad_norm_critic)
         self.critic_optimizer.step()
         self.critic_loss = critic_loss.item()
 
@@ -158,11 +186,13 @@ class SACAgent(AgentType):
         pred_actions = dist.rsample()
         log_prob = dist.log_prob(pred_actions).unsqueeze(1)
 
-        Q_actor = torch.min(*self.double_critic(states, pred_actions))
+        Q_actor = reduce(torch.min, self.double_critic(states, pred_actions))
         actor_loss = (self.alpha * log_prob - Q_actor).mean()
 
-        self.actor_optimizer.zero_grad()
+        self.actor.zero_grad()
+        self.policy.zero_grad()
         actor_loss.backward()
+        # Actor's params include policy's std, so they're clipped together rather than through the actor alone
         clip_grad_norm_(self.actor_params, self.max_grad_norm_actor)
         self.actor_optimizer.step()
         self.actor_loss = actor_loss.item()
@@ -192,21 +222,24 @@ class SACAgent(AgentType):
     def log_writer(self, writer, episode):
         writer.add_scalar("loss/actor", self.actor_loss, episode)
         writer.add_scalar("loss/critic", self.critic_loss, episode)
-        writer.add_scalar("loss/alpha", self.alpha, episode)
 
-        for idx, std in enumerate(self.policy.std):
+        # Tensors are passed as they are; `MetricsWriter` converts them on its thread without syncing the device here
+        writer.add_scalar("loss/alpha", self.alpha.detach(), episode)
+        for idx, std in enumerate(self.policy.std.detach().view(-1)):
             writer.add_scalar(f"policy/std_{idx}", std, episode)
 
-    def save_state(self, path: str):
-        agent_state = dict(
+    def get_state(self) -> Dict[str, Any]:
+        return dict(
             actor=self.actor.state_dict(),
             double_critic=self.double_critic.state_dict(),
             target_double_critic=self.target_double_critic.state_dict(),
         )
-        torch.save(agent_state, path)
+
+    def save_state(self, path: str):
+        torch.save(self.get_state(), path)
 
     def load_state(self, path: str):
-        agent_state = torch.load(path)
+        agent_state = load_checkpoint(path)
         self.actor.load_state_dict(agent_state['actor'])
         self.double_critic.load_state_dict(agent_state['double_critic'])
         self.target_double_critic.load_state_dict(agent_state['target_double_critic'])
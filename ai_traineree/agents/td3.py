@@ -1,15 +1,17 @@
 from ai_traineree import DEVICE
-from ai_traineree.agents.utils import hard_update, soft_update
+from ai_traineree.agents.utils import hard_update, scheduled_updates, soft_update
 from ai_traineree.buffers import ReplayBuffer
-from ai_traineree.networks import ActorBody, DoubleCritic
-from ai_traineree.noise import GaussianNoise
+from ai_traineree.flat_checkpoint import load_checkpoint
+from ai_traineree.networks import ActorBody, DoubleCritic, EnsembleCritic
+from ai_traineree.noise import GaussianNoise, GaussianNoiseBank, OUNoiseBank
 from ai_traineree.types import AgentType
 
 import numpy as np
 import torch
+from functools import reduce
 from torch.optim import SGD
 from torch.nn.functional import mse_loss
-from typing import Any, Sequence, Tuple
+from typing import Any, Dict, Sequence, Tuple
 
 
 class TD3Agent(AgentType):
@@ -33,12 +35,31 @@ class TD3Agent(AgentType):
         # Reason sequence initiation.
         self.hidden_layers = config.get('hidden_layers', hidden_layers)
         self.actor = ActorBody(state_size, action_size, hidden_layers=hidden_layers).to(self.device)
-        self.critic = DoubleCritic(state_size, action_size, hidden_layers=hidden_layers).to(self.device)
         self.target_actor = ActorBody(state_size, action_size, hidden_layers=hidden_layers).to(self.device)
-        self.target_critic = DoubleCritic(state_size, action_size, hidden_layers=hidden_layers).to(self.device)
 
-        # Noise sequence initiation
-        self.noise = GaussianNoise(shape=(action_size,), mu=1e-8, sigma=noise_sigma, scale=noise_scale, device=device)
+        # Optionally, more than two critics evaluated in one batched pass
+        critic_ensemble_size = config.get('critic_ensemble_size')
+        if critic_ensemble_size is None:
+            self.critic = DoubleCritic(state_size, action_size, hidden_layers=hidden_layers).to(self.device)
+            self.target_critic = DoubleCritic(state_size, action_size, hidden_layers=hidden_layers).to(self.device)
+        else:
+            num_critics = int(critic_ensemble_size)
+            self.critic = EnsembleCritic(state_size, action_size, hidden_layers, num_critics=num_critics).to(self.device)
+            self.target_critic = EnsembleCritic(state_size, action_size, hidden_layers, num_critics=num_critics).to(self.device)
+
+        # Optionally keep each network's parameters and gradients in single contiguous tensors
+        if bool(config.get('flat_parameters', False)):
+            for net in (self.actor, self.critic, self.target_actor, self.target_critic):
+                net.use_flat_storage()
+
+        # Noise sequence initiation. Banks generate blocks of noise directly on the device.
+        noise_type = config.get('noise_type', 'gaussian')
+        if noise_type == 'gaussian_bank':
+            self.noise = GaussianNoiseBank(shape=(action_size,), mu=1e-8, sigma=noise_sigma, scale=noise_scale, device=self.device)
+        elif noise_type == 'ou_bank':
+            self.noise = OUNoiseBank(shape=(action_size,), sigma=noise_sigma, scale=noise_scale, device=self.device)
+        else:
+            self.noise = GaussianNoise(shape=(action_size,), mu=1e-8, sigma=noise_sigma, scale=noise_scale, device=device)
 
         # Target sequence initiation
         hard_update(self.target_actor, self.actor)
@@ -50,6 +71,7 @@ class TD3Agent(AgentType):
         self.action_min = clip[0]
         self.action_max = clip[1]
         self.action_scale = config.get('action_scale', 1)
+        self.fast_inference: bool = bool(config.get('fast_inference', False))
 
         self.gamma: float = float(config.get('gamma', 0.99))
         self.tau: float = float(config.get('tau', 0.02))
@@ -73,7 +95,7 @@ class TD3Agent(AgentType):
         self.target_critic.reset_parameters()
 
     def act(self, obs, noise: float=0.0):
-        with torch.no_grad():
+        with torch.inference_mode() if self.fast_inference else torch.no_grad():
             obs = torch.tensor(obs.astype(np.float32)).to(self.device)
             action = self.actor(obs)
             action += noise*self.noise.sample()
@@ -98,6 +120,16 @@ class TD3Agent(AgentType):
                 #       Every `update_policy_freq` it will learn `number_updates` times.
                 self.learn(self.buffer.sample_sars())
 
+    def step_batch(self, states, actions, rewards, next_states, dones):
+        prev_iteration = self.iteration
+        self.iteration += len(states)
+        self.buffer.add_batch(state=states, action=actions, reward=rewards, next_state=next_states, done=dones)
+
+        if len(self.buffer) > self.batch_size:
+            num_triggers = scheduled_updates(prev_iteration, self.iteration, self.update_freq, self.warm_up)
+            for _ in range(num_triggers * self.number_updates):
+                self.learn(self.buffer.sample_sars())
+
     def learn(self, samples):
         """update the critics and actors of all the agents """
 
@@ -119,13 +151,12 @@ class TD3Agent(AgentType):
     def _update_value_function(self, states, actions, rewards, next_states, dones):
         # critic loss
         next_actions = self.target_actor.act(next_states)
-        Q_target_next = torch.min(*self.target_critic.act(next_states, next_actions))
+        Q_target_next = reduce(torch.min, self.target_critic.act(next_states, next_actions))
         Q_target = rewards + (self.gamma * Q_target_next * (1 - dones))
-        Q1_expected, Q2_expected = self.critic(states, actions)
-        critic_loss = mse_loss(Q1_expected, Q_target) + mse_loss(Q2_expected, Q_target)
+        critic_loss = sum(mse_loss(Q_expected, Q_target) for Q_expected in self.critic(states, actions))
 
         # Minimize the loss
-        self.critic_optimizer.zero_grad()
+        self.critic.zero_grad()
         critic_loss.backward()
         # torch.nn.utils.clip_grad_norm_(self.critic.parameters(), self.gradient_clip)
         self.critic_optimizer.step()
@@ -135,7 +166,7 @@ class TD3Agent(AgentType):
         # Compute actor loss
         pred_actions = self.actor(states)
         actor_loss = -self.critic(states, pred_actions)[0].mean()
-        self.actor_optimizer.zero_grad()
+        self.actor.zero_grad()
         actor_loss.backward()
         self.actor_optimizer.step()
         self.actor_loss = actor_loss.item()
@@ -151,15 +182,17 @@ class TD3Agent(AgentType):
         writer.add_scalar("loss/actor", self.actor_loss, episode)
         writer.add_scalar("loss/critic", self.critic_loss, episode)
 
-    def save_state(self, path: str):
-        agent_state = dict(
+    def get_state(self) -> Dict[str, Any]:
+        return dict(
             actor=self.actor.state_dict(), target_actor=self.target_actor.state_dict(),
             critic=self.critic.state_dict(), target_critic=self.target_critic.state_dict(),
         )
-        torch.save(agent_state, path)
+
+    def save_state(self, path: str):
+        torch.save(self.get_state(), path)
 
     def load_state(self, path: str):
-        agent_state = torch.load(path)
+        agent_state = load_checkpoint(path)
         self.actor.load_state_dict(agent_state['actor'])
         self.critic.load_state_dict(agent_state['critic'])
         self.target_actor.load_state_dict(agent_state['target_actor'])
@@ -1,18 +1,64 @@
 import torch
 import torch.nn as nn
 
+from ai_traineree.utils import discounted_scan
 from typing import List
 
+# Agents' attributes with networks used for acting, i.e. those needed by `act` but not by `learn` alone
+ACTING_MODULES = ('net', 'actor', 'actor_critic', 'policy')
 
+
+def acting_modules(agent) -> List[nn.Module]:
+    """Returns agent's networks which are used in `act`, e.g. a Q-network, or an actor and its policy."""
+    modules = (getattr(agent, name, None) for name in ACTING_MODULES)
+    return [module for module in modules if isinstance(module, nn.Module)]
+
+
+@torch.no_grad()
 def soft_update(target: nn.Module, source: nn.Module, tau: float) -> None:
-    for target_param, param in zip(target.parameters(), source.parameters()):
-        target_param.data.copy_(target_param.data * (1.0 - tau) + param.data * tau)  # type: ignore
+    """Polyak averaging, i.e. `target = (1 - tau) * target + tau * source`, done in-place.
+
+    All parameters are updated with fused multi-tensor kernels so there are no per-tensor temporaries.
+    Networks with flat storage (see `NetworkType.use_flat_storage`) are updated with a single vector operation.
+    """
+    target_flat = getattr(target, "flat_params", None)
+    source_flat = getattr(source, "flat_params", None)
+    if target_flat is not None and source_flat is not None and target_flat.shape == source_flat.shape:
+        target_flat.mul_(1.0 - tau).add_(source_flat, alpha=tau)
+        return
 
+    target_params = list(target.parameters())
+    source_params = list(source.parameters())
+    torch._foreach_mul_(target_params, 1.0 - tau)
+    torch._foreach_add_(target_params, source_params, alpha=tau)
 
+
+@torch.no_grad()
 def hard_update(target: nn.Module, source: nn.Module):
     """Updates one network based on another."""
-    for target_param, param in zip(target.parameters(), source.parameters()):
-        target_param.data.copy_(param.data)  # type: ignore
+    target_flat = getattr(target, "flat_params", None)
+    source_flat = getattr(source, "flat_params", None)
+    if target_flat is not None and source_flat is not None and target_flat.shape == source_flat.shape:
+        target_flat.copy_(source_flat)
+        return
+
+    target_params = list(target.parameters())
+    source_params = list(source.parameters())
+    if hasattr(torch, "_foreach_copy_"):
+        torch._foreach_copy_(target_params, source_params)
+    else:
+        for target_param, param in zip(target_params, source_params):
+            target_param.copy_(param)
+
+
+def scheduled_updates(prev_iteration: int, iteration: int, update_freq: int, warm_up: int=0) -> int:
+    """Number of learning triggers between `prev_iteration` (exclusive) and `iteration` (inclusive).
+
+    A trigger is every iteration which is a multiple of `update_freq` and isn't below `warm_up`.
+    Counting this way keeps the same replay ratio whether iterations come one by one or in batches.
+    """
+    prev_iteration = max(prev_iteration, warm_up - 1)
+    return max(0, iteration // update_freq - prev_iteration // update_freq)
 
 
 def to_np(t):
@@ -40,3 +86,22 @@ def revert_norm_returns(rewards, dones, gamma=0.99, device=None) -> torch.Tensor
     t_returns = torch.tensor(returns, device=device)
     t_returns = (t_returns - t_returns.mean()) / (t_returns.std() + 1e-8)
     return t_returns
+
+
+def compute_gae_tensor(next_value, rewards, masks, values, gamma=0.99, tau=0.95) -> torch.Tensor:
+    """Tensor version of `compute_gae`. Returns `advantages + values` as a tensor shaped like `values`.
+
+    `rewards`, `masks` (0 where the episode ended) and `values` are of shape [T] or [T, N],
+    and `next_value` is the value of the state following the last step, of shape [] or [N].
+    """
+    next_values = torch.cat((values[1:], torch.as_tensor(next_value, dtype=values.dtype, device=values.device).unsqueeze(0)))
+    deltas = rewards + gamma * next_values * masks - values
+    return discounted_scan(deltas, gamma * tau * masks) + values
+
+
+def revert_norm_returns_tensor(rewards, dones, gamma=0.99, device=None) -> torch.Tensor:
+    """Tensor version of `revert_norm_returns`. Accepts sequences or tensors of shape [T] or [T, N]."""
+    t_rewards = torch.as_tensor(rewards, dtype=torch.float32, device=device)
+    masks = 1 - torch.as_tensor(dones, dtype=torch.float32, device=t_rewards.device)
+    t_returns = discounted_scan(t_rewards, gamma * masks)
+    return (t_returns - t_returns.mean()) / (t_returns.std() + 1e-8)
@@ -0,0 +1,109 @@
+import copy
+import time
+import torch.nn as nn
+
+from ai_traineree.agents.utils import ACTING_MODULES, acting_modules
+from ai_traineree.shared_weights import SharedWeights
+from ai_traineree.types import AgentType
+from ai_traineree.utils import QueueWorker
+
+from typing import Optional
+
+
+class BackgroundLearner:
+    """
+    Trains an off-policy agent on a background thread while the caller keeps interacting with the environment.
+
+    Transitions passed to `step` are queued and the learner thread hands them, in order, to `agent.step`,
+    so the agent fills its buffer and learns exactly as it would when stepped serially. Actions come from
+    `act` which uses a copy of the agent's acting networks. The learner publishes its weights with
+    `SharedWeights` after every `publish_every` transitions and the copy pulls them every `sync_every` steps.
+    Torch releases the GIL in its kernels so environment steps and gradient updates overlap.
+
+    Only the learner thread modifies the agent, so it shouldn't be used directly until `flush` or `stop`.
+    On-policy agents, e.g. PPO, are rejected. They keep outputs of `act`, like log probabilities and values,
+    in `local_memory_buffer` for the following `step`, and that doesn't hold when acting runs ahead of learning.
+
+    >>> learner = BackgroundLearner(agent)
+    >>> learner.start()
+    >>> action = learner.act(state, eps)
+    >>> learner.step(state, action, reward, next_state, done)
+    >>> learner.stop()
+    """
+
+    def __init__(self, agent: AgentType, queue_size: int=1000, publish_every: int=10, sync_every: int=10):
+        if hasattr(agent, 'local_memory_buffer'):
+            raise ValueError(f"Background learning is only supported for off-policy agents, but got {agent.name} agent")
+        self.agent = agent
+        self.publish_every = publish_every
+        self.sync_every = sync_every
+
+        # Shallow copy shares everything with the agent apart from the networks used in `act`
+        self.acting_agent = copy.copy(agent)
+        for name in ACTING_MODULES:
+            module = getattr(agent, name, None)
+            if isinstance(module, nn.Module):
+                setattr(self.acting_agent, name, copy.deepcopy(module))
+        self.acting_modules = acting_modules(self.acting_agent)
+        self.shared_weights = SharedWeights(acting_modules(agent))
+
+        self.worker = QueueWorker(self._learn, name="BackgroundLearner", error_message="Background learner has failed", queue_size=queue_size)
+        self.steps = 0
+        self._processed = 0
+
+        # Time spent in `agent.step` by the learner
+        self.learn_time = 0.
+
+    @property
+    def wait_time(self) -> float:
+        """Time, in seconds, the caller waited on a full queue."""
+        return self.worker.wait_time
+
+    @property
+    def time_saved(self) -> float:
+        """Estimated wall time, in seconds, saved compared to stepping the agent serially.
+
+        Serially each `agent.step` would block interaction. In the background it only does when the
+        queue is full, so the saved time is the time spent learning minus the time the caller waited.
+        It's an upper bound since both threads competing for the GIL makes learning itself slower.
+        """
+        return self.learn_time - self.wait_time
+
+    def start(self) -> None:
+        self.worker.start()
+
+    def sync(self) -> None:
+        """Pulls the latest published weights into the acting copy."""
+        self.shared_weights.pull(self.acting_modules)
+
+    def act(self, state, *args, **kwargs):
+        if self.steps % self.sync_every == 0:
+            self.sync()
+        return self.acting_agent.act(state, *args, **kwargs)
+
+    def step(self, state, action, reward, next_state, done, number_updates: Optional[int]=None) -> None:
+        """Queues the transition. With `number_updates` the agent's `number_updates` is set to it just before its step."""
+        self.worker.put(((state, action, reward, next_state, done), number_updates))
+        self.steps += 1
+
+    def flush(self) -> None:
+        """Blocks until all queued transitions are processed by the agent."""
+        self.worker.join()
+
+    def stop(self) -> None:
+        """Processes all queued transitions and stops the learner thread."""
+        try:
+            self.flush()
+        finally:
+            self.worker.close()
+
+    def _learn(self, transition) -> None:
+        (experience, number_updates) = transition
+        if number_updates is not None:
+            self.agent.number_updates = number_updates
+        t_start = time.perf_counter()
+        self.agent.step(*experience)
+        self.learn_time += time.perf_counter() - t_start
+        self._processed += 1
+        if self._processed % self.publish_every == 0:
+            self.shared_weights.publish(acting_modules(self.agent))
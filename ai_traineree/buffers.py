@@ -1,3 +1,4 @@
+import copy
 import math
 import numpy as np
 import random
@@ -43,9 +44,16 @@ class BufferBase(object):
     def add(self, **kwargs):
         raise NotImplementedError("You shouldn't see this. Look away. Or fix it.")
 
+    def add_batch(self, **kwargs):
+        raise NotImplementedError("You shouldn't see this. Look away. Or fix it.")
+
     def sample(self, *args, **kwargs) -> Optional[List[Experience]]:
         raise NotImplementedError("You shouldn't see this. Look away. Or fix it.")
 
+    def snapshot(self) -> 'BufferBase':
+        """Copy which doesn't change when the buffer does, e.g. for writing a checkpoint in the background."""
+        return copy.deepcopy(self)
+
     @staticmethod
     def convert_float(x):
         return torch.from_numpy(np.vstack(x)).float()
@@ -117,6 +125,19 @@ class ReplayBuffer(BufferBase):
     def add(self, **kwargs):
         self.exp.append(Experience(**kwargs))
 
+    def snapshot(self) -> 'ReplayBuffer':
+        """Experiences aren't modified once added so the copy shares them and only the deques are copied."""
+        buffer = copy.copy(self)
+        for (name, value) in vars(self).items():
+            if isinstance(value, deque):
+                setattr(buffer, name, copy.copy(value))
+        return buffer
+
+    def add_batch(self, **kwargs):
+        """Adds N experiences at once. Each named property is expected to be a sequence of length N."""
+        keys = list(kwargs.keys())
+        self.exp.extend(Experience(**dict(zip(keys, values))) for values in zip(*kwargs.values()))
+
     def add_sars(self, *, state=None, action=None, reward=None, next_state=None, done=None) -> None:
         """Adds (State, Actiom, Reward, State) to the buffer. Expects these arguments to be named properties."""
         self.exp.append(Experience(state=state, action=action, reward=reward, next_state=next_state, done=done))
@@ -151,6 +172,61 @@ class ReplayBuffer(BufferBase):
         return (states, actions, rewards, next_states, dones)
 
 
+class RolloutBuffer(BufferBase):
+    """Time ordered storage for on-policy rollouts.
+
+    Each property is kept in a preallocated tensor of shape [rollout_length, num_envs, F] where F is
+    the flattened size of the property, e.g. 1 for a reward. Tensors are allocated on the first `add`,
+    written in-place and reused by all following rollouts.
+    Storage uses `dtypes` for the given properties, `DEFAULT_DTYPES` (float32) for states, actions, rewards,
+    logprobs and values, and the first added value's dtype for anything else, e.g. bool dones.
+    """
+
+    DEFAULT_DTYPES: Dict[str, torch.dtype] = {
+        'state': torch.float32, 'action': torch.float32, 'reward': torch.float32,
+        'logprob': torch.float32, 'value': torch.float32,
+    }
+
+    def __init__(self, rollout_length: int, num_envs: int=1, device=None, dtypes: Optional[Dict[str, torch.dtype]]=None):
+        super(RolloutBuffer, self).__init__()
+        self.rollout_length = rollout_length
+        self.num_envs = num_envs
+        self.device = device
+        self.dtypes = {**self.DEFAULT_DTYPES, **(dtypes or {})}
+        self.data: Dict[str, Tensor] = {}
+        self.cursor = 0
+
+    def __len__(self) -> int:
+        return self.cursor * self.num_envs
+
+    @property
+    def full(self) -> bool:
+        return self.cursor >= self.rollout_length
+
+    def add(self, **kwargs):
+        """Adds a single time step. Each property has `num_envs` leading values, or is a single value for one env."""
+        assert not self.full, "Rollout is full. Use the data and `clear` it first."
+        for (key, value) in kwargs.items():
+            value = torch.as_tensor(value).reshape(self.num_envs, -1)
+            if key not in self.data:
+                dtype = self.dtypes.get(key, value.dtype)
+                self.data[key] = torch.zeros((self.rollout_length,) + tuple(value.shape), dtype=dtype, device=self.device)
+            self.data[key][self.cursor].copy_(value)
+        self.cursor += 1
+
+    def get(self) -> Dict[str, Tensor]:
+        """Returns views, in time order, of all steps added since the last `clear`."""
+        return {key: values[:self.cursor] for (key, values) in self.data.items()}
+
+    def snapshot(self) -> 'RolloutBuffer':
+        buffer = copy.copy(self)
+        buffer.data = {key: values.clone() for (key, values) in self.data.items()}
+        return buffer
+
+    def clear(self) -> None:
+        self.cursor = 0
+
+
 class PERBuffer(BufferBase):
     """Prioritized Experience Replay
 
@@ -176,6 +252,20 @@ class PERBuffer(BufferBase):
         priority += self.tiny_offset
         self.tree.insert(kwargs, pow(priority, self.alpha))
 
+    def snapshot(self) -> 'PERBuffer':
+        """Experiences aren't modified once added so the copy shares them and only the tree is copied."""
+        buffer = copy.copy(self)
+        buffer.tree = copy.copy(self.tree)
+        buffer.tree.tree = self.tree.tree.copy()
+        buffer.tree.data = list(self.tree.data)
+        return buffer
+
+    def add_batch(self, *, priority: Optional[Sequence[float]]=None, **kwargs):
+        """Adds N experiences at once. Each named property is expected to be a sequence of length N."""
+        keys = list(kwargs.keys())
+        for idx, values in enumerate(zip(*kwargs.values())):
+            self.add(priority=priority[idx] if priority is not None else 0, **dict(zip(keys, values)))
+
     def add_sars(self, **kwargs):
         self.add(**kwargs)
 
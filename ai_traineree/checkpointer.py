@@ -0,0 +1,160 @@
+import copy
+import json
+import os
+import torch
+
+from ai_traineree.buffers import BufferBase
+from ai_traineree.manifest import CheckpointManifest
+from ai_traineree.utils import QueueWorker
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def cpu_snapshot(obj: Any) -> Any:
+    """
+    Copies `obj`, e.g. a state dict, with all tensors detached and moved to CPU so it can't change any more.
+    Buffers are copied with their `snapshot` which shares stored experiences rather than copying them.
+    """
+    if isinstance(obj, BufferBase):
+        return obj.snapshot()
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        snapshot = type(obj)((key, cpu_snapshot(value)) for (key, value) in obj.items())
+        if hasattr(obj, '_metadata'):
+            # Module's state dicts carry versions of their layers
+            snapshot._metadata = copy.deepcopy(obj._metadata)  # type: ignore
+        return snapshot
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(cpu_snapshot(value) for value in obj)
+    return copy.deepcopy(obj)
+
+
+def _fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Not possible on some platforms, e.g. Windows
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_save(obj: Any, path: str) -> None:
+    """
+    Writes `obj` to a temporary file, fsyncs it and renames it to `path` so that the `path` is either
+    the previous file or the complete new one. Paths ending with `.json` are written as JSON, others with `torch.save`.
+    """
+    dir_path = os.path.dirname(path) or '.'
+    os.makedirs(dir_path, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        if path.endswith('.json'):
+            f.write(json.dumps(obj).encode())
+        else:
+            torch.save(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(dir_path)
+
+
+class AsyncCheckpointer:
+    """
+    Writes checkpoints on a background thread so that training only waits for a CPU copy of the state.
+
+    Each `save` snapshots given objects, e.g. agent's `get_state()` and the runner's state, and queues them.
+    The writer thread stores every file with `atomic_save`. When the queue of `queue_size` checkpoints is full
+    `save` blocks, which bounds the memory held by snapshots.
+
+    After each checkpoint is written the retention policy keeps `keep_last` most recent checkpoints and
+    `keep_best` checkpoints with the highest score; files of all others are deleted. With `keep_last`
+    set to None checkpoints are never deleted. Checkpoints written before, e.g. by a run which is resumed,
+    are subject to retention once they're tracked with `manifest_path` or `track_manifest`.
+
+    >>> checkpointer = AsyncCheckpointer(keep_last=3, keep_best=1)
+    >>> checkpointer.save({"agent_e10.agent": agent.get_state(), "agent_e10.json": runner_state}, score=10)
+    >>> checkpointer.close()  # Waits for pending checkpoints
+    """
+
+    def __init__(self, keep_last: Optional[int]=5, keep_best: int=0, queue_size: int=2, manifest_path: Optional[str]=None):
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+
+        # Written checkpoints in order of saving, as (score, paths)
+        self.checkpoints: List[Tuple[Optional[float], List[str]]] = []
+
+        self.worker = QueueWorker(self._write, name="AsyncCheckpointer", error_message="Writing checkpoint has failed", queue_size=queue_size)
+        self.worker.start()
+        if manifest_path is not None:
+            self.track_manifest(manifest_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def save(self, files: Dict[str, Any], score: Optional[float]=None, on_written: Optional[Callable[[], Any]]=None) -> None:
+        """
+        Queues a checkpoint made of `files`, a mapping of paths to objects, with its `score` used for retention.
+        The `on_written` callback, e.g. updating a `CheckpointManifest`, is called on the writer thread once all files are written.
+        """
+        self.worker.raise_if_failed()
+        snapshot = OrderedDict((path, cpu_snapshot(obj)) for (path, obj) in files.items())
+        self.worker.put((snapshot, score, on_written))
+
+    def track_manifest(self, path: str) -> None:
+        """
+        Adds checkpoints from a `CheckpointManifest`, which still have all their files, to the written ones,
+        as older than any checkpoint saved by this checkpointer. They're removed by the following retention.
+        """
+        self.flush()
+        manifest = CheckpointManifest(path)
+        tracked = {os.path.abspath(path) for (_, paths) in self.checkpoints for path in paths}
+        previous = []
+        for entry in manifest.entries():
+            paths = [manifest.file_path(entry, role) for role in entry['files']]
+            if all(os.path.exists(path) and os.path.abspath(path) not in tracked for path in paths):
+                previous.append((entry.get('average_score'), paths))
+                tracked.update(os.path.abspath(path) for path in paths)
+        self.checkpoints = previous + self.checkpoints
+
+    def flush(self) -> None:
+        """Blocks until all queued checkpoints are written."""
+        self.worker.join()
+
+    def close(self) -> None:
+        self.worker.close()
+
+    def _write(self, item: Tuple[Dict[str, Any], Optional[float], Optional[Callable[[], Any]]]) -> None:
+        (files, score, on_written) = item
+        for (path, obj) in files.items():
+            atomic_save(obj, path)
+        if on_written is not None:
+            on_written()
+        self.checkpoints.append((score, list(files)))
+        self._apply_retention()
+
+    def _apply_retention(self) -> None:
+        if self.keep_last is None:
+            return
+        keep = set(range(max(len(self.checkpoints) - self.keep_last, 0), len(self.checkpoints)))
+        scored = [idx for (idx, (score, _)) in enumerate(self.checkpoints) if score is not None]
+        keep.update(sorted(scored, key=lambda idx: self.checkpoints[idx][0], reverse=True)[:self.keep_best])
+
+        kept = []
+        for (idx, (score, paths)) in enumerate(self.checkpoints):
+            if idx in keep:
+                kept.append((score, paths))
+                continue
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self.checkpoints = kept
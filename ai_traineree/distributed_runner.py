@@ -0,0 +1,208 @@
+import logging
+import numpy as np
+import queue
+import torch
+import torch.multiprocessing as mp
+
+from ai_traineree.agents.utils import acting_modules
+from ai_traineree.shared_weights import SharedWeights
+from ai_traineree.types import AgentType, TaskType
+
+from collections import defaultdict, deque
+from typing import Callable, List, Optional, Sequence
+
+
+def _actor_worker(
+    actor_id: int, task_fn: Callable[[], TaskType], agent_fn: Callable[..., AgentType],
+    shared_weights: SharedWeights, transitions: mp.Queue, scores: mp.Queue, stop_event,
+    eps: float, max_iterations: int, send_every: int, sync_every: int, seed: int,
+):
+    """Actor process' loop. Interacts with its own task using a CPU copy of the agent's acting networks."""
+    torch.set_num_threads(1)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    transitions.cancel_join_thread()
+    scores.cancel_join_thread()
+
+    task = task_fn()
+    agent = agent_fn(device="cpu")
+    modules = acting_modules(agent)
+    compute_priorities = getattr(agent, "compute_priorities", None)
+
+    steps, iterations, score = 0, 0, 0.
+    batch = defaultdict(list)
+    state = task.reset()
+    while not stop_event.is_set():
+        if steps % sync_every == 0:
+            shared_weights.pull(modules)
+
+        state = np.array(state, np.float32)
+        action = agent.act(state, eps)
+        if not task.is_discrete:
+            action = np.array(action, dtype=np.float32)
+        next_state, reward, done, _ = task.step(action)
+
+        batch['states'].append(state)
+        batch['actions'].append(action)
+        batch['rewards'].append(reward)
+        batch['next_states'].append(np.array(next_state, np.float32))
+        batch['dones'].append(done)
+
+        steps += 1
+        iterations += 1
+        score += reward
+        state = next_state
+        if done or iterations >= max_iterations:
+            scores.put((actor_id, score))
+            iterations, score = 0, 0.
+            state = task.reset()
+
+        if len(batch['states']) >= send_every:
+            priorities = compute_priorities(**batch) if compute_priorities is not None else None
+            while not stop_event.is_set():
+                try:
+                    transitions.put((dict(batch), priorities), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            batch = defaultdict(list)
+
+
+class DistributedRunner:
+    """
+    Runs an off-policy agent in the Ape-X fashion on a single machine.
+
+    `num_actors` actor processes each interact with their own task using a CPU copy of the agent's acting
+    networks and send transitions, in chunks of `send_every`, to the learner. Agents which can compute
+    initial priorities for a prioritized buffer, i.e. have `compute_priorities`, do it in the actors.
+    The learner, the main process, adds received transitions with `agent.step_batch`, so that the agent
+    learns as often as it would in the `EnvRunner`, and every `publish_every` chunks publishes its acting
+    networks' weights with `SharedWeights`. Actors pull them when there's a new version.
+
+    Typical run is
+    >>> runner = DistributedRunner(partial(GymTask, "CartPole-v1"), partial(DQNAgent, 4, 2), num_actors=4)
+    >>> runner.run(max_steps=100000)
+
+    Both `task_fn` and `agent_fn` need to be picklable, e.g. top level functions or `functools.partial`,
+    and `agent_fn` needs to accept the `device` keyword argument.
+    """
+
+    def __init__(
+        self, task_fn: Callable[[], TaskType], agent_fn: Callable[..., AgentType], num_actors: int=2,
+        agent: Optional[AgentType]=None, **kwargs
+    ):
+        """
+        Additional args:
+
+        actor_eps: Exploration parameter passed to `act` by each actor. By default, Ape-X's `0.4**(1 + 7*i/(N-1))`.
+        max_iterations: Maximum number of iterations in an episode (default: 1000).
+        send_every: Number of transitions which actors send at once (default: 50).
+        sync_every: How often, in steps, actors check for new weights (default: 50).
+        publish_every: How often, in received chunks, learner publishes weights (default: 4).
+        queue_size: Maximum number of chunks waiting for the learner (default: 4*num_actors).
+        start_method: Multiprocessing start method (default: "spawn").
+        """
+        self.logger = logging.getLogger("DistributedRunner")
+        self.task_fn = task_fn
+        self.agent_fn = agent_fn
+        self.agent = agent if agent is not None else agent_fn()
+        self.num_actors = num_actors
+
+        if getattr(self.agent, 'n_steps', 1) > 1:
+            raise ValueError("Actors send sequences of transitions so the agent can't use `n_steps` > 1")
+
+        default_eps = [0.4**(1 + 7*i/max(num_actors - 1, 1)) for i in range(num_actors)]
+        self.actor_eps: Sequence[float] = kwargs.get('actor_eps', default_eps)
+        self.max_iterations = int(kwargs.get('max_iterations', 1000))
+        self.send_every = int(kwargs.get('send_every', 50))
+        self.sync_every = int(kwargs.get('sync_every', 50))
+        self.publish_every = int(kwargs.get('publish_every', 4))
+        self.queue_size = int(kwargs.get('queue_size', 4*num_actors))
+        self.window_len = int(kwargs.get('window_len', 50))
+        self.ctx = mp.get_context(kwargs.get('start_method', 'spawn'))
+
+        self.shared_weights = SharedWeights(acting_modules(self.agent))
+
+        self.total_steps = 0
+        self.all_scores: List[float] = []
+        self.scores_window: deque = deque(maxlen=self.window_len)
+
+    def __str__(self) -> str:
+        return f"DistributedRunner<{self.agent.name}, {self.num_actors} actors>"
+
+    def publish_weights(self) -> None:
+        """Publishes the learner's acting networks as a new version of the shared weights."""
+        self.shared_weights.publish(acting_modules(self.agent))
+
+    def run(self, max_steps: int=100000, reward_goal: Optional[float]=None, log_every: int=10) -> List[float]:
+        """
+        Trains the agent until the learner receives `max_steps` transitions or the average score of
+        the last `window_len` episodes, from any actor, reaches the `reward_goal`.
+        Returns scores of all finished episodes.
+        """
+        transitions = self.ctx.Queue(maxsize=self.queue_size)
+        scores = self.ctx.Queue()
+        stop_event = self.ctx.Event()
+        self.publish_weights()
+
+        processes = []
+        for actor_id in range(self.num_actors):
+            args = (
+                actor_id, self.task_fn, self.agent_fn, self.shared_weights,
+                transitions, scores, stop_event, self.actor_eps[actor_id],
+                self.max_iterations, self.send_every, self.sync_every, actor_id,
+            )
+            process = self.ctx.Process(target=_actor_worker, args=args, daemon=True)
+            process.start()
+            processes.append(process)
+
+        received = 0
+        try:
+            while self.total_steps < max_steps:
+                try:
+                    batch, priorities = transitions.get(timeout=1)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        raise RuntimeError("All actor processes have died")
+                    continue
+
+                if priorities is not None:
+                    self.agent.step_batch(**batch, priorities=priorities)
+                else:
+                    self.agent.step_batch(**batch)
+                self.total_steps += len(batch['states'])
+                received += 1
+                if received % self.publish_every == 0:
+                    self.publish_weights()
+
+                self._collect_scores(scores, log_every)
+                if reward_goal is not None and len(self.scores_window) and self.average_score >= reward_goal:
+                    self.logger.info("Environment solved after %d steps and %d episodes", self.total_steps, len(self.all_scores))
+                    break
+        finally:
+            stop_event.set()
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+        return self.all_scores
+
+    def _collect_scores(self, scores: mp.Queue, log_every: int) -> None:
+        """Gathers scores of episodes finished by actors."""
+        while True:
+            try:
+                actor_id, score = scores.get_nowait()
+            except queue.Empty:
+                break
+            self.all_scores.append(score)
+            self.scores_window.append(score)
+            if len(self.all_scores) % log_every == 0:
+                self.logger.info(
+                    "Episode %d;\tSteps: %d;\tActor: %d;\tCurrent Score: %.2f;\tAverage Score: %.2f;",
+                    len(self.all_scores), self.total_steps, actor_id, score, self.average_score,
+                )
+
+    @property
+    def average_score(self) -> float:
+        return sum(self.scores_window) / max(len(self.scores_window), 1)
@@ -4,12 +4,21 @@ import numpy as np
 import time
 import os
 import sys
+from ai_traineree.background_learner import BackgroundLearner
+from ai_traineree.checkpointer import AsyncCheckpointer
+from ai_traineree.evaluator import Evaluator
+from ai_traineree.instrumentation import PerfCounters
+from ai_traineree.manifest import CheckpointManifest
+from ai_traineree.profiling import EpisodeProfiler, ModuleTimers
+from ai_traineree.recorder import EpisodeRecorder
+from ai_traineree.replay_ratio import ReplayRatioScheduler
+from ai_traineree.training_state import get_training_state, load_training_state, save_training_state
 from ai_traineree.types import AgentType, RewardType, TaskType
 
 from collections import deque
-from functools import wraps
+from functools import partial, wraps
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 FRAMES_PER_SEC = 25
 logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="")
@@ -28,11 +37,9 @@ def timing(f):
 
 def save_gif(path, images: List[np.ndarray]) -> None:
     print(f"Saving as a gif to {path}")
-    from PIL import Image
-    imgs = [Image.fromarray(img[::2, ::2]) for img in images]  # Reduce /4 size; pick w/2 h/2 pix
-
-    Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
-    imgs[0].save(path, save_all=True, append_images=imgs[1:], optimize=True, quality=85)
+    with EpisodeRecorder(path, downscale=2) as recorder:  # Reduce /4 size; pick w/2 h/2 pix
+        for img in images:
+            recorder.add(img)
 
 
 class EnvRunner:
@@ -51,7 +58,15 @@ class EnvRunner:
         Expects the environment to come as the TaskType and the agent as the AgentType.
         Additional args:
 
-        writer: Tensorboard writer.
+        writer: Tensorboard writer, or `MetricsWriter` to write metrics from a background thread.
+        background_learning: Whether the agent learns on a background thread, see `BackgroundLearner` (default: False).
+        replay_ratio_scheduler: `ReplayRatioScheduler` which sets off-policy agent's number of updates on every step of `run`.
+        checkpointer: `AsyncCheckpointer` which writes states in the background and removes old ones.
+        recording_format: Format of episodes recorded with `gif_every_episodes`, either "gif" or "npz" (default: "gif").
+        recording_downscale: Recorded frames keep every n-th pixel in both directions (default: 2).
+        evaluator: `Evaluator` which evaluates the agent in the background every `evaluate_every` episodes of `run`.
+        full_state: Whether states include optimizers, counters and random generators, see `get_training_state` (default: False).
+        include_buffer: Whether full states also include agent's buffers (default: False).
         """
         self.logger = logging.getLogger("EnvRunner")
         self.task = task
@@ -59,16 +74,41 @@ class EnvRunner:
         self.max_iterations = max_iterations
         self.model_path = f"{task.name}_{agent.name}"
         self.state_dir = 'run_states'
+        self.profile_dir = 'profiles'
 
         self.episode = 0
         self.all_scores = []
         self.all_iterations = []
         self.window_len = kwargs.get('window_len', 50)
-        self.__images = []
+
+        # Episodes are recorded by `EpisodeRecorder` in the background; the last one is waited on before the next
+        self.recording_format = kwargs.get('recording_format', 'gif')
+        self.recording_downscale = int(kwargs.get('recording_downscale', 2))
+        self.recorder: Optional[EpisodeRecorder] = None
 
         self.writer = kwargs.get("writer")
         self.logger.info("writer: %s", str(self.writer))
 
+        self.background_learning = bool(kwargs.get("background_learning", False))
+        self.background_learner: Optional[BackgroundLearner] = None
+        self.time_saved = 0.  # Estimated wall time saved by the background learning in the last run
+
+        self.replay_ratio_scheduler: Optional[ReplayRatioScheduler] = kwargs.get("replay_ratio_scheduler")
+        if self.replay_ratio_scheduler is not None and (hasattr(agent, 'local_memory_buffer') or not hasattr(agent, 'update_freq')):
+            # On-policy agents, e.g. PPO, learn once per rollout and their `number_updates` are epochs, not updates per step
+            raise ValueError(f"Replay ratio scheduling is only supported for off-policy agents, but got {agent.name} agent")
+
+        self.checkpointer: Optional[AsyncCheckpointer] = kwargs.get("checkpointer")
+        self.full_state = bool(kwargs.get("full_state", False))
+        self.evaluator: Optional[Evaluator] = kwargs.get("evaluator")
+        self.eval_results: List[Dict] = []
+        self.include_buffer = bool(kwargs.get("include_buffer", False))
+
+        # Throughput and time spent in each phase, per episode and over the last `window_len` episodes
+        self.perf = PerfCounters(window_len=self.window_len)
+        self.episode_profiler: Optional[EpisodeProfiler] = None
+        self.module_timers: Optional[ModuleTimers] = None
+
     def __str__(self) -> str:
         return f"EnvRunner<{self.task.name}, {self.agent.name}>"
 
@@ -78,45 +118,96 @@ class EnvRunner:
         self.all_scores = []
         self.all_iterations = []
         self.scores_window = deque(maxlen=self.window_len)
+        self.eval_results = []
+        self.perf.reset()
 
-    def interact_episode(self, eps: float=0, max_iterations=None, render=False, render_gif=False) -> Tuple[RewardType, int]:
+    def interact_episode(
+        self, eps: float=0, max_iterations=None, render=False, render_gif=False, gif_path: Optional[str]=None,
+    ) -> Tuple[RewardType, int]:
         score = 0
         state = self.task.reset()
         iterations = 0
         max_iterations = max_iterations if max_iterations is not None else self.max_iterations
 
-        # Only gifs require keeping (S, A, R) list
+        # Frames are streamed to the recorder rather than kept
+        recorder = None
         if render_gif:
-            self.__images = []
+            if gif_path is None:
+                gif_path = f"gifs/{self.model_path}_e{self.episode}.{self.recording_format}"
+            recorder = self._start_recording(gif_path)
+
+        # With background learning, acting and learning go through the learner
+        learner = self.background_learner if self.background_learner is not None else self.agent
+        scheduler = self.replay_ratio_scheduler
+
+        # Phases' times are accumulated locally and added to `self.perf` once per episode
+        act_ns, env_ns, step_ns, render_ns = 0, 0, 0, 0
 
         while(iterations < max_iterations):
             iterations += 1
             state = np.array(state, np.float32)
             if render:
+                t_render = time.perf_counter_ns()
                 self.task.render()
                 time.sleep(1./FRAMES_PER_SEC)
-            action = self.agent.act(state, eps)
+                render_ns += time.perf_counter_ns() - t_render
+            t_act = time.perf_counter_ns()
+            action = learner.act(state, eps)
             if not self.task.is_discrete:
                 action = np.array(action, dtype=np.float32)
+            t_env = time.perf_counter_ns()
             next_state, reward, done, _ = self.task.step(action)
+            t_env_end = time.perf_counter_ns()
+            act_ns += t_env - t_act
+            env_ns += t_env_end - t_env
             score += reward
-            if render_gif:
+            if recorder is not None:
                 # OpenAI gym still renders the image to the screen even though it shouldn't. Eh.
-                img = self.task.render(mode='rgb_array')
-                self.__images.append(img)
-            self.agent.step(state, action, reward, next_state, done)
+                recorder.add(self.task.render(mode='rgb_array'))
+                render_ns += time.perf_counter_ns() - t_env_end
+            number_updates = None
+            if scheduler is not None:
+                scheduler.record('act', (t_env - t_act)*1e-9)
+                scheduler.record('env', (t_env_end - t_env)*1e-9)
+                number_updates = scheduler.updates()
+            t_step = time.perf_counter_ns()
+            if self.background_learner is not None:
+                # The learner thread sets agent's number of updates right before its step
+                self.background_learner.step(state, action, reward, next_state, done, number_updates=number_updates)
+            else:
+                if number_updates is not None:
+                    self.agent.number_updates = number_updates
+                self.agent.step(state, action, reward, next_state, done)
+            step_ns += time.perf_counter_ns() - t_step
             state = next_state
             if done:
                 break
+
+        if recorder is not None:
+            recorder.finish()
+        self.perf.add(steps=iterations, act=act_ns, env=env_ns, step=step_ns, render=render_ns)
         return score, iterations
 
+    def _start_recording(self, path: str) -> EpisodeRecorder:
+        self.finish_recording()
+        self.logger.info("Recording episode to %s", path)
+        self.recorder = EpisodeRecorder(path, downscale=self.recording_downscale)
+        return self.recorder
+
+    def finish_recording(self) -> None:
+        """Waits until the last recorded episode is written."""
+        if self.recorder is not None:
+            recorder, self.recorder = self.recorder, None
+            recorder.close()
+
     @timing
     def run(
         self,
         reward_goal: float=100.0, max_episodes: int=2000,
         eps_start=1.0, eps_end=0.01, eps_decay=0.995,
         log_every=10, gif_every_episodes: Optional[int]=None,
-        checkpoint_every=200, force_new=False,
+        checkpoint_every=200, force_new=False, resume: str="latest", evaluate_every: Optional[int]=None,
+        profiler: Optional[str]=None, profile_episodes: Tuple[int, int]=(1, 1), module_timing: bool=False,
     ):
         """
         Evaluates the agent in the environment.
@@ -128,17 +219,89 @@ class EnvRunner:
 
         Every `checkpoint_every` (default: 200) iterations the Runner will store current state of the runner and the agent.
         These states can be used to resume previous run. By default the runner checks whether there is ongoing run for
-        the combination of the environment and the agent.
+        the combination of the environment and the agent and resumes either the `latest` or the `best` state, see `load_state`.
+
+        With the `evaluator` set, every `evaluate_every` episodes the agent's policy is evaluated, without exploration,
+        in the evaluator's processes. Results are logged, when they're ready, and kept in `self.eval_results`.
+
+        Profiling doesn't require code changes. With `profiler` set to either "cprofile" or "torch" episodes in the
+        `profile_episodes` window, (first, last) inclusive, are profiled and the profile is written to `self.profile_dir`.
+        The window counts episodes of this run, i.e. `(1, 1)` is the first episode after the resumed one.
+        With `module_timing` the agent's networks are timed with hooks and their average forward and backward times
+        are reported with other performance values.
         """
         self.epsilon = eps_start
         self.reset()
         if not force_new:
-            self.load_state(self.model_path)
+            self.load_state(self.model_path, which=resume)
+        if self.checkpointer is not None:
+            # States from previous runs are pruned with new ones
+            self.checkpointer.track_manifest(self.manifest_path(self.model_path))
+
+        if profiler is not None:
+            first, last = (self.episode + episode for episode in profile_episodes)
+            profile_path = f"{self.profile_dir}/{self.model_path}_e{first}-{last}"
+            self.episode_profiler = EpisodeProfiler(profiler, first, last, profile_path)
+        if module_timing:
+            self.module_timers = ModuleTimers()
+            self.module_timers.attach(self.agent)
+
+        if self.background_learning:
+            self.background_learner = BackgroundLearner(self.agent)
+
+        # Agent's `learn` is counted, and timed, only during the run so that runners sharing the agent don't stack hooks
+        self.perf.attach(self.agent)
+        # Scheduler decides the number of updates on every step; agent's own schedule is restored at the end
+        agent_schedule = {}
+        if self.replay_ratio_scheduler is not None:
+            self.replay_ratio_scheduler.attach(self.agent)
+            agent_schedule = {name: getattr(self.agent, name) for name in ('update_freq', 'number_updates')}
+            self.agent.update_freq = 1
+
+        if self.background_learner is not None:
+            self.background_learner.start()
+        try:
+            self._run_episodes(
+                reward_goal, max_episodes, eps_end, eps_decay, log_every, gif_every_episodes, checkpoint_every, evaluate_every,
+            )
+        finally:
+            if self.episode_profiler is not None:
+                self.episode_profiler.stop()
+                self.episode_profiler = None
+            if self.module_timers is not None:
+                self.module_timers.detach()
+                self.module_timers = None
+            if self.background_learner is not None:
+                self.background_learner.stop()
+                self.time_saved = self.background_learner.time_saved
+                if self.logger is not None:
+                    self.logger.info("Background learning saved %.2f seconds", self.time_saved)
+                self.background_learner = None
+            if self.replay_ratio_scheduler is not None:
+                self.replay_ratio_scheduler.detach()
+            self.perf.detach()
+            for (name, value) in agent_schedule.items():
+                setattr(self.agent, name, value)
+            if self.writer is not None and hasattr(self.writer, 'flush'):
+                self.writer.flush()
+            if self.checkpointer is not None:
+                self.checkpointer.flush()
+            self.finish_recording()
+            if self.evaluator is not None:
+                self.log_evaluations(self.evaluator.wait())
+
+        return self.all_scores
 
+    def _run_episodes(
+        self, reward_goal, max_episodes, eps_end, eps_decay, log_every, gif_every_episodes, checkpoint_every, evaluate_every,
+    ):
         while (self.episode < max_episodes):
             self.episode += 1
+            if self.episode_profiler is not None:
+                self.episode_profiler.episode_start(self.episode)
             render_gif = gif_every_episodes is not None and (self.episode % gif_every_episodes) == 0
-            score, iterations = self.interact_episode(self.epsilon, render_gif=render_gif)
+            gif_path = "gifs/{}_e{}.{}".format(self.model_path, str(self.episode).zfill(len(str(max_episodes))), self.recording_format)
+            score, iterations = self.interact_episode(self.epsilon, render_gif=render_gif, gif_path=gif_path)
 
             self.scores_window.append(score)
             self.all_iterations.append(iterations)
@@ -153,23 +316,55 @@ class EnvRunner:
                     loss = {'actor_loss': self.agent.actor_loss, 'critic_loss': self.agent.critic_loss}
                 else:
                     loss = {'loss': self.agent.loss}
-                self.info(episode=self.episode, iterations=iterations, score=score, mean_score=mean_score, epsilon=self.epsilon, **loss)
-
-            if render_gif and len(self.__images):
-                gif_path = "gifs/{}_e{}.gif".format(self.model_path, str(self.episode).zfill(len(str(max_episodes))))
-                save_gif(gif_path, self.__images)
-                self.__images = []
+                self.info(
+                    episode=self.episode, iterations=iterations, score=score, mean_score=mean_score, epsilon=self.epsilon,
+                    perf=self.perf_stats(), **loss,
+                )
 
             if mean_score >= reward_goal:
                 print(f'Environment solved after {self.episode} episodes!\tAverage Score: {mean_score:.2f}')
+                if self.background_learner is not None:
+                    self.background_learner.flush()
                 self.save_state(self.model_path)
                 self.agent.save_state(f'{self.model_path}_agent.net')
                 break
 
+            if self.evaluator is not None:
+                if evaluate_every is not None and self.episode % evaluate_every == 0:
+                    self.evaluator.submit(self._evaluated_agent(), episode=self.episode)
+                self.log_evaluations(self.evaluator.poll())
+
             if self.episode % checkpoint_every == 0:
+                t_checkpoint = time.perf_counter_ns()
+                if self.background_learner is not None:
+                    self.background_learner.flush()
                 self.save_state(self.model_path)
+                self.perf.add(checkpoint=time.perf_counter_ns() - t_checkpoint)
 
-        return self.all_scores
+            if self.episode_profiler is not None:
+                self.episode_profiler.episode_end(self.episode)
+            self.perf.start_episode()
+
+    def _evaluated_agent(self) -> AgentType:
+        """
+        Agent whose acting networks are evaluated. The background learner updates the agent's networks
+        while they're copied, so with it the acting copy, which only this thread changes, is evaluated instead.
+        """
+        if self.background_learner is None:
+            return self.agent
+        self.background_learner.sync()
+        return self.background_learner.acting_agent
+
+    def perf_stats(self) -> Dict[str, float]:
+        """Performance related values, e.g. steps per second or time saved by the background learning."""
+        perf = self.perf.stats()
+        if self.background_learner is not None:
+            perf['time_saved'] = self.background_learner.time_saved
+        if self.replay_ratio_scheduler is not None:
+            perf.update(self.replay_ratio_scheduler.stats())
+        if self.module_timers is not None:
+            perf.update(self.module_timers.stats())
+        return perf
 
     def info(self, **kwargs):
         """
@@ -191,6 +386,13 @@ class EnvRunner:
         else:
             line_chunks += ["Loss: {loss:10.4f};"]
         line_chunks += ["Epsilon: {epsilon:5.3f};"]
+        perf = kwargs.get('perf', {})
+        for name in perf:
+            if not name.endswith('_frac'):
+                line_chunks += [name.replace('_', ' ').capitalize() + ": {perf[" + name + "]:.2f};"]
+        time_split = [f"{name[:-len('_frac')]} {100*value:.0f}%" for (name, value) in perf.items() if name.endswith('_frac')]
+        if time_split:
+            line_chunks += ["Time split: " + ", ".join(time_split) + ";"]
         line = "\t".join(line_chunks)
         self.logger.info(line.format(**kwargs))
 
@@ -205,12 +407,29 @@ class EnvRunner:
         else:
             self.writer.add_scalar("loss", kwargs['loss'], self.episode)
         self.writer.add_scalar("epsilon", kwargs['epsilon'], self.episode)
+        for (name, value) in kwargs.get('perf', {}).items():
+            self.writer.add_scalar(f"perf/{name}", value, self.episode)
+
+    def log_evaluations(self, results: List[Dict]) -> None:
+        """Keeps results of evaluations, see `Evaluator`, and writes them to the logger and the writer."""
+        for result in results:
+            self.eval_results.append(result)
+            if self.logger is not None:
+                self.logger.info(
+                    "Evaluation of episode %s;\tMean score: %.2f;\tStd: %.2f;\tMin: %.2f;\tMax: %.2f;\tEpisodes: %d",
+                    result['episode'], result['mean_score'], result['std_score'], result['min_score'], result['max_score'],
+                    result['num_episodes'],
+                )
+            if self.writer is not None:
+                for name in ('mean_score', 'std_score', 'min_score', 'median_score', 'max_score', 'mean_iterations'):
+                    self.writer.add_scalar(f"eval/{name}", result[name], result['episode'])
 
     def save_state(self, state_name: str):
         """Saves the current state of the runner and the agent.
 
-        Files are stored with appended episode number.
-        Agents are saved with their internal saving mechanism.
+        Files are stored with appended episode number and are recorded in the `{state_name}.manifest.jsonl`
+        manifest together with their scores, sizes and hashes.
+        Agents are saved with their internal saving mechanism, or with the `checkpointer` if it's set.
         """
         state = {
             'tot_iterations': sum(self.all_iterations),
@@ -222,23 +441,61 @@ class EnvRunner:
             'critic_loss': self.agent.critic_loss,
         }
 
+        agent_path = f'{self.state_dir}/{state_name}_e{self.episode}.agent'
+        state_path = f'{self.state_dir}/{state_name}_e{self.episode}.json'
+        manifest = CheckpointManifest(self.manifest_path(state_name))
+        record = partial(
+            manifest.append, f'{state_name}_e{self.episode}', {'agent': agent_path, 'state': state_path},
+            episode=self.episode, score=state['score'], average_score=state['average_score'],
+        )
+        if self.checkpointer is not None:
+            if self.full_state:
+                agent_state = get_training_state(self.agent, include_buffer=self.include_buffer)
+            else:
+                agent_state = self.agent.get_state()
+            self.checkpointer.save({agent_path: agent_state, state_path: state}, score=state['average_score'], on_written=record)
+            return
+
         Path(self.state_dir).mkdir(parents=True, exist_ok=True)
-        self.agent.save_state(f'{self.state_dir}/{state_name}_e{self.episode}.agent')
-        with open(f'{self.state_dir}/{state_name}_e{self.episode}.json', 'w') as f:
+        if self.full_state:
+            save_training_state(self.agent, agent_path, include_buffer=self.include_buffer)
+        else:
+            self.agent.save_state(agent_path)
+        with open(state_path, 'w') as f:
             json.dump(state, f)
+        record()
 
-    def load_state(self, state_prefix: str):
+    def manifest_path(self, state_name: str) -> str:
+        return f'{self.state_dir}/{state_name}.manifest.jsonl'
+
+    def load_state(self, state_prefix: str, which: str="latest", check_hash: bool=False):
         """
-        Loads state with the highest episode value for given agent and environment.
+        Loads state for given agent and environment, either the `latest` saved or the `best` by average score.
+
+        Checkpoints are looked up in the manifest and their files are checked against recorded sizes and,
+        with `check_hash`, hashes. When the manifest has no intact checkpoint nothing is loaded.
+        States saved without a manifest are found by listing the `state_dir`, in which case the state with
+        the highest episode value is loaded, also for `best`.
         """
-        try:
-            state_files = list(filter(lambda f: f.startswith(state_prefix) and f.endswith('json'), os.listdir(self.state_dir)))
-            e = max([int(f[f.index('_e')+2:f.index('.')]) for f in state_files])
-        except Exception:
-            self.logger.warning("Couldn't load state. Forcing restart.")
+        manifest = CheckpointManifest(self.manifest_path(state_prefix))
+        entry = manifest.select(which, check_hash=check_hash)
+        if entry is not None:
+            state_name = entry['name']
+        elif manifest.entries():
+            # Listing the directory could find the very files that were skipped
+            self.logger.warning("No intact '%s' checkpoint in the manifest %s. Forcing restart.", which, manifest.path)
             return
+        else:
+            if which == 'best':
+                self.logger.warning("No '%s' checkpoints in a manifest; looking for the latest state instead", state_prefix)
+            try:
+                state_files = list(filter(lambda f: f.startswith(state_prefix) and f.endswith('json'), os.listdir(self.state_dir)))
+                e = max([int(f[f.index('_e')+2:f.index('.')]) for f in state_files])
+            except Exception:
+                self.logger.warning("Couldn't load state. Forcing restart.")
+                return
+            state_name = [n for n in state_files if n.endswith(f"_e{e}.json")][0][:-5]
 
-        state_name = [n for n in state_files if n.endswith(f"_e{e}.json")][0][:-5]
         self.logger.info("Loading saved state under: %s/%s.json", self.state_dir, state_name)
         with open(f'{self.state_dir}/{state_name}.json', 'r') as f:
             state = json.load(f)
@@ -253,6 +510,9 @@ class EnvRunner:
             self.scores_window.append(avg_score)
 
         self.logger.info("Loading saved agent state: %s/%s.agent", self.state_dir, state_name)
-        self.agent.load_state(f'{self.state_dir}/{state_name}.agent')
+        if self.full_state:
+            load_training_state(self.agent, f'{self.state_dir}/{state_name}.agent')
+        else:
+            self.agent.load_state(f'{self.state_dir}/{state_name}.agent')
         self.agent.actor_loss = state.get('actor_loss')
         self.agent.critic_loss = state.get('critic_loss')
@@ -0,0 +1,153 @@
+import inspect
+import logging
+import numpy as np
+import random
+import torch
+import torch.multiprocessing as mp
+
+from ai_traineree.agents.utils import acting_modules
+from ai_traineree.checkpointer import cpu_snapshot
+from ai_traineree.types import AgentType, TaskType
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Evaluation process' task and agent, created once by `_init_worker`
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(task_fn: Callable[[], TaskType], agent_fn: Callable[..., AgentType]) -> None:
+    torch.set_num_threads(1)
+    agent = agent_fn(device="cpu")
+    _worker['task'] = task_fn()
+    _worker['agent'] = agent
+    _worker['act_kwargs'] = {'deterministic': True} if 'deterministic' in inspect.signature(agent.act).parameters else {}
+
+
+def _evaluate_episodes(
+    modules_state: List[Dict[str, torch.Tensor]], seeds: Sequence[int], max_iterations: int,
+) -> List[Tuple[int, float, int]]:
+    """Plays an episode for each of the `seeds` with the given acting networks. Returns their seeds, scores and lengths."""
+    task, agent = _worker['task'], _worker['agent']
+    for (module, state) in zip(acting_modules(agent), modules_state):
+        module.load_state_dict(state)
+
+    results = []
+    for seed in seeds:
+        random.seed(seed)
+        np.random.seed(seed)
+        torch.manual_seed(seed)
+        if hasattr(task, 'seed'):
+            task.seed(seed)
+
+        score, iterations = 0., 0
+        state = task.reset()
+        while iterations < max_iterations:
+            iterations += 1
+            action = agent.act(np.array(state, np.float32), 0, **_worker['act_kwargs'])
+            if not task.is_discrete:
+                action = np.array(action, dtype=np.float32)
+            state, reward, done, _ = task.step(action)
+            score += reward
+            if done:
+                break
+        results.append((seed, float(score), iterations))
+    return results
+
+
+def aggregate(scores: Sequence[float], iterations: Sequence[int]) -> Dict[str, float]:
+    return {
+        'mean_score': float(np.mean(scores)),
+        'std_score': float(np.std(scores)),
+        'min_score': float(np.min(scores)),
+        'median_score': float(np.median(scores)),
+        'max_score': float(np.max(scores)),
+        'mean_iterations': float(np.mean(iterations)),
+    }
+
+
+class Evaluator:
+    """
+    Evaluates agent's policy on `num_episodes` episodes played in parallel by a pool of `num_workers` processes.
+
+    `submit` copies the agent's acting networks (see `acting_modules`) to CPU, which is the only work done by
+    the caller, and the pool plays the episodes in the background without exploration, i.e. `act(state, 0)`
+    or deterministic if the agent's `act` allows it. Each episode has its own seed, `seed + idx`, which
+    seeds random generators and the task, if it has a `seed` method, so evaluations are repeatable.
+    Each process creates its own task and agent once, the same as `DistributedRunner`'s actors, so both
+    `task_fn` and `agent_fn` need to be picklable and `agent_fn` needs to accept the `device` keyword argument.
+
+    >>> evaluator = Evaluator(partial(GymTask, "CartPole-v1"), partial(DQNAgent, 4, 2), num_episodes=10)
+    >>> evaluator.submit(agent, episode=100)
+    >>> evaluator.poll()  # Results of finished evaluations, e.g. [{'episode': 100, 'mean_score': 20.5, ...}]
+    >>> evaluator.close()
+    """
+
+    def __init__(
+        self, task_fn: Callable[[], TaskType], agent_fn: Callable[..., AgentType], num_episodes: int=10,
+        num_workers: int=2, max_iterations: int=1000, seed: int=0, max_pending: int=1, start_method: str="spawn",
+    ):
+        self.logger = logging.getLogger("Evaluator")
+        self.num_episodes = num_episodes
+        self.num_workers = num_workers
+        self.max_iterations = max_iterations
+        self.seed = seed
+        self.max_pending = max_pending
+        self.pool = ProcessPoolExecutor(
+            max_workers=num_workers, mp_context=mp.get_context(start_method),
+            initializer=_init_worker, initargs=(task_fn, agent_fn),
+        )
+        self.pending: List[Tuple[Optional[int], List[Future]]] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def submit(self, agent: AgentType, episode: Optional[int]=None) -> bool:
+        """
+        Starts an evaluation of the agent's current policy; `episode` is only attached to the result.
+        Returns False, and doesn't start, when `max_pending` evaluations are still running.
+        """
+        if len(self.pending) >= self.max_pending:
+            self.logger.warning("Skipping evaluation of episode %s; %d evaluations are still running", episode, len(self.pending))
+            return False
+
+        self.pending.append((episode, self._start(agent)))
+        return True
+
+    def _start(self, agent: AgentType) -> List[Future]:
+        modules_state = [cpu_snapshot(module.state_dict()) for module in acting_modules(agent)]
+        seeds = [self.seed + idx for idx in range(self.num_episodes)]
+        chunks = [seeds[worker::self.num_workers] for worker in range(self.num_workers)]
+        return [self.pool.submit(_evaluate_episodes, modules_state, chunk, self.max_iterations) for chunk in chunks if chunk]
+
+    def _result(self, episode: Optional[int], futures: List[Future]) -> Dict[str, Any]:
+        episodes = sorted(result for future in futures for result in future.result())
+        (_, scores, iterations) = zip(*episodes)
+        result: Dict[str, Any] = {'episode': episode, 'num_episodes': len(scores), **aggregate(scores, iterations)}
+        result['scores'] = list(scores)
+        return result
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """Results of evaluations which have finished, in order of submitting. Doesn't block."""
+        results = []
+        while self.pending and all(future.done() for future in self.pending[0][1]):
+            results.append(self._result(*self.pending.pop(0)))
+        return results
+
+    def wait(self) -> List[Dict[str, Any]]:
+        """Blocks until all submitted evaluations finish and returns their results."""
+        results = []
+        while self.pending:
+            results.append(self._result(*self.pending.pop(0)))
+        return results
+
+    def evaluate(self, agent: AgentType, episode: Optional[int]=None) -> Dict[str, Any]:
+        """Evaluates the agent and waits for the result. Pending evaluations aren't affected."""
+        return self._result(episode, self._start(agent))
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.pending = []
@@ -0,0 +1,138 @@
+import json
+import mmap
+import struct
+import torch
+
+from ai_traineree.types import AgentType
+
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+MAGIC = b"AITFLAT1"
+ALIGNMENT = 64
+_HEADER_LEN = struct.Struct("<Q")
+
+StateType = Dict[str, Union[torch.Tensor, Dict[str, torch.Tensor]]]
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_flat(state: StateType, path: str, metadata: Optional[Dict[str, Any]]=None) -> None:
+    """
+    Writes a state, e.g. agent's `get_state()`, as a JSON header followed by raw tensor blobs.
+
+    The state maps names either to tensors or to state dicts of tensors. Blobs are aligned to `ALIGNMENT` bytes
+    so that `load_flat` can use them in place from a memory mapped file. JSON compatible `metadata` is stored in the header.
+    """
+    entries = []
+    for (group, value) in state.items():
+        tensors = value.items() if isinstance(value, dict) else [(None, value)]
+        for (name, tensor) in tensors:
+            if not isinstance(tensor, torch.Tensor):
+                raise TypeError(f"Flat checkpoints only store tensors, but '{group}' has {type(tensor).__name__}")
+            entries.append((group, name, tensor.detach().to('cpu').contiguous()))
+
+    header: Dict[str, Any] = {'metadata': metadata or {}, 'tensors': {}}
+    offset = 0
+    for (group, name, tensor) in entries:
+        nbytes = tensor.numel() * tensor.element_size()
+        spec = {'dtype': str(tensor.dtype)[len('torch.'):], 'shape': list(tensor.shape), 'offset': offset, 'nbytes': nbytes}
+        if name is None:
+            header['tensors'][group] = spec
+        else:
+            header['tensors'].setdefault(group, {})[name] = spec
+        offset = _align(offset + nbytes)
+
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(len(MAGIC) + _HEADER_LEN.size + len(header_bytes))
+    with open(path, 'wb') as f:
+        f.write(MAGIC + _HEADER_LEN.pack(len(header_bytes)) + header_bytes)
+        for (group, name, tensor) in entries:
+            spec = header['tensors'][group] if name is None else header['tensors'][group][name]
+            f.seek(data_start + spec['offset'])
+            if spec['nbytes']:
+                f.write(tensor.view(-1).view(torch.uint8).numpy().tobytes())
+        f.truncate(data_start + offset)
+
+
+def is_flat(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _read_header(path: str) -> Tuple[Dict[str, Any], int]:
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"'{path}' isn't a flat checkpoint")
+        (header_len,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+        header = json.loads(f.read(header_len))
+    return header, _align(len(MAGIC) + _HEADER_LEN.size + header_len)
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    """Reads only the header, i.e. `metadata` and specs of all `tensors`, of a flat checkpoint."""
+    return _read_header(path)[0]
+
+
+def load_flat(path: str, keys: Optional[Sequence[str]]=None) -> StateType:
+    """
+    Loads a checkpoint written by `save_flat` without copying tensors' data.
+
+    The file is memory mapped copy-on-write so returned tensors are views of the page cache; pages are only read
+    when they're used and writing to tensors doesn't change the file. With `keys` only those top-level entries,
+    e.g. `("actor",)` for inference, are loaded.
+    """
+    (header, data_start) = _read_header(path)
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    def tensor(spec):
+        dtype = getattr(torch, spec['dtype'])
+        if spec['nbytes'] == 0:
+            return torch.empty(spec['shape'], dtype=dtype)
+        count = spec['nbytes'] // torch.empty((), dtype=dtype).element_size()
+        return torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + spec['offset']).view(spec['shape'])
+
+    state: StateType = {}
+    for (group, specs) in header['tensors'].items():
+        if keys is not None and group not in keys:
+            continue
+        if 'dtype' in specs and 'offset' in specs:
+            state[group] = tensor(specs)
+        else:
+            state[group] = {name: tensor(spec) for (name, spec) in specs.items()}
+    return state
+
+
+def load_checkpoint(path: str, keys: Optional[Sequence[str]]=None) -> Dict[str, Any]:
+    """
+    Loads agent's state saved either with `save_flat` or with `torch.save`, e.g. by agent's `save_state`.
+    Files from `torch.save` are memory mapped, when possible, so only the used `keys` are read from disk.
+    Memory mapping needs torch>=2.1; with older versions files are loaded whole.
+    """
+    if is_flat(path):
+        return load_flat(path, keys)
+    try:
+        state = torch.load(path, mmap=True, map_location='cpu')
+    except (RuntimeError, TypeError):
+        # Legacy, non-zip, files can't be memory mapped and torch<2.1 doesn't know `mmap`
+        state = torch.load(path, map_location='cpu')
+    if keys is not None:
+        state = {key: value for (key, value) in state.items() if key in keys}
+    return state
+
+
+def load_modules(agent: AgentType, path: str, keys: Sequence[str]) -> None:
+    """
+    Loads only `keys` of agent's checkpoint into agent's attributes of the same names, e.g. `("actor",)`.
+
+    >>> agent = DDPGAgent(state_size, action_size)
+    >>> load_modules(agent, "run_states/agent_e100.agent", ("actor",))
+    """
+    state = load_checkpoint(path, keys)
+    missing = set(keys) - set(state)
+    if missing:
+        raise KeyError(f"Checkpoint '{path}' has no {sorted(missing)}")
+    for key in keys:
+        getattr(agent, key).load_state_dict(state[key])
@@ -0,0 +1,122 @@
+import threading
+import time
+
+from ai_traineree.types import AgentType
+
+from collections import deque
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+# `step` is agent's step and includes `learn` when the agent learns on the same thread
+PHASES = ('act', 'env', 'step', 'learn', 'render', 'checkpoint')
+
+
+def restore_learn(agent: AgentType, learn: Callable) -> Callable[[], None]:
+    """Returns a function which undoes wrapping agent's `learn`, given the `learn` from before wrapping."""
+    own_attribute = 'learn' in vars(agent)
+
+    def restore():
+        if own_attribute:
+            agent.learn = learn  # type: ignore
+        else:
+            del agent.learn  # The class' method
+    return restore
+
+
+class PerfCounters:
+    """
+    Low-overhead throughput counters for runners.
+
+    Wall time of each phase, in `perf_counter_ns` nanoseconds, is accumulated for the current episode
+    together with the number of environment steps and gradient updates. Finished episodes are kept
+    in a rolling window of `window_len` episodes.
+    Runners are expected to accumulate times locally, e.g. in their step loop, and `add` them once per episode.
+    Counters are guarded with a lock as agent's `learn` may run on a background thread.
+
+    >>> perf = PerfCounters()
+    >>> perf.attach(agent)  # Counts and times agent's `learn` until `detach`
+    >>> perf.start_episode()
+    >>> perf.add(env=env_ns, act=act_ns, steps=iterations)
+    >>> perf.stats()
+    """
+
+    def __init__(self, window_len: int=50):
+        self.window: deque = deque(maxlen=window_len)
+        self._lock = threading.Lock()
+        self._detach: Optional[Callable[[], None]] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets all episodes and starts counting a new one."""
+        with self._lock:
+            self.window.clear()
+            self.total_steps = 0
+            self.total_updates = 0
+            self._new_episode()
+
+    def _new_episode(self) -> None:
+        self._episode_start = time.perf_counter_ns()
+        self.episode_ns: Dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.episode_steps = 0
+        self.episode_updates = 0
+
+    def start_episode(self) -> None:
+        """Moves the current episode into the rolling window and starts counting a new one."""
+        with self._lock:
+            self.window.append((time.perf_counter_ns() - self._episode_start, self.episode_steps, self.episode_updates))
+            self._new_episode()
+
+    def add(self, steps: int=0, updates: int=0, **phases_ns: int) -> None:
+        """Adds the number of steps and updates, and nanoseconds spent in given phases, to the current episode."""
+        with self._lock:
+            self.episode_steps += steps
+            self.total_steps += steps
+            self.episode_updates += updates
+            self.total_updates += updates
+            for (phase, duration) in phases_ns.items():
+                self.episode_ns[phase] += duration
+
+    def attach(self, agent: AgentType) -> None:
+        """Wraps agent's `learn` so that each of its calls counts as an update and is timed. Replaces a previous attach."""
+        self.detach()
+        learn = agent.learn
+        restore = restore_learn(agent, learn)
+
+        @wraps(learn)
+        def counted_learn(*args, **kwargs):
+            t_start = time.perf_counter_ns()
+            result = learn(*args, **kwargs)
+            self.add(updates=1, learn=time.perf_counter_ns() - t_start)
+            return result
+
+        agent.learn = counted_learn  # type: ignore
+        self._detach = restore
+
+    def detach(self) -> None:
+        """Restores agent's `learn`. Hooks attached later to the same agent need to be detached first."""
+        if self._detach is not None:
+            self._detach()
+            self._detach = None
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Current episode's steps and updates per second, and the fraction of its wall time spent in each phase.
+        Rolling values are over the window of finished episodes and the current one.
+        """
+        with self._lock:
+            return self._stats()
+
+    def _stats(self) -> Dict[str, float]:
+        episode_ns = max(time.perf_counter_ns() - self._episode_start, 1)
+        stats = {
+            'steps_per_sec': self.episode_steps * 1e9 / episode_ns,
+            'updates_per_sec': self.episode_updates * 1e9 / episode_ns,
+        }
+
+        rolling_ns = episode_ns + sum(record[0] for record in self.window)
+        stats['rolling_steps_per_sec'] = (self.episode_steps + sum(record[1] for record in self.window)) * 1e9 / rolling_ns
+        stats['rolling_updates_per_sec'] = (self.episode_updates + sum(record[2] for record in self.window)) * 1e9 / rolling_ns
+
+        for (phase, duration) in self.episode_ns.items():
+            stats[f'{phase}_frac'] = duration / episode_ns
+        return stats
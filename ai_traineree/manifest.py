@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import os
+
+from typing import Any, Dict, List, Optional
+
+
+def file_sha256(path: str, chunk_size: int=1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CheckpointManifest:
+    """
+    Append-only index of checkpoints stored as JSON lines next to them.
+
+    Each line describes one checkpoint: its `name`, `episode`, `score`, `average_score` and `files`,
+    where every file has its `path` relative to the manifest's directory, `size` and `sha256`.
+    A line is appended with a single write and fsynced, so a crash can leave at most a partial last line
+    and such lines are skipped on reading. Checkpoints removed by a retention policy stay in the manifest
+    but `select` only returns those whose files still exist and match their sizes and, optionally, hashes.
+
+    >>> manifest = CheckpointManifest("run_states/CartPole_DQN.manifest.jsonl")
+    >>> manifest.append("CartPole_DQN_e10", {"agent": agent_path, "state": state_path}, episode=10, average_score=5.)
+    >>> manifest.select("best")["name"]
+    """
+
+    def __init__(self, path: str):
+        self.logger = logging.getLogger("CheckpointManifest")
+        self.path = path
+        self.dir_path = os.path.dirname(path) or '.'
+
+    def append(self, name: str, files: Dict[str, str], **fields: Any) -> Dict[str, Any]:
+        """Adds a checkpoint, made of already written `files` which map a role to a path, with any JSON `fields`."""
+        entry: Dict[str, Any] = dict(name=name, **fields)
+        entry['files'] = {
+            role: {
+                'path': os.path.relpath(path, self.dir_path),
+                'size': os.path.getsize(path),
+                'sha256': file_sha256(path),
+            }
+            for (role, path) in files.items()
+        }
+        os.makedirs(self.dir_path, exist_ok=True)
+        line = (json.dumps(entry) + '\n').encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return entry
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """All complete entries in order of appending. Empty when there's no manifest."""
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return entries
+
+    def file_path(self, entry: Dict[str, Any], role: str) -> str:
+        return os.path.join(self.dir_path, entry['files'][role]['path'])
+
+    def verify(self, entry: Dict[str, Any], check_hash: bool=False) -> bool:
+        """
+        Whether all entry's files exist and have their recorded sizes. With `check_hash` also their hashes,
+        which reads all the files. Files removed by a retention policy fail quietly, mismatches with a warning.
+        """
+        for (role, spec) in entry['files'].items():
+            path = self.file_path(entry, role)
+            if not os.path.exists(path):
+                return False
+            if os.path.getsize(path) != spec['size'] or (check_hash and file_sha256(path) != spec['sha256']):
+                self.logger.warning("Checkpoint '%s' has a corrupted %s file '%s'", entry['name'], role, path)
+                return False
+        return True
+
+    def select(self, which: str="latest", check_hash: bool=False) -> Optional[Dict[str, Any]]:
+        """
+        Returns an entry of either the `latest` appended checkpoint or the `best` one by its `average_score`.
+        Checkpoints which fail `verify` are skipped in favour of the next one. Only the manifest and file sizes
+        are read, unless `check_hash` is set. Returns None if there's no checkpoint with all files intact.
+        """
+        if which not in ('latest', 'best'):
+            raise ValueError(f"Unknown checkpoint selection '{which}'. Expected either 'latest' or 'best'.")
+        entries = self.entries()[::-1]
+        if which == 'best':
+            entries = [entry for entry in entries if entry.get('average_score') is not None]
+            entries.sort(key=lambda entry: entry['average_score'], reverse=True)
+        return next((entry for entry in entries if self.verify(entry, check_hash=check_hash)), None)
@@ -0,0 +1,173 @@
+import json
+import logging
+import math
+import threading
+import time
+import torch
+
+from ai_traineree.utils import QueueWorker
+
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+
+class Scalar(NamedTuple):
+    tag: str
+    value: Any
+    step: Optional[int]
+    walltime: float
+
+
+class MetricsBackend:
+    """Destination of scalars flushed by the `MetricsWriter`."""
+
+    def write(self, scalars: List[Scalar]) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class TensorBoardBackend(MetricsBackend):
+    """Writes scalars with TensorBoard's `SummaryWriter`, or anything else which has `add_scalar`."""
+
+    def __init__(self, writer=None, log_dir: Optional[str]=None):
+        if writer is None:
+            from torch.utils.tensorboard import SummaryWriter
+            writer = SummaryWriter(log_dir=log_dir)
+        self.writer = writer
+
+    def write(self, scalars: List[Scalar]) -> None:
+        for scalar in scalars:
+            self.writer.add_scalar(scalar.tag, scalar.value, scalar.step, walltime=scalar.walltime)
+
+    def flush(self) -> None:
+        if hasattr(self.writer, 'flush'):
+            self.writer.flush()
+
+    def close(self) -> None:
+        if hasattr(self.writer, 'close'):
+            self.writer.close()
+
+
+class JSONLBackend(MetricsBackend):
+    """
+    Appends each flushed batch as a single JSON line, in columns grouped by tag, i.e.
+    `{"loss/actor": {"step": [1, 2], "value": [0.5, 0.4], "walltime": [...]}, ...}`.
+    Non-finite values, e.g. NaN, are written as `null` so that every line is valid JSON.
+    Use `read_jsonl` to merge all lines back into columns.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(path, 'a')
+
+    def write(self, scalars: List[Scalar]) -> None:
+        columns: Dict[str, Dict[str, list]] = defaultdict(lambda: {'step': [], 'value': [], 'walltime': []})
+        for scalar in scalars:
+            column = columns[scalar.tag]
+            column['step'].append(scalar.step)
+            column['value'].append(scalar.value if math.isfinite(scalar.value) else None)
+            column['walltime'].append(round(scalar.walltime, 3))
+        self.file.write(json.dumps(columns, separators=(',', ':'), allow_nan=False) + '\n')
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def read_jsonl(path: str) -> Dict[str, Dict[str, list]]:
+    """Reads a file written by the `JSONLBackend`. Returns columns, `step`, `value` and `walltime`, of each tag.
+    Non-finite values are read as None."""
+    columns: Dict[str, Dict[str, list]] = defaultdict(lambda: {'step': [], 'value': [], 'walltime': []})
+    with open(path) as f:
+        for line in f:
+            for (tag, batch) in json.loads(line).items():
+                for (name, values) in batch.items():
+                    columns[tag][name].extend(values)
+    return dict(columns)
+
+
+class MetricsWriter:
+    """
+    Non-blocking metrics writer with the `add_scalar` API of TensorBoard's `SummaryWriter`.
+
+    Scalars are only queued in memory and a background thread flushes them, in batches, to all backends
+    every `flush_secs` seconds or as soon as `max_queue` scalars are waiting. Tensor values are copied
+    without synchronising the device and are converted to numbers on the background thread.
+    It can be passed anywhere a writer is expected, e.g. `EnvRunner(..., writer=MetricsWriter(...))`.
+
+    >>> writer = MetricsWriter([TensorBoardBackend(), JSONLBackend("runs/metrics.jsonl")])
+    >>> writer.add_scalar("loss/actor", 0.1, 10)
+    >>> writer.close()  # Flushes what's left
+    """
+
+    def __init__(self, backends: Sequence[MetricsBackend], flush_secs: float=5., max_queue: int=1000):
+        self.logger = logging.getLogger("MetricsWriter")
+        self.backends = list(backends)
+        self.flush_secs = flush_secs
+        self.max_queue = max_queue
+
+        self.queue: deque = deque()
+        self._write_lock = threading.Lock()
+        # Items of the worker's queue only wake it up; queued scalars are written also when it's idle for `flush_secs`
+        self.worker = QueueWorker(
+            lambda _: self._write_queued(), name="MetricsWriter", error_message="Writing metrics has failed",
+            queue_size=1, idle_secs=flush_secs, on_idle=self._write_queued,
+        )
+        self.worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add_scalar(self, tag: str, scalar_value, global_step: Optional[int]=None, walltime: Optional[float]=None) -> None:
+        if isinstance(scalar_value, torch.Tensor):
+            scalar_value = scalar_value.detach().clone()
+        self.queue.append(Scalar(tag, scalar_value, global_step, walltime if walltime is not None else time.time()))
+        if len(self.queue) >= self.max_queue and self.worker.queue.empty():
+            self.worker.put(None)
+
+    def _write_queued(self) -> None:
+        with self._write_lock:
+            scalars = []
+            while self.queue:
+                scalar = self.queue.popleft()
+                value = scalar.value.item() if isinstance(scalar.value, torch.Tensor) else float(scalar.value)
+                scalars.append(scalar._replace(value=value))
+            if not scalars:
+                return
+            for backend in self.backends:
+                try:
+                    backend.write(scalars)
+                except Exception:
+                    self.logger.exception("Failed to write metrics with %s", type(backend).__name__)
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wake_up.wait(self.flush_secs)
+            self._wake_up.clear()
+            self._write_queued()
+
+    def flush(self) -> None:
+        """Writes all queued scalars and flushes backends. Blocks until it's done."""
+        self._write_queued()
+        for backend in self.backends:
+            backend.flush()
+
+    def close(self) -> None:
+        if self.worker.closed:
+            return
+        self.worker.close()
+        self.flush()
+        for backend in self.backends:
+            backend.close()
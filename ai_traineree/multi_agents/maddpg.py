@@ -1,3 +1,4 @@
+import numpy as np
 import torch
 import torch.nn.functional as F
 import torch.optim as optim
@@ -6,13 +7,20 @@ from ai_traineree import DEVICE
 from ai_traineree.buffers import ReplayBuffer
 from ai_traineree.agents.ddpg import DDPGAgent
 from ai_traineree.agents.utils import hard_update, soft_update
-from ai_traineree.networks import CriticBody
+from ai_traineree.networks import BatchedActorBody, CriticBody
+from ai_traineree.noise import GaussianNoiseBank
 from ai_traineree.types import AgentType
 
 from typing import Dict, Optional
 
 
 class MADDPGAgent(AgentType):
+    """Multi Agent DDPG with a centralized critic.
+
+    With `batched` in config all agents' actors are stacked into a single `BatchedActorBody` and
+    every update uses one batch shared by all agents. Agents' critic targets and actor losses are
+    then computed together, rather than in a loop over agents each with its own batch.
+    """
 
     name = "MADDPG"
 
@@ -29,13 +37,27 @@ class MADDPGAgent(AgentType):
         actor_lr = float(config.get('actor_lr', 1e-3))
         critic_lr = float(config.get('critic_lr', 1e-3))
 
-        self.maddpg_agent = [
-            DDPGAgent(
-                agents_number*state_size, action_size, hidden_layers=hidden_layers,
-                actor_lr=actor_lr, critic_lr=critic_lr,
-                noise_scale=noise_scale, noise_sigma=noise_sigma
-            ) for _ in range(agents_number)
-        ]
+        self.batched: bool = bool(config.get('batched', False))
+        if self.batched:
+            self.maddpg_agent = []
+            self.actors = BatchedActorBody(agents_number, agents_number*state_size, action_size, hidden_layers).to(DEVICE)
+            self.target_actors = BatchedActorBody(agents_number, agents_number*state_size, action_size, hidden_layers).to(DEVICE)
+            self.actor_optimizer = optim.Adam(self.actors.parameters(), lr=actor_lr)
+            self.noise = GaussianNoiseBank(
+                shape=(action_size,), mu=1e-8, sigma=noise_sigma, scale=noise_scale, num_envs=agents_number, device=DEVICE
+            )
+
+            # Agent `i` owns columns [i*action_size, (i+1)*action_size) of the joint action
+            agent_mask = torch.eye(agents_number).repeat_interleave(action_size, dim=1).unsqueeze(1)
+            self.agent_mask = agent_mask.to(DEVICE)  # [A, 1, A*action_size]
+        else:
+            self.maddpg_agent = [
+                DDPGAgent(
+                    agents_number*state_size, action_size, hidden_layers=hidden_layers,
+                    actor_lr=actor_lr, critic_lr=critic_lr,
+                    noise_scale=noise_scale, noise_sigma=noise_sigma
+                ) for _ in range(agents_number)
+            ]
 
         self.gamma: float = float(config.get('gamma', 0.99))
         self.tau: float = float(config.get('tau', 0.002))
@@ -63,8 +85,12 @@ class MADDPGAgent(AgentType):
     def reset_agents(self):
         for agent in self.maddpg_agent:
             agent.reset_agent()
+        # Targets start as copies of the freshly initiated networks
+        if self.batched:
+            self.actors.reset_parameters()
+            hard_update(self.target_actors, self.actors)
         self.critic.reset_parameters()
-        self.target_critic.reset_parameters()
+        hard_update(self.target_critic, self.critic)
 
     def step(self, state, action, reward, next_state, done) -> None:
         self.iteration += 1
@@ -75,6 +101,9 @@ class MADDPGAgent(AgentType):
 
         if len(self.buffer) > self.batch_size and (self.iteration % self.update_freq) == 0:
             for _ in range(self.number_updates):
+                if self.batched:
+                    self.learn_batched(self.buffer.sample_sars())
+                    continue
                 for agent_number in range(self.agents_number):
                     batch = self.buffer.sample_sars()
                     self.learn(batch, agent_number)
@@ -82,15 +111,14 @@ class MADDPGAgent(AgentType):
 
     def act(self, states, noise=0.0):
         """get actions from all agents in the MADDPG object"""
-        tensor_states = torch.tensor(states)
-        with torch.no_grad():
-            actions = []
-            for agent in self.maddpg_agent:
-                agent.actor.eval()
-                actions += agent.act(tensor_states, noise)
-                agent.actor.train()
+        flat_states = np.asarray(states, dtype=np.float32).reshape(-1)
+        if not self.batched:
+            return np.stack([agent.act(flat_states, noise) for agent in self.maddpg_agent])
 
-        return torch.stack(actions)
+        with torch.no_grad():
+            tensor_states = torch.from_numpy(flat_states).to(DEVICE).view(1, -1)
+            actions = self.actors(tensor_states).squeeze(1) + noise*self.noise.sample()
+            return torch.clamp(actions, -1, 1).cpu().numpy()
 
     def __flatten_actions(self, actions):
         return actions.view(-1, self.agents_number*self.action_size)
@@ -110,7 +138,7 @@ class MADDPGAgent(AgentType):
 
         agent = self.maddpg_agent[agent_number]
 
-        next_actions = actions.detach().clone()
+        next_actions = flat_actions.detach().clone()
         next_actions.data[:, action_offset:action_offset+self.action_size] = agent.target_actor(flat_next_states)
 
         # critic loss
@@ -128,7 +156,7 @@ class MADDPGAgent(AgentType):
         self.critic_loss = critic_loss.mean().item()
 
         # Compute actor loss
-        pred_actions = actions.detach().clone()
+        pred_actions = flat_actions.detach().clone()
         pred_actions.data[:, action_offset:action_offset+self.action_size] = agent.actor(flat_states)
 
         actor_loss = -self.critic(flat_states, self.__flatten_actions(pred_actions)).mean()
@@ -140,10 +168,56 @@ class MADDPGAgent(AgentType):
         soft_update(agent.target_actor, agent.actor, self.tau)
         soft_update(self.target_critic, self.critic, self.tau)
 
+    def __joint_actions(self, flat_actions, agent_actions):
+        """Returns [A, B, A*action_size] tensor where, for each agent, its part of the joint `flat_actions`
+        is replaced with the agent's own action from the [A, B, action_size] `agent_actions`."""
+        agent_actions = agent_actions.repeat(1, 1, self.agents_number)
+        return flat_actions*(1 - self.agent_mask) + agent_actions*self.agent_mask
+
+    def learn_batched(self, samples) -> None:
+        """update the critic and the actors of all the agents using a single shared batch"""
+        states, actions, rewards, next_states, dones = samples
+        flat_states = states.view(-1, self.agents_number*self.state_size)
+        flat_next_states = next_states.view(-1, self.agents_number*self.state_size)
+        flat_actions = actions.view(-1, self.agents_number*self.action_size)
+        agents_rewards = rewards.view(-1, self.agents_number).T.unsqueeze(-1)  # [A, B, 1]
+        agents_dones = dones.view(-1, self.agents_number).T.unsqueeze(-1)
+
+        # Critic targets for all agents in a single [A, B] pass
+        with torch.no_grad():
+            next_actions = self.__joint_actions(flat_actions, self.target_actors(flat_next_states))
+            stacked_next_states = flat_next_states.expand(self.agents_number, -1, -1)
+            Q_target_next = self.target_critic(stacked_next_states, next_actions)
+            Q_target = agents_rewards + (self.gamma * Q_target_next * (1 - agents_dones))
+
+        # critic loss; the sum over agents matches one sequential update per agent
+        Q_expected = self.critic(flat_states, flat_actions)
+        critic_loss = (Q_expected - Q_target).pow(2).mean(dim=(1, 2)).sum()
+
+        self.critic_optimizer.zero_grad()
+        critic_loss.backward()
+        if self.gradient_clip:
+            torch.nn.utils.clip_grad_norm_(self.critic.parameters(), self.gradient_clip)
+        self.critic_optimizer.step()
+        self.critic_loss = critic_loss.item() / self.agents_number
+
+        # Actor loss. Actors are independent so each gets only the gradient of its own term.
+        pred_actions = self.__joint_actions(flat_actions, self.actors(flat_states))
+        stacked_states = flat_states.expand(self.agents_number, -1, -1)
+        actor_loss = -self.critic(stacked_states, pred_actions).mean(dim=(1, 2)).sum()
+        self.actor_optimizer.zero_grad()
+        actor_loss.backward()
+        self.actor_optimizer.step()
+        self.actor_loss = actor_loss.item() / self.agents_number
+
+        self.update_targets()
+
     def update_targets(self):
         """soft update targets"""
         for ddpg_agent in self.maddpg_agent:
             soft_update(ddpg_agent.target_actor, ddpg_agent.actor, self.tau)
+        if self.batched:
+            soft_update(self.target_actors, self.actors, self.tau)
         soft_update(self.target_critic, self.critic, self.tau)
 
     def log_writer(self, writer, episode):
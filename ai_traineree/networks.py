@@ -7,7 +7,18 @@ from functools import reduce
 from typing import Optional, Sequence, Tuple, Union
 
 
+# Layers which behave differently in `train()` and `eval()` modes
+MODE_DEPENDENT_LAYERS = (nn.modules.dropout._DropoutNd, nn.modules.batchnorm._BatchNorm)
+
+
 class NetworkType(nn.Module):
+
+    _mode_dependent: Optional[bool] = None
+
+    # Set by `use_flat_storage`. Parameters and their gradients are views into these.
+    flat_params: Optional[torch.Tensor] = None
+    flat_grads: Optional[torch.Tensor] = None
+
     def act(self, *args):
         with torch.no_grad():
             self.eval()
@@ -15,6 +26,80 @@ class NetworkType(nn.Module):
             self.train()
             return x
 
+    def inference(self, *args):
+        """Fast forward pass meant only for interacting with the environment.
+
+        Runs under `torch.inference_mode` and toggles `eval()`/`train()` only when the network has layers
+        that depend on it. Whether it has any is checked once and cached.
+        Returned tensors are inference tensors and can't be used in autograd, e.g. for computing a loss.
+        """
+        if self._mode_dependent is None:
+            self._mode_dependent = any(isinstance(m, MODE_DEPENDENT_LAYERS) for m in self.modules())
+
+        with torch.inference_mode():
+            if not self._mode_dependent:
+                return self.forward(*args)
+            was_training = self.training
+            self.eval()
+            x = self.forward(*args)
+            self.train(was_training)
+            return x
+
+    def use_flat_storage(self) -> "NetworkType":
+        """Backs all parameters and their gradients with two contiguous 1D tensors, `flat_params` and `flat_grads`.
+
+        Gradient clipping, soft updates and weight copies can then be done as single vector operations.
+        Needs to be called after the network is moved to its device since `.to()` replaces parameters' storage.
+        Gradients are kept in `flat_grads` only as long as they're zeroed with `zero_grad` of this network
+        rather than of an optimizer, which would set them to None.
+        """
+        params = list(self.parameters())
+        numel = sum(param.numel() for param in params)
+        flat_params = torch.empty(numel, dtype=params[0].dtype, device=params[0].device)
+        flat_grads = torch.zeros_like(flat_params)
+
+        offset = 0
+        for param in params:
+            param_slice = slice(offset, offset + param.numel())
+            flat_params[param_slice].copy_(param.data.view(-1))
+            param.data = flat_params[param_slice].view_as(param)
+            param.grad = flat_grads[param_slice].view_as(param)
+            offset += param.numel()
+
+        self.flat_params = flat_params
+        self.flat_grads = flat_grads
+        self._flat_grad_views = [param.grad for param in params]
+        return self
+
+    def zero_grad(self, *args, **kwargs) -> None:
+        if self.flat_grads is None:
+            return super(NetworkType, self).zero_grad(*args, **kwargs)
+        self.flat_grads.zero_()
+        for (param, grad) in zip(self.parameters(), self._flat_grad_views):
+            param.grad = grad
+
+    def clip_grad_norm_(self, max_norm: float) -> torch.Tensor:
+        """Clips gradients of all parameters in-place. Returns the total norm."""
+        if self.flat_grads is None:
+            return nn.utils.clip_grad_norm_(self.parameters(), max_norm)
+        total_norm = self.flat_grads.norm()
+        self.flat_grads.mul_(torch.clamp(max_norm / (total_norm + 1e-6), max=1.0))
+        return total_norm
+
+    def get_flat_parameters(self) -> torch.Tensor:
+        """Returns a copy of all parameters as a single 1D tensor."""
+        if self.flat_params is None:
+            return nn.utils.parameters_to_vector(self.parameters()).detach()
+        return self.flat_params.detach().clone()
+
+    def set_flat_parameters(self, vector: torch.Tensor) -> None:
+        """Sets all parameters from a single 1D tensor, e.g. the one returned by `get_flat_parameters`."""
+        with torch.no_grad():
+            if self.flat_params is None:
+                nn.utils.vector_to_parameters(vector.to(next(self.parameters()).device), self.parameters())
+            else:
+                self.flat_params.copy_(vector)
+
 
 def hidden_init(layer: nn.Module):
     fan_in = layer.weight.data.size()[0]  # type: ignore
@@ -208,6 +293,105 @@ class DoubleCritic(NetworkType):
         return (self.critic_1(state, actions), self.critic_2(state, actions))
 
 
+class BatchedLinear(nn.Module):
+    """K independent linear layers evaluated with a single batched matmul.
+
+    Weights are stored as a [K, in, out] tensor and biases as [K, 1, out].
+    Input is either [K, B, in], i.e. separate for each member, or [B, in] which is shared by all members.
+    Output is always [K, B, out].
+    """
+    def __init__(self, num_members: int, in_features: int, out_features: int):
+        super(BatchedLinear, self).__init__()
+        self.num_members = num_members
+        self.in_features = in_features
+        self.out_features = out_features
+        self.weight = nn.Parameter(torch.empty(num_members, in_features, out_features))
+        self.bias = nn.Parameter(torch.empty(num_members, 1, out_features))
+        self.reset_parameters()
+
+    def reset_parameters(self, range_value: Optional[Tuple[float, float]]=None):
+        # Each member is initiated as `nn.Linear` after `layer_init(layer, range_value)`
+        bound = 1. / np.sqrt(self.in_features)
+        for member in range(self.num_members):
+            if range_value is not None:
+                self.weight.data[member].uniform_(*range_value)
+            nn.init.xavier_uniform_(self.weight.data[member])
+        nn.init.uniform_(self.bias, -bound, bound)
+
+    def forward(self, x):
+        if x.dim() == 2:
+            x = x.expand(self.num_members, -1, -1)
+        return torch.baddbmm(self.bias, x, self.weight)
+
+
+class EnsembleCritic(NetworkType):
+    """Ensemble of K critics, each with the `CriticBody` architecture, evaluated in one pass.
+
+    Members' weights are stacked and all layers are computed with batched matmuls, so the cost grows
+    much slower than K sequential critics. Outputs a [K, B, 1] tensor which can be unpacked or iterated
+    over like the tuple returned by `DoubleCritic`.
+    """
+    def __init__(self, input_dim: int, action_size: int, hidden_layers: Sequence[int]=(200, 100), num_critics: int=2):
+        super(EnsembleCritic, self).__init__()
+        self.num_critics = num_critics
+
+        num_layers = [input_dim] + list(hidden_layers) + [1]
+        layers = [BatchedLinear(num_critics, in_dim, out_dim) for in_dim, out_dim in zip(num_layers[:-1], num_layers[1:])]
+
+        # Injects `actions` into the second layer of each Critic
+        layers[1] = BatchedLinear(num_critics, num_layers[1]+action_size, num_layers[2])
+        self.layers = nn.ModuleList(layers)
+        self.gate = F.elu
+
+    def reset_parameters(self):
+        for layer in self.layers:
+            layer.reset_parameters()
+
+    def forward(self, x, actions):
+        actions = actions.float().expand(self.num_critics, -1, -1)
+        for idx, layer in enumerate(self.layers[:-1]):
+            if idx == 1:
+                x = self.gate(layer(torch.cat((x, actions), dim=-1)))
+            else:
+                x = self.gate(layer(x))
+        return self.layers[-1](x)
+
+
+class BatchedActorBody(NetworkType):
+    """K independent actors, each with the `ActorBody` architecture, evaluated in one pass.
+
+    Input is either [B, in], shared by all actors, or [K, B, in]. Output is [K, B, out].
+    """
+    def __init__(self, num_members: int, input_dim: int, output_dim: int, hidden_layers: Sequence[int]=(200, 100),
+                 gate=F.elu, gate_out=torch.tanh, last_layer_range=(-3e-3, 3e-3)):
+        super(BatchedActorBody, self).__init__()
+        self.num_members = num_members
+
+        num_layers = [input_dim] + list(hidden_layers) + [output_dim]
+        layers = [BatchedLinear(num_members, dim_in, dim_out) for dim_in, dim_out in zip(num_layers[:-1], num_layers[1:])]
+
+        self.last_layer_range = last_layer_range
+        self.layers = nn.ModuleList(layers)
+        self.reset_parameters()
+
+        self.gate = gate
+        self.gate_out = gate_out
+
+    def reset_parameters(self):
+        # Same ranges as `ActorBody` whose `hidden_init` takes the fan from `nn.Linear` weight's first, i.e. output, dimension
+        for layer in self.layers[:-1]:
+            lim = 1. / np.sqrt(layer.out_features)
+            layer.reset_parameters((-lim, lim))
+        self.layers[-1].reset_parameters(self.last_layer_range)
+
+    def forward(self, x):
+        for layer in self.layers[:-1]:
+            x = self.gate(layer(x))
+        if self.gate_out is None:
+            return self.layers[-1](x)
+        return self.gate_out(self.layers[-1](x))
+
+
 class DuelingNet(NetworkType):
     def __init__(self, state_size: int, action_size: int, hidden_layers: Sequence[int], precompute_net: Optional[NetworkType]=None):
         super(DuelingNet, self).__init__()
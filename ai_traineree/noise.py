@@ -1,8 +1,10 @@
+import math
 import torch
 import numpy as np
-from typing import Union, Sequence
+from typing import Any, Dict, Optional, Union, Sequence
 
 from ai_traineree import DEVICE
+from ai_traineree.utils import discounted_scan
 
 
 class GaussianNoise:
@@ -15,3 +17,98 @@ class GaussianNoise:
 
     def sample(self):
         return torch.tensor(self.scale * np.random.normal(self.mu, self.sigma, self.shape)).to(self.device)
+
+
+class GaussianNoiseBank:
+    """Gaussian noise generated directly on the `device` with a torch generator.
+
+    Noise is generated in blocks of `block_size` steps, each for `num_envs` envs if provided, and `sample`
+    returns a view of the next step in the block so there's no allocation nor host-device copy per step.
+    The returned view is overwritten when the block is regenerated, i.e. after `block_size` samples.
+    """
+    def __init__(
+        self, shape: Union[int, Sequence[int]], mu=0., sigma=1., scale=1., num_envs: Optional[int]=None,
+        block_size: int=1000, device=None, seed: Optional[int]=None,
+    ):
+        self.shape = (shape,) if isinstance(shape, int) else tuple(shape)
+        self.mu = mu
+        self.sigma = sigma
+        self.scale = scale
+        self.num_envs = num_envs
+        self.block_size = block_size
+        self.device = device if device is not None else DEVICE
+
+        self.generator = torch.Generator(device=self.device)
+        if seed is not None:
+            self.generator.manual_seed(seed)
+        else:
+            self.generator.seed()
+
+        sample_shape = self.shape if num_envs is None else (num_envs,) + self.shape
+        self.bank = torch.empty((block_size,) + sample_shape, device=self.device)
+        self.cursor = block_size  # Bank is generated on the first sample
+
+    def reset(self):
+        self.cursor = self.block_size
+
+    def _generate(self):
+        self.bank.normal_(self.mu, self.sigma, generator=self.generator).mul_(self.scale)
+
+    def sample(self) -> torch.Tensor:
+        if self.cursor >= self.block_size:
+            self._generate()
+            self.cursor = 0
+        noise = self.bank[self.cursor]
+        self.cursor += 1
+        return noise
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {'generator': self.generator.get_state(), 'bank': self.bank.clone(), 'cursor': self.cursor}
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        self.generator.set_state(state_dict['generator'])
+        self.bank.copy_(state_dict['bank'])
+        self.cursor = state_dict['cursor']
+
+
+class OUNoiseBank(GaussianNoiseBank):
+    """Ornstein-Uhlenbeck process, `dx = theta * (mu - x) * dt + sigma * sqrt(dt) * dW`, generated on the `device`.
+
+    Same as `GaussianNoiseBank` the noise is generated in blocks and served as views. Within a block the
+    process is computed with a vectorized scan and it continues from the last value of the previous block.
+    """
+    def __init__(
+        self, shape: Union[int, Sequence[int]], mu=0., theta=0.15, sigma=0.2, dt=1., scale=1.,
+        num_envs: Optional[int]=None, block_size: int=1000, device=None, seed: Optional[int]=None,
+    ):
+        super(OUNoiseBank, self).__init__(
+            shape, mu=mu, sigma=sigma, scale=scale, num_envs=num_envs, block_size=block_size, device=device, seed=seed,
+        )
+        self.theta = theta
+        self.dt = dt
+        self.state = torch.full(self.bank.shape[1:], float(mu), device=self.device)
+
+    def reset(self):
+        super(OUNoiseBank, self).reset()
+        self.state.fill_(self.mu)
+
+    def _generate(self):
+        # x[t+1] = decay * x[t] + theta * dt * mu + sigma * sqrt(dt) * N(0, 1)
+        decay = 1 - self.theta * self.dt
+        increments = self.bank.normal_(0, self.sigma * math.sqrt(self.dt), generator=self.generator)
+        increments.add_(self.theta * self.dt * self.mu)
+        increments[0].add_(self.state, alpha=decay)
+
+        # Forward recurrence is the backward discounted scan in reversed time
+        process = discounted_scan(increments.flip(0), torch.full_like(increments, decay)).flip(0)
+        self.state.copy_(process[-1])
+        self.bank.copy_(process).mul_(self.scale)
+
+    def state_dict(self) -> Dict[str, Any]:
+        state_dict = super(OUNoiseBank, self).state_dict()
+        state_dict['state'] = self.state.clone()
+        return state_dict
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        super(OUNoiseBank, self).load_state_dict(state_dict)
+        self.state.copy_(state_dict['state'])
@@ -1,28 +1,70 @@
+import math
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from torch.distributions import MultivariateNormal, Normal
+from typing import Optional, Tuple
+
+from ai_traineree.networks import hidden_init, layer_init
 
 
 class StochasticActorCritic(nn.Module):
-    def __init__(self, state_size, action_size, hidden_layers, actor=None, critic=None):
+    """Returns the action distribution and the state value.
+
+    If neither `actor` nor `critic` is provided then both are heads on top of a shared fully connected
+    trunk, so that the action mean and the value come out of a single forward pass.
+    The distribution is created by `policy` (e.g. `GaussianPolicy`) if provided.
+    """
+
+    def __init__(self, state_size, action_size, hidden_layers, actor=None, critic=None, policy=None):
         super(StochasticActorCritic, self).__init__()
         self.actor = actor
         self.critic = critic
+        self.policy = policy
+        self.shared = actor is None and critic is None
+
+        if self.shared:
+            num_layers = [state_size] + list(hidden_layers)
+            self.trunk = nn.ModuleList([nn.Linear(dim_in, dim_out) for dim_in, dim_out in zip(num_layers[:-1], num_layers[1:])])
+            self.actor_head = nn.Linear(num_layers[-1], action_size)
+            self.critic_head = nn.Linear(num_layers[-1], 1)
+            self.gate = F.elu
+            self.gate_out = torch.tanh
+            self.reset_parameters()
+
+        if self.policy is None:
+            self.std = nn.Parameter(torch.rand(action_size)*1e-1)
+            policy_params = [self.std]
+        else:
+            policy_params = list(self.policy.parameters())
+
+        if self.shared:
+            self.actor_params = list(self.trunk.parameters()) + list(self.actor_head.parameters()) + policy_params
+            self.critic_params = list(self.critic_head.parameters())
+        else:
+            self.actor_params = list(self.actor.parameters()) + policy_params
+            self.critic_params = list(self.critic.parameters())
+
+    def reset_parameters(self):
+        for layer in self.trunk:
+            layer_init(layer, hidden_init(layer))
+        layer_init(self.actor_head, (-3e-3, 3e-3))
+        layer_init(self.critic_head, hidden_init(self.critic_head))
+
+    def mu_value(self, x):
+        """Returns the action mean and the state value."""
+        if not self.shared:
+            return self.actor(x), self.critic(x)
 
-        self.std = nn.Parameter(torch.rand(action_size)*1e-1)
-        self.actor_params = list(self.actor.parameters()) + [self.std]
-        self.critic_params = list(self.critic.parameters())
+        for layer in self.trunk:
+            x = self.gate(layer(x))
+        return self.gate_out(self.actor_head(x)), self.critic_head(x)
 
     def forward(self, x):
-        # action_mu = self.actor(x.detach())
-        action_mu = self.actor(x)
-        value = self.critic(x)
-        # value = self.critic(x, action_mu.detach())
-        # value = self.critic(x.detach())
-        # dist = Normal(action_mu, F.softmax(self.std))
-        dist = Normal(action_mu, F.relu(self.std))
-        return dist, value
+        action_mu, value = self.mu_value(x)
+        if self.policy is not None:
+            return self.policy(action_mu), value
+        return Normal(action_mu, F.relu(self.std)), value
 
 
 class GaussianPolicy(nn.Module):
@@ -39,6 +81,73 @@ class GaussianPolicy(nn.Module):
         return self.dist(x, torch.diag(diag))
 
 
+class DiagonalGaussian:
+    """Normal distribution with independent action dimensions, optionally squashed with tanh.
+
+    Unlike `MultivariateNormal` with a diagonal covariance it doesn't need any matrix factorisation.
+    `log_prob` and `entropy` are summed over the last (action) dimension. For squashed distributions
+    the entropy is that of the underlying Normal as the squashed one has no closed form.
+    """
+
+    _eps = 1e-6
+
+    def __init__(self, loc: torch.Tensor, scale: torch.Tensor, squash: bool=False):
+        self.loc = loc
+        self.scale = scale
+        self.squash = squash
+        self._cache: Optional[Tuple[torch.Tensor, torch.Tensor]] = None  # (sample, pre-tanh sample)
+
+    @property
+    def mean(self) -> torch.Tensor:
+        return torch.tanh(self.loc) if self.squash else self.loc
+
+    def rsample(self, sample_shape=torch.Size()) -> torch.Tensor:
+        shape = torch.Size(sample_shape) + torch.broadcast_shapes(self.loc.shape, self.scale.shape)
+        x = self.loc + self.scale * torch.randn(shape, dtype=self.loc.dtype, device=self.loc.device)
+        if not self.squash:
+            return x
+        y = torch.tanh(x)
+        self._cache = (y, x)
+        return y
+
+    def sample(self, sample_shape=torch.Size()) -> torch.Tensor:
+        with torch.no_grad():
+            return self.rsample(sample_shape)
+
+    def log_prob(self, value: torch.Tensor) -> torch.Tensor:
+        if not self.squash:
+            return self._normal_log_prob(value).sum(-1)
+
+        if self._cache is not None and self._cache[0] is value:
+            x = self._cache[1]
+        else:
+            x = torch.atanh(torch.clamp(value, -1 + self._eps, 1 - self._eps))
+        # Change of variables for y = tanh(x)
+        return (self._normal_log_prob(x) - torch.log(1 - value.pow(2) + self._eps)).sum(-1)
+
+    def entropy(self) -> torch.Tensor:
+        entropy = 0.5 + 0.5 * math.log(2 * math.pi) + torch.log(self.scale)
+        return entropy.expand_as(self.loc).sum(-1)
+
+    def _normal_log_prob(self, x: torch.Tensor) -> torch.Tensor:
+        return -((x - self.loc) ** 2) / (2 * self.scale ** 2) - torch.log(self.scale) - 0.5 * math.log(2 * math.pi)
+
+
+class DiagGaussianPolicy(nn.Module):
+    """Fast alternative to `GaussianPolicy`. Returns `DiagonalGaussian` with a learnable std."""
+
+    def __init__(self, size, squash: bool=False):
+        super(DiagGaussianPolicy, self).__init__()
+        self.squash = squash
+        self.std = nn.Parameter(torch.rand(size)*0.5 + 0.5)
+        self.std_min = 0.001
+        self.std_max = 2
+
+    def forward(self, x):
+        """Returns distribution"""
+        return DiagonalGaussian(x, torch.clamp(self.std, self.std_min, self.std_max), squash=self.squash)
+
+
 class DeterministicPolicy(nn.Module):
     def __init__(self, size):
         super(DeterministicPolicy, self).__init__()
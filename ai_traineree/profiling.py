@@ -0,0 +1,144 @@
+import cProfile
+import logging
+import time
+import torch
+import torch.nn as nn
+
+from ai_traineree.types import AgentType
+
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+# Agents' attributes with networks which are worth timing
+PROFILED_MODULES = ('net', 'actor', 'critic', 'double_critic', 'actor_critic')
+
+
+class EpisodeProfiler:
+    """
+    Profiles a window of episodes, from `first_episode` to `last_episode` inclusive, and writes the profile to disk.
+
+    With `kind` "cprofile" the profile is written to `{path}.prof`, e.g. for `pstats` or `snakeviz`.
+    With `kind` "torch" the `torch.profiler` (CPU activities, record shapes and stack) writes a Chrome trace
+    to `{path}.json` and a table of operators, sorted by their self CPU time, to `{path}.txt`.
+    """
+
+    def __init__(self, kind: str, first_episode: int, last_episode: int, path: str):
+        if kind not in ('cprofile', 'torch'):
+            raise ValueError(f"Unknown profiler '{kind}'. Expected either 'cprofile' or 'torch'.")
+        self.logger = logging.getLogger("EpisodeProfiler")
+        self.kind = kind
+        self.first_episode = first_episode
+        self.last_episode = last_episode
+        self.path = path
+        self.profiler = None
+
+    @property
+    def active(self) -> bool:
+        return self.profiler is not None
+
+    def episode_start(self, episode: int) -> None:
+        if episode != self.first_episode or self.active:
+            return
+        if self.kind == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True, with_stack=True,
+            )
+            self.profiler.__enter__()
+
+    def episode_end(self, episode: int) -> None:
+        if episode >= self.last_episode:
+            self.stop()
+
+    def stop(self) -> None:
+        """Stops profiling, if it's active, and writes the profile."""
+        if not self.active:
+            return
+        profiler, self.profiler = self.profiler, None
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        if self.kind == 'cprofile':
+            profiler.disable()
+            profiler.dump_stats(f"{self.path}.prof")
+            self.logger.info("Written cProfile stats to %s.prof", self.path)
+        else:
+            profiler.__exit__(None, None, None)
+            profiler.export_chrome_trace(f"{self.path}.json")
+            with open(f"{self.path}.txt", "w") as f:
+                f.write(profiler.key_averages().table(sort_by="self_cpu_time_total"))
+            self.logger.info("Written torch.profiler trace to %s.json and table to %s.txt", self.path, self.path)
+
+
+class ModuleTimers:
+    """
+    Measures wall time of forward and backward passes of agent's networks using hooks, i.e. without code changes.
+
+    Forward is timed from the forward pre-hook to the forward hook. Backward is timed from when the gradient
+    of the module's output is ready until the last of its parameters' gradients is. Calls are synchronous
+    on CPU; on GPU times include only kernels' launches unless the device is synchronised.
+    Hooks only see calls of the module itself, so `NetworkType.act` and `inference`, which call `forward`
+    directly, aren't timed.
+
+    >>> timers = ModuleTimers()
+    >>> timers.attach(agent)  # Hooks `net`, `actor`, `critic` and `double_critic`, whichever exist
+    >>> timers.stats()  # Average forward and backward time, in milliseconds, of each module
+    >>> timers.detach()
+    """
+
+    def __init__(self):
+        self.forward_ns: Dict[str, int] = defaultdict(int)
+        self.forward_calls: Dict[str, int] = defaultdict(int)
+        self.backward_ns: Dict[str, int] = defaultdict(int)
+        self.backward_calls: Dict[str, int] = defaultdict(int)
+        self._handles: List = []
+
+    def attach(self, agent: AgentType, names: Sequence[str]=PROFILED_MODULES) -> None:
+        for name in names:
+            module = getattr(agent, name, None)
+            if isinstance(module, nn.Module):
+                self.attach_module(name, module)
+
+    def attach_module(self, name: str, module: nn.Module) -> None:
+        marks: Dict[str, Optional[int]] = {'forward': None, 'backward': None}
+
+        def output_grad_hook(grad):
+            marks['backward'] = time.perf_counter_ns()
+            self.backward_calls[name] += 1
+
+        def param_grad_hook(grad):
+            if marks['backward'] is not None:
+                now = time.perf_counter_ns()
+                self.backward_ns[name] += now - marks['backward']
+                marks['backward'] = now
+
+        def forward_pre_hook(module, inputs):
+            marks['forward'] = time.perf_counter_ns()
+
+        def forward_hook(module, inputs, output):
+            self.forward_ns[name] += time.perf_counter_ns() - marks['forward']
+            self.forward_calls[name] += 1
+            outputs = output if isinstance(output, (tuple, list)) else (output,)
+            first_output = next((out for out in outputs if isinstance(out, torch.Tensor) and out.requires_grad), None)
+            if first_output is not None:
+                first_output.register_hook(output_grad_hook)
+
+        self._handles.append(module.register_forward_pre_hook(forward_pre_hook))
+        self._handles.append(module.register_forward_hook(forward_hook))
+        for param in module.parameters():
+            if param.requires_grad:
+                self._handles.append(param.register_hook(param_grad_hook))
+
+    def detach(self) -> None:
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+
+    def stats(self) -> Dict[str, float]:
+        stats = {}
+        for (name, calls) in self.forward_calls.items():
+            stats[f"{name}_forward_ms"] = self.forward_ns[name] * 1e-6 / calls
+        for (name, calls) in self.backward_calls.items():
+            stats[f"{name}_backward_ms"] = self.backward_ns[name] * 1e-6 / calls
+        return stats
@@ -0,0 +1,88 @@
+import os
+import zipfile
+import numpy as np
+
+from ai_traineree.utils import QueueWorker
+
+from pathlib import Path
+
+
+class EpisodeRecorder:
+    """
+    Records frames, e.g. `task.render(mode='rgb_array')`, into a GIF or a raw `.npz` file as they come.
+
+    Each frame is downscaled on `add`, by taking every `downscale` pixel in both directions, and put into a queue
+    of at most `queue_size` frames. A background thread encodes queued frames one by one and appends them
+    to the file, so memory doesn't depend on the episode's length; `add` blocks only when the encoder falls behind.
+    The format is taken from the path's extension. GIFs, which require Pillow, are shown with `duration`
+    milliseconds per frame and every frame has its own palette. The npz archive has a `frame_{idx:06d}` array per frame.
+
+    >>> recorder = EpisodeRecorder("gifs/episode.gif")
+    >>> recorder.add(task.render(mode="rgb_array"))
+    >>> recorder.finish()  # Returns immediately, `close` waits until the file is complete
+    """
+
+    def __init__(self, path: str, downscale: int=2, queue_size: int=64, duration: int=40, compress: bool=False):
+        self.path = path
+        self.format = os.path.splitext(path)[1][1:].lower()
+        if self.format not in ('gif', 'npz'):
+            raise ValueError(f"Unsupported recording format '{self.format}'. Expected either 'gif' or 'npz'.")
+        if self.format == 'gif':
+            from PIL import GifImagePlugin, Image  # noqa: F401  Fail early, rather than on the encoder thread
+        self.downscale = downscale
+        self.duration = duration
+        self.compress = compress
+        self.num_frames = 0
+        self.num_encoded = 0
+
+        Path(os.path.dirname(path) or '.').mkdir(parents=True, exist_ok=True)
+        if self.format == 'gif':
+            self.file = open(path, 'wb')
+        else:
+            compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            self.file = zipfile.ZipFile(path, 'w', compression=compression)
+        self.worker = QueueWorker(
+            self._encode_gif if self.format == 'gif' else self._encode_npz, name="EpisodeRecorder",
+            error_message=f"Recording to {path} has failed", queue_size=queue_size, on_close=self._close_file,
+        )
+        self.worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, frame: np.ndarray) -> None:
+        if self.worker.closed:
+            raise RuntimeError("Recorder is already finished")
+        frame = np.ascontiguousarray(frame[::self.downscale, ::self.downscale])
+        self.worker.put(frame)
+        self.num_frames += 1
+
+    def finish(self) -> None:
+        """Marks the end of frames without waiting for the file to be written."""
+        self.worker.finish()
+
+    def close(self) -> None:
+        """Finishes and waits until the file is complete."""
+        self.worker.close()
+
+    def _encode_gif(self, frame: np.ndarray) -> None:
+        from PIL import GifImagePlugin, Image
+        image = Image.fromarray(frame).convert('P', palette=Image.Palette.ADAPTIVE)
+        if self.num_encoded == 0:
+            (header, _) = GifImagePlugin.getheader(image, info={'loop': 0, 'duration': self.duration})
+            self.file.write(b''.join(header))
+        self.file.write(b''.join(GifImagePlugin.getdata(image, duration=self.duration, include_color_table=True)))
+        self.num_encoded += 1
+
+    def _encode_npz(self, frame: np.ndarray) -> None:
+        with self.file.open(f"frame_{self.num_encoded:06d}.npy", 'w', force_zip64=True) as f:
+            np.lib.format.write_array(f, frame, allow_pickle=False)
+        self.num_encoded += 1
+
+    def _close_file(self) -> None:
+        if self.format == 'gif' and self.num_encoded > 0 and self.worker.error is None:
+            self.file.write(b';')  # GIF trailer
+        self.file.close()
@@ -0,0 +1,115 @@
+import threading
+import time
+
+from ai_traineree.instrumentation import restore_learn
+from ai_traineree.types import AgentType
+
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+PHASES = ('env', 'act', 'learn')
+
+
+class ReplayRatioScheduler:
+    """
+    Decides how many gradient updates an agent does per environment step, i.e. the replay ratio.
+
+    Wall times of an environment step (`env`), acting (`act`) and a single learning update (`learn`) are
+    tracked with exponential moving averages. In the `ratio` mode the scheduler keeps the long-run
+    ratio at `target_ratio`; fractional ratios are spread over steps, e.g. 0.25 means an update every
+    fourth step. In the `throughput` mode the ratio is set so that time spent learning is `balance` times
+    the time spent interacting, where a background learner (see `BackgroundLearner`) and the environment
+    both stay busy and neither waits on the other. Until a learning update is measured it uses `target_ratio`.
+    In both modes the ratio is clipped to [`min_ratio`, `max_ratio`].
+    Only `learn` calls which actually happen count as updates, so updates skipped by the agent, e.g. during
+    its warm up or until its buffer has a batch, lower the achieved ratio. `learn` may be called on another thread.
+
+    >>> scheduler = ReplayRatioScheduler(mode="throughput", max_ratio=4)
+    >>> scheduler.attach(agent)  # Times and counts agent's `learn` until `detach`
+    >>> scheduler.record("env", env_step_duration)
+    >>> agent.number_updates = scheduler.updates()
+    """
+
+    def __init__(
+        self, mode: str="ratio", target_ratio: float=1., min_ratio: float=0., max_ratio: float=8.,
+        balance: float=1., ema_decay: float=0.99,
+    ):
+        if mode not in ('ratio', 'throughput'):
+            raise ValueError(f"Unknown mode '{mode}'. Expected either 'ratio' or 'throughput'.")
+        if not (0 <= min_ratio <= max_ratio):
+            raise ValueError("Expected 0 <= min_ratio <= max_ratio")
+
+        self.mode = mode
+        self.target_ratio = target_ratio
+        self.min_ratio = min_ratio
+        self.max_ratio = max_ratio
+        self.balance = balance
+        self.ema_decay = ema_decay
+
+        self.times: Dict[str, Optional[float]] = {phase: None for phase in PHASES}
+        self.total_steps = 0
+        self.total_updates = 0
+        self._credit = 0.
+        self._lock = threading.Lock()
+        self._detach: Optional[Callable[[], None]] = None
+
+    def record(self, phase: str, duration: float) -> None:
+        """Adds a measured wall time, in seconds, of a single `env` step, `act` call or `learn` update."""
+        with self._lock:
+            previous = self.times[phase]
+            if previous is None:
+                self.times[phase] = duration
+            else:
+                self.times[phase] = self.ema_decay*previous + (1 - self.ema_decay)*duration
+
+    def attach(self, agent: AgentType) -> None:
+        """Wraps agent's `learn` so that each of its calls is timed and counted as an update. Replaces a previous attach."""
+        self.detach()
+        learn = agent.learn
+        restore = restore_learn(agent, learn)
+
+        @wraps(learn)
+        def timed_learn(*args, **kwargs):
+            t_start = time.perf_counter_ns()
+            result = learn(*args, **kwargs)
+            self.record('learn', (time.perf_counter_ns() - t_start)*1e-9)
+            with self._lock:
+                self.total_updates += 1
+            return result
+
+        agent.learn = timed_learn  # type: ignore
+        self._detach = restore
+
+    def detach(self) -> None:
+        """Restores agent's `learn`. Hooks attached later to the same agent need to be detached first."""
+        if self._detach is not None:
+            self._detach()
+            self._detach = None
+
+    @property
+    def ratio(self) -> float:
+        """Current number of gradient updates per environment step."""
+        ratio = self.target_ratio
+        learn_time = self.times['learn']
+        if self.mode == 'throughput' and learn_time:
+            interact_time = (self.times['env'] or 0.) + (self.times['act'] or 0.)
+            ratio = self.balance * interact_time / learn_time
+        return min(max(ratio, self.min_ratio), self.max_ratio)
+
+    def updates(self) -> int:
+        """Number of updates for the current environment step. Call once per step."""
+        self._credit += self.ratio
+        num_updates = int(self._credit)
+        self._credit -= num_updates
+        self.total_steps += 1
+        return num_updates
+
+    def stats(self) -> Dict[str, float]:
+        """Current ratio, achieved ratio and the average times in milliseconds."""
+        stats = {'replay_ratio': self.ratio, 'achieved_replay_ratio': self.total_updates / max(self.total_steps, 1)}
+        with self._lock:
+            times = dict(self.times)
+        for (phase, duration) in times.items():
+            if duration is not None:
+                stats[f'{phase}_ms'] = duration*1e3
+        return stats
@@ -0,0 +1,96 @@
+import torch
+import torch.nn as nn
+
+from typing import Dict, List, Sequence, Tuple
+
+
+class SharedWeights:
+    """
+    Lock-free, versioned broadcast of networks' weights from a single writer to many reader processes.
+
+    Weights are kept in shared memory as two flat slots (double buffering) next to a sequence counter
+    (seqlock). Publishing version `v` sets the counter to `2v - 1`, writes slot `v % 2` and sets the
+    counter to `2v`. Readers always copy the latest complete version, whose slot isn't being written,
+    and only retry when the writer lapped them, i.e. started writing to that slot again, during the copy.
+    Neither side ever waits for the other.
+
+    The layout is the order of modules' parameters, same as in their `flat_params` if they use flat
+    storage (see `NetworkType.use_flat_storage`), which is then copied with a single operation.
+
+    >>> shared_weights = SharedWeights([agent.actor])  # Learner, before starting actor processes
+    >>> shared_weights.publish([agent.actor])  # Learner, whenever it wants to share its weights
+    >>> shared_weights.pull([local_actor])  # Actor process; returns whether there was a new version
+    """
+
+    def __init__(self, modules: Sequence[nn.Module], max_retries: int=3):
+        targets = self._targets(modules)
+        numel = sum(target.numel() for target in targets)
+        self.slots = torch.zeros((2, numel), dtype=targets[0].dtype).share_memory_()
+        self.seq = torch.zeros(1, dtype=torch.int64).share_memory_()
+        self.max_retries = max_retries
+
+        # Process local, i.e. each process which got this object tracks its own state
+        self.local_version = -1
+        self._slot_views: Dict[Tuple, List[torch.Tensor]] = {}
+
+        self.publish(modules)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['local_version'] = -1
+        state['_slot_views'] = {}
+        return state
+
+    @property
+    def version(self) -> int:
+        """Latest completely published version."""
+        return int(self.seq.item()) // 2
+
+    @staticmethod
+    def _targets(modules: Sequence[nn.Module]) -> List[torch.Tensor]:
+        targets: List[torch.Tensor] = []
+        for module in modules:
+            flat_params = getattr(module, "flat_params", None)
+            if flat_params is not None:
+                targets.append(flat_params)
+            else:
+                targets.extend(param.data for param in module.parameters())
+        return targets
+
+    def _views(self, slot: int, targets: List[torch.Tensor]) -> List[torch.Tensor]:
+        key = (slot,) + tuple(target.shape for target in targets)
+        if key not in self._slot_views:
+            chunks = self.slots[slot].split([target.numel() for target in targets])
+            self._slot_views[key] = [chunk.view_as(target) for (chunk, target) in zip(chunks, targets)]
+        return self._slot_views[key]
+
+    @torch.no_grad()
+    def publish(self, modules: Sequence[nn.Module]) -> int:
+        """Writes modules' current weights as a new version. Only one process may publish. Returns the version."""
+        targets = self._targets(modules)
+        seq = int(self.seq.item())
+        version = seq // 2 + 1
+        self.seq.fill_(seq + 1)
+        torch._foreach_copy_(self._views(version % 2, targets), [target.to(self.slots.device) for target in targets])
+        self.seq.fill_(seq + 2)
+        return version
+
+    @torch.no_grad()
+    def pull(self, modules: Sequence[nn.Module]) -> bool:
+        """Copies the latest version into modules' parameters if it's newer than the last pulled one.
+
+        Returns whether modules were updated. Returns False also when all `max_retries` copies were
+        overwritten mid-way; the next call will try again.
+        """
+        if self.version == self.local_version:
+            return False
+
+        targets = self._targets(modules)
+        for _ in range(self.max_retries):
+            version = int(self.seq.item()) // 2
+            torch._foreach_copy_(targets, self._views(version % 2, targets))
+            # Version's slot is written again only when publishing `version + 2` which starts at `2*version + 3`
+            if int(self.seq.item()) <= 2*version + 2:
+                self.local_version = version
+                return True
+        return False
@@ -29,6 +29,10 @@ class GymTask(TaskType):
             return self.state_transform(self.env.reset())
         return self.env.reset()
 
+    def seed(self, seed: int) -> None:
+        self.env.seed(seed)
+        self.env.action_space.seed(seed)
+
     def render(self, mode="rgb_array"):
         if self.can_render:
             # In case of OpenAI, mode can be ['human', 'rgb_array']
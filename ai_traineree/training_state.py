@@ -0,0 +1,107 @@
+import logging
+import random
+import numpy as np
+import torch
+
+from ai_traineree.checkpointer import atomic_save
+from ai_traineree.types import AgentType
+
+from typing import Any, Dict
+
+# Agents' attributes with counters which drive schedules, e.g. warm up and update frequency
+TRAINING_COUNTERS = ('iteration',)
+# Agents' attributes with replay/rollout buffers, including partial n-step transitions and PPO's outputs of the last `act`
+BUFFER_ATTRIBUTES = ('buffer', 'memory', 'n_buffer', 'n_buffers', 'local_memory_buffer')
+
+
+def get_rng_state() -> Dict[str, Any]:
+    """States of Python's, NumPy's and Torch's, including all CUDA devices', global random generators."""
+    state = {'python': random.getstate(), 'numpy': np.random.get_state(), 'torch': torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state: Dict[str, Any]) -> None:
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def get_training_state(agent: AgentType, include_buffer: bool=False) -> Dict[str, Any]:
+    """
+    Everything needed to continue training where it stopped, rather than only network weights.
+
+    Apart from agent's `get_state()` it contains the state of every other agent's attribute which has a `state_dict`,
+    i.e. optimizers, learning rate schedulers, noise banks and networks which `get_state` skips, tensors which aren't
+    part of networks, e.g. SAC's `log_alpha`, counters (`TRAINING_COUNTERS`), global random generators and,
+    with `include_buffer`, buffers. Buffers are returned as they are, not copied; `AsyncCheckpointer` snapshots
+    them on `save` which copies their storage, e.g. deques of a replay buffer, but not the stored experiences.
+    The environment isn't part of the agent so runs are only continued exactly with a deterministic environment.
+    """
+    agent_state = agent.get_state()
+    stateful, tensors = {}, {}
+    for (name, value) in vars(agent).items():
+        if name in agent_state:
+            continue
+        if isinstance(value, torch.Tensor):
+            tensors[name] = value.detach().clone()
+        elif hasattr(value, 'state_dict') and hasattr(value, 'load_state_dict'):
+            stateful[name] = value.state_dict()
+
+    state = {
+        'agent': agent_state,
+        'stateful': stateful,
+        'tensors': tensors,
+        'counters': {name: getattr(agent, name) for name in TRAINING_COUNTERS if hasattr(agent, name)},
+        'rng': get_rng_state(),
+    }
+    if include_buffer:
+        state['buffers'] = {name: getattr(agent, name) for name in BUFFER_ATTRIBUTES if hasattr(agent, name)}
+    return state
+
+
+def set_training_state(agent: AgentType, state: Dict[str, Any]) -> None:
+    """Restores the state from `get_training_state`. Networks and tensors are updated in place so optimizers keep tracking them."""
+    for (name, module_state) in state['agent'].items():
+        getattr(agent, name).load_state_dict(module_state)
+    for (name, value_state) in state['stateful'].items():
+        getattr(agent, name).load_state_dict(value_state)
+    with torch.no_grad():
+        for (name, tensor) in state['tensors'].items():
+            getattr(agent, name).copy_(tensor)
+    for (name, value) in state['counters'].items():
+        setattr(agent, name, value)
+    for (name, buffer) in state.get('buffers', {}).items():
+        setattr(agent, name, buffer)
+    set_rng_state(state['rng'])
+
+
+def is_training_state(state: Dict[str, Any]) -> bool:
+    return isinstance(state, dict) and 'agent' in state and 'rng' in state
+
+
+def save_training_state(agent: AgentType, path: str, include_buffer: bool=False) -> None:
+    """Writes `get_training_state` atomically to the `path`."""
+    atomic_save(get_training_state(agent, include_buffer=include_buffer), path)
+
+
+def load_training_state(agent: AgentType, path: str) -> None:
+    """
+    Restores the state written by `save_training_state`. Files with only agent's state, e.g. from `save_state`,
+    are loaded with agent's `load_state`.
+
+    The file contains pickled Python objects, e.g. buffers, so only load files from trusted sources.
+    """
+    try:
+        state = torch.load(path, weights_only=False)
+    except TypeError:
+        # torch<1.13 doesn't have `weights_only` and always unpickles everything
+        state = torch.load(path)
+    if not is_training_state(state):
+        logging.getLogger("TrainingState").warning("'%s' has only agent's state; loading it without the training state", path)
+        agent.load_state(path)
+        return
+    set_training_state(agent, state)
@@ -46,9 +46,23 @@ class AgentType(abc.ABC):
     def step(self, state: StateType, action: ActionType, reward: RewardType, next_state: StateType, done: DoneType):
         raise NotImplementedError
 
+    def step_batch(
+        self, states: Sequence[StateType], actions: Sequence[ActionType], rewards: Sequence[RewardType],
+        next_states: Sequence[StateType], dones: Sequence[DoneType],
+    ):
+        """Same as `step` but for N transitions at once, e.g. one from each of N parallel environments.
+
+        The `iteration` counter advances by N so that learning triggers are counted in env steps.
+        """
+        raise NotImplementedError
+
     def describe_agent(self) -> None:
         raise NotImplementedError
 
+    def get_state(self) -> Dict[str, Any]:
+        """Returns the whole agent state, i.e. what `save_state` writes."""
+        raise NotImplementedError
+
     def save_state(self, path: str):
         """Saves the whole agent state into a local file."""
         raise NotImplementedError
@@ -0,0 +1,162 @@
+import logging
+import math
+import queue
+import threading
+import time
+import torch
+
+from typing import Any, Callable, Optional
+
+
+def discounted_scan(deltas: torch.Tensor, discounts: torch.Tensor) -> torch.Tensor:
+    """Solves `y[t] = deltas[t] + discounts[t] * y[t+1]` backwards in time with `y[T] = 0`.
+
+    Inputs are tensors of shape [T] or [T, N], where N is the number of parallel envs.
+    Time is split into ~sqrt(T) blocks which are scanned in parallel and then stitched together,
+    so it takes O(sqrt(T)) vectorized steps rather than T scalar ones.
+    """
+    length = deltas.shape[0]
+    tail = tuple(deltas.shape[1:])
+    block = max(1, int(math.sqrt(length)))
+    num_blocks = math.ceil(length / block)
+
+    # Padding with zeros (no reward, no discount) at the end doesn't change the result
+    pad = num_blocks*block - length
+    d = torch.cat((deltas, deltas.new_zeros((pad,) + tail))).view((num_blocks, block) + tail)
+    c = torch.cat((discounts, discounts.new_zeros((pad,) + tail))).view((num_blocks, block) + tail)
+
+    # Within each block: local solution and the product of discounts until the end of the block
+    y = torch.empty_like(d)
+    transfer = torch.empty_like(c)
+    acc = d.new_zeros((num_blocks,) + tail)
+    prod = c.new_ones((num_blocks,) + tail)
+    for step in reversed(range(block)):
+        acc = d[:, step] + c[:, step] * acc
+        prod = c[:, step] * prod
+        y[:, step] = acc
+        transfer[:, step] = prod
+
+    # Across blocks: what flows into each block from the one after it
+    carries = torch.empty((num_blocks,) + tail, dtype=y.dtype, device=y.device)
+    carry = y.new_zeros(tail)
+    for b in reversed(range(num_blocks)):
+        carries[b] = carry
+        carry = y[b, 0] + transfer[b, 0] * carry
+
+    y += transfer * carries.unsqueeze(1)
+    return y.view((num_blocks*block,) + tail)[:length]
+
+
+class QueueWorker:
+    """
+    Daemon thread which passes items put into a queue of at most `queue_size` items, in order, to `handle`.
+
+    The first exception raised on the thread is logged and kept. Later items are only drained, and `put` and `join`
+    raise `RuntimeError` with `error_message` from it. `close` raises it only if it hasn't been raised before.
+    With `idle_secs` the `on_idle` is called whenever no item comes for that long. `on_close` is called
+    on the thread after the last item, also when handling has failed, e.g. to finish a file.
+
+    >>> worker = QueueWorker(write, name="Writer", error_message="Writing has failed")
+    >>> worker.start()
+    >>> worker.put(item)  # Blocks only when the queue is full
+    >>> worker.close()  # Handles what's queued and stops the thread
+    """
+
+    _stop = object()
+
+    def __init__(
+        self, handle: Callable[[Any], Any], name: str, error_message: str, queue_size: int=0,
+        idle_secs: Optional[float]=None, on_idle: Optional[Callable[[], Any]]=None, on_close: Optional[Callable[[], Any]]=None,
+    ):
+        self.logger = logging.getLogger(name)
+        self.name = name
+        self.handle = handle
+        self.error_message = error_message
+        self.idle_secs = idle_secs
+        self.on_idle = on_idle
+        self.on_close = on_close
+
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self.error: Optional[Exception] = None
+        self.closed = False
+        self._reported = False
+
+        # Time, in seconds, `put` waited on a full queue
+        self.wait_time = 0.
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def raise_if_failed(self) -> None:
+        if self.error is not None:
+            self._reported = True
+            raise RuntimeError(self.error_message) from self.error
+
+    def put(self, item: Any) -> None:
+        self.raise_if_failed()
+        if self.closed:
+            raise RuntimeError(f"{self.name} is closed")
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+
+        t_start = time.perf_counter()
+        while True:
+            try:
+                self.queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                self.raise_if_failed()
+        self.wait_time += time.perf_counter() - t_start
+
+    def join(self) -> None:
+        """Blocks until all queued items are handled."""
+        if self.thread.is_alive():
+            self.queue.join()
+        self.raise_if_failed()
+
+    def finish(self) -> None:
+        """Marks the end of items without waiting for them to be handled."""
+        if not self.closed:
+            self.closed = True
+            if self.thread.is_alive():
+                self.queue.put(self._stop)
+
+    def close(self) -> None:
+        """Finishes and waits until the thread is done."""
+        self.finish()
+        if self.thread.is_alive():
+            self.thread.join()
+        if not self._reported:
+            self.raise_if_failed()
+
+    def _call(self, fn: Callable, *args) -> None:
+        try:
+            fn(*args)
+        except Exception as e:
+            self.logger.exception(self.error_message)
+            if self.error is None:
+                self.error = e
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                item = self.queue.get(timeout=self.idle_secs)
+            except queue.Empty:
+                if self.on_idle is not None and self.error is None:
+                    self._call(self.on_idle)
+                continue
+
+            try:
+                if item is self._stop:
+                    break
+                if self.error is None:
+                    self._call(self.handle, item)
+            finally:
+                self.queue.task_done()
+
+        if self.on_close is not None:
+            self._call(self.on_close)
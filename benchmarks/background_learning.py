@@ -0,0 +1,48 @@
+"""
+Wall time of serial `EnvRunner` episodes vs the `background_learning` option, with the learner's own estimate.
+
+The task simulates an environment whose simulator releases the GIL, e.g. one implemented in C, by
+sleeping for `STEP_TIME` seconds per step. Python-heavy parts, like prioritized buffer sampling, still
+compete for the GIL so the saved time depends on how much of learning is spent in torch kernels.
+
+>  python -m benchmarks.background_learning
+"""
+import numpy as np
+import time
+
+from ai_traineree.agents.dqn import DQNAgent
+from ai_traineree.env_runner import EnvRunner
+from ai_traineree.types import TaskType
+
+STEP_TIME = 0.005
+EPISODES = 5
+MAX_ITERATIONS = 200
+
+
+class BusyTask(TaskType):
+    name = "Busy"
+    state_size = 8
+    action_size = 4
+    is_discrete = True
+
+    def reset(self):
+        return np.random.random(self.state_size).astype(np.float32)
+
+    def step(self, action):
+        time.sleep(STEP_TIME)
+        return np.random.random(self.state_size).astype(np.float32), 0., False, {}
+
+
+def run(background_learning: bool):
+    agent = DQNAgent(BusyTask.state_size, BusyTask.action_size, hidden_layers=(256, 256), batch_size=64)
+    env_runner = EnvRunner(BusyTask(), agent, max_iterations=MAX_ITERATIONS, background_learning=background_learning)
+    env_runner.logger = None
+    t_start = time.perf_counter()
+    env_runner.run(reward_goal=1e9, max_episodes=EPISODES, log_every=EPISODES + 1, force_new=True)
+    return time.perf_counter() - t_start, env_runner.time_saved
+
+
+t_serial, _ = run(False)
+t_background, estimate = run(True)
+print(f"{'serial [s]':>11} {'background [s]':>15} {'saved [s]':>10} {'estimated saved [s]':>20}")
+print(f"{t_serial:>11.2f} {t_background:>15.2f} {t_serial - t_background:>10.2f} {estimate:>20.2f}")
@@ -0,0 +1,39 @@
+"""
+Cold-start loading of an agent's checkpoint: `torch.load` vs memory mapped `load_checkpoint`,
+of the whole state and of the actor only, for both `torch.save` and `save_flat` files.
+
+>  python -m benchmarks.checkpoint_loading
+"""
+import os
+import tempfile
+import timeit
+
+from ai_traineree.agents.ddpg import DDPGAgent
+from ai_traineree.flat_checkpoint import load_checkpoint, save_flat
+
+import torch
+
+REPEATS = 5
+NUMBER = 20
+
+
+def bench(fn) -> float:
+    return min(timeit.repeat(fn, repeat=REPEATS, number=NUMBER)) / NUMBER * 1e3
+
+
+# Times in milliseconds; "actor" columns include loading the actor's state dict into the network
+print(f"{'hidden layers':>18} {'size [MB]':>10} {'torch.load actor':>17} {'mmap':>6} {'mmap actor':>11} {'flat':>6} {'flat actor':>11}")
+with tempfile.TemporaryDirectory() as tmp_dir:
+    for hidden_layers in [(400, 300), (1024, 1024), (2048, 2048, 2048)]:
+        agent = DDPGAgent(64, 8, hidden_layers=hidden_layers)
+        torch_path, flat_path = os.path.join(tmp_dir, "agent.pt"), os.path.join(tmp_dir, "agent.flat")
+        agent.save_state(torch_path)
+        save_flat(agent.get_state(), flat_path)
+
+        t_load = bench(lambda: agent.actor.load_state_dict(torch.load(torch_path)['actor']))
+        t_mmap = bench(lambda: load_checkpoint(torch_path))
+        t_mmap_actor = bench(lambda: agent.actor.load_state_dict(load_checkpoint(torch_path, ('actor',))['actor']))
+        t_flat = bench(lambda: load_checkpoint(flat_path))
+        t_flat_actor = bench(lambda: agent.actor.load_state_dict(load_checkpoint(flat_path, ('actor',))['actor']))
+        size = os.path.getsize(torch_path) / 2**20
+        print(f"{str(hidden_layers):>18} {size:>10.1f} {t_load:>17.2f} {t_mmap:>6.2f} {t_mmap_actor:>11.2f} {t_flat:>6.2f} {t_flat_actor:>11.2f}")
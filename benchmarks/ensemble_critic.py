@@ -0,0 +1,35 @@
+"""
+Forward and backward pass of K sequential `CriticBody` networks vs a single `EnsembleCritic`.
+
+>  python -m benchmarks.ensemble_critic
+"""
+import timeit
+import torch
+
+from ai_traineree.networks import CriticBody, EnsembleCritic
+
+REPEATS = 5
+NUMBER = 200
+
+state_size, action_size, batch_size = 24, 4, 64
+hidden_layers = (128, 128)
+states, actions = torch.rand(batch_size, state_size), torch.rand(batch_size, action_size)
+
+
+def sequential_step(critics):
+    loss = sum(critic(states, actions).mean() for critic in critics)
+    loss.backward()
+
+
+def ensemble_step(ensemble):
+    loss = ensemble(states, actions).mean(dim=(1, 2)).sum()
+    loss.backward()
+
+
+print(f"{'K':>3} {'sequential [ms]':>16} {'ensemble [ms]':>14} {'speedup':>8}")
+for num_critics in [2, 5, 10, 20]:
+    critics = [CriticBody(state_size, action_size, hidden_layers) for _ in range(num_critics)]
+    ensemble = EnsembleCritic(state_size, action_size, hidden_layers, num_critics=num_critics)
+    t_seq = min(timeit.repeat(lambda: sequential_step(critics), repeat=REPEATS, number=NUMBER)) / NUMBER * 1e3
+    t_ens = min(timeit.repeat(lambda: ensemble_step(ensemble), repeat=REPEATS, number=NUMBER)) / NUMBER * 1e3
+    print(f"{num_critics:>3} {t_seq:>16.3f} {t_ens:>14.3f} {t_seq/t_ens:>7.2f}x")
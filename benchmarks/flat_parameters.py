@@ -0,0 +1,45 @@
+"""
+Gradient clipping, soft update and weight copy with per-tensor parameters vs flat contiguous storage.
+
+>  python -m benchmarks.flat_parameters
+"""
+import timeit
+import torch
+
+from ai_traineree.agents.utils import soft_update
+from ai_traineree.networks import ActorBody, CriticBody
+
+REPEATS = 5
+NUMBER = 1000
+
+state_size, action_size = 24, 4
+
+
+def make_critic(hidden_layers, flat: bool):
+    critic = CriticBody(state_size, action_size, hidden_layers=hidden_layers)
+    if flat:
+        critic.use_flat_storage()
+    critic.zero_grad()
+    critic(torch.rand(64, state_size), torch.rand(64, action_size)).mean().backward()
+    return critic
+
+
+def bench(fn) -> float:
+    return min(timeit.repeat(fn, repeat=REPEATS, number=NUMBER)) / NUMBER * 1e6
+
+
+print(f"{'hidden':<12} {'operation':<14} {'per-tensor [us]':>16} {'flat [us]':>10} {'speedup':>8}")
+for hidden_layers in [(128, 128), (300, 200)]:
+    timings = {}
+    for flat in (False, True):
+        critic, target_critic = make_critic(hidden_layers, flat), make_critic(hidden_layers, flat)
+        actor = ActorBody(state_size, action_size, hidden_layers=hidden_layers)
+        if flat:
+            actor.use_flat_storage()
+        timings[("clip_grad_norm", flat)] = bench(lambda: critic.clip_grad_norm_(1.0))
+        timings[("soft_update", flat)] = bench(lambda: soft_update(target_critic, critic, 0.02))
+        timings[("get_weights", flat)] = bench(lambda: actor.get_flat_parameters())
+
+    for operation in ("clip_grad_norm", "soft_update", "get_weights"):
+        t_tensor, t_flat = timings[(operation, False)], timings[(operation, True)]
+        print(f"{str(hidden_layers):<12} {operation:<14} {t_tensor:>16.2f} {t_flat:>10.2f} {t_tensor/t_flat:>7.2f}x")
@@ -0,0 +1,29 @@
+"""
+`GaussianPolicy` (MultivariateNormal) vs `DiagGaussianPolicy` for a typical SAC/PPO minibatch:
+creating the distribution, `rsample`, `log_prob` and `entropy`.
+
+>  python -m benchmarks.gaussian_policy
+"""
+import timeit
+import torch
+
+from ai_traineree.policies import DiagGaussianPolicy, GaussianPolicy
+
+REPEATS = 5
+NUMBER = 1000
+batch_size = 64
+
+
+def policy_step(policy, action_mu):
+    dist = policy(action_mu)
+    actions = dist.rsample()
+    return dist.log_prob(actions).sum() + dist.entropy().sum()
+
+
+print(f"{'action size':>11} {'gaussian [us]':>14} {'diagonal [us]':>14} {'speedup':>8}")
+for action_size in [2, 6, 17, 64]:
+    action_mu = torch.rand(batch_size, action_size)
+    times = []
+    for policy in (GaussianPolicy(action_size), DiagGaussianPolicy(action_size)):
+        times.append(min(timeit.repeat(lambda: policy_step(policy, action_mu), repeat=REPEATS, number=NUMBER)) / NUMBER * 1e6)
+    print(f"{action_size:>11} {times[0]:>14.1f} {times[1]:>14.1f} {times[0]/times[1]:>7.2f}x")
@@ -0,0 +1,48 @@
+"""
+MADDPG acting and a single update step with per-agent loops vs the `batched` mode.
+
+>  python -m benchmarks.maddpg
+"""
+import numpy as np
+import timeit
+
+from ai_traineree.multi_agents.maddpg import MADDPGAgent
+
+REPEATS = 5
+NUMBER = 20
+
+state_size, action_size, batch_size = 24, 4, 64
+
+
+def make_agent(agents_number: int, batched: bool) -> MADDPGAgent:
+    config = {"batched": batched, "batch_size": batch_size, "hidden_layers": (128, 128)}
+    agent = MADDPGAgent(None, state_size, action_size, agents_number, config=config)
+    for _ in range(2*batch_size):
+        states = np.random.random((agents_number, state_size)).astype(np.float32)
+        actions = np.random.random((agents_number, action_size)).astype(np.float32)
+        rewards = list(np.random.random(agents_number))
+        agent.buffer.add_sars(state=states, action=actions, reward=rewards, next_state=states, done=[False]*agents_number)
+    return agent
+
+
+def update(agent: MADDPGAgent):
+    if agent.batched:
+        agent.learn_batched(agent.buffer.sample_sars())
+        return
+    for agent_number in range(agent.agents_number):
+        agent.learn(agent.buffer.sample_sars(), agent_number)
+
+
+def bench(fn) -> float:
+    return min(timeit.repeat(fn, repeat=REPEATS, number=NUMBER)) / NUMBER * 1e3
+
+
+print(f"{'agents':>6} {'act loop [ms]':>14} {'act batched [ms]':>17} {'update loop [ms]':>17} {'update batched [ms]':>20}")
+for agents_number in [2, 4, 8, 16]:
+    loop_agent, batched_agent = make_agent(agents_number, False), make_agent(agents_number, True)
+    states = np.random.random((agents_number, state_size)).astype(np.float32)
+    t_act_loop = bench(lambda: loop_agent.act(states, 0.1))
+    t_act_batched = bench(lambda: batched_agent.act(states, 0.1))
+    t_update_loop = bench(lambda: update(loop_agent))
+    t_update_batched = bench(lambda: update(batched_agent))
+    print(f"{agents_number:>6} {t_act_loop:>14.3f} {t_act_batched:>17.3f} {t_update_loop:>17.3f} {t_update_batched:>20.3f}")
@@ -0,0 +1,26 @@
+"""
+Per-step action latency of `NetworkType.act` (no_grad + eval/train toggling) vs `NetworkType.inference`.
+
+>  python -m benchmarks.network_inference
+"""
+import timeit
+import torch
+
+from ai_traineree.networks import ActorBody, DuelingNet, QNetwork
+
+REPEATS = 5
+NUMBER = 2000
+
+state_size, action_size = 8, 4
+networks = {
+    "QNetwork": QNetwork(state_size, action_size, hidden_layers=(64, 64)),
+    "DuelingNet": DuelingNet(state_size, action_size, hidden_layers=(64, 64)),
+    "ActorBody": ActorBody(state_size, action_size, hidden_layers=(128, 128)),
+}
+state = torch.rand(1, state_size)
+
+print(f"{'network':<12} {'act [us]':>10} {'inference [us]':>15} {'speedup':>8}")
+for name, net in networks.items():
+    t_act = min(timeit.repeat(lambda: net.act(state), repeat=REPEATS, number=NUMBER)) / NUMBER * 1e6
+    t_inf = min(timeit.repeat(lambda: net.inference(state), repeat=REPEATS, number=NUMBER)) / NUMBER * 1e6
+    print(f"{name:<12} {t_act:>10.2f} {t_inf:>15.2f} {t_act/t_inf:>7.2f}x")
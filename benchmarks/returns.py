@@ -0,0 +1,32 @@
+"""
+List based `compute_gae`/`revert_norm_returns` vs their tensor versions for growing rollout lengths.
+
+>  python -m benchmarks.returns
+"""
+import time
+import numpy as np
+import torch
+
+from ai_traineree.agents import utils
+
+
+def timed(fn) -> float:
+    t_start = time.perf_counter()
+    fn()
+    return time.perf_counter() - t_start
+
+
+print(f"{'length':>8} {'function':<20} {'list [ms]':>10} {'tensor [ms]':>12}")
+for length in [100, 1000, 10000, 100000]:
+    rewards, values = list(np.random.normal(size=length)), list(np.random.normal(size=length))
+    dones = list(np.random.random(length) < 0.01)
+    masks = [1. - d for d in dones]
+    t_rewards, t_values, t_masks = torch.tensor(rewards), torch.tensor(values), torch.tensor(masks)
+
+    t_list = timed(lambda: utils.revert_norm_returns(rewards, dones))
+    t_tensor = timed(lambda: utils.revert_norm_returns_tensor(t_rewards, 1 - t_masks))
+    print(f"{length:>8} {'revert_norm_returns':<20} {t_list*1e3:>10.2f} {t_tensor*1e3:>12.2f}")
+
+    t_list = timed(lambda: utils.compute_gae(0., rewards, masks, values))
+    t_tensor = timed(lambda: utils.compute_gae_tensor(torch.tensor(0.), t_rewards, t_masks, t_values))
+    print(f"{length:>8} {'compute_gae':<20} {t_list*1e3:>10.2f} {t_tensor*1e3:>12.2f}")
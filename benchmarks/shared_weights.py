@@ -0,0 +1,46 @@
+"""
+Pulling an actor's weights by serialising them with `torch.save`/`torch.load` vs `SharedWeights`.
+
+>  python -m benchmarks.shared_weights
+"""
+import io
+import timeit
+import torch
+
+from ai_traineree.networks import ActorBody, QNetwork
+from ai_traineree.shared_weights import SharedWeights
+
+REPEATS = 5
+NUMBER = 200
+
+
+def serialised_pull(net, local_net):
+    buffer = io.BytesIO()
+    torch.save(net.state_dict(), buffer)
+    buffer.seek(0)
+    local_net.load_state_dict(torch.load(buffer))
+
+
+def bench(fn) -> float:
+    return min(timeit.repeat(fn, repeat=REPEATS, number=NUMBER)) / NUMBER * 1e6
+
+
+print(f"{'network':>22} {'params':>8} {'torch.save [us]':>16} {'publish [us]':>13} {'pull [us]':>10} {'no update [us]':>15}")
+for (name, net_fn) in [
+    ("ActorBody (128, 128)", lambda: ActorBody(24, 4, (128, 128))),
+    ("ActorBody (400, 300)", lambda: ActorBody(24, 4, (400, 300))),
+    ("QNetwork (512, 512)", lambda: QNetwork(128, 18, (512, 512))),
+]:
+    net, local_net = net_fn(), net_fn()
+    shared_weights = SharedWeights([net])
+    num_params = sum(p.numel() for p in net.parameters())
+
+    t_save = bench(lambda: serialised_pull(net, local_net))
+    t_publish = bench(lambda: shared_weights.publish([net]))
+
+    def publish_and_pull():
+        shared_weights.publish([net])
+        shared_weights.pull([local_net])
+    t_pull = bench(publish_and_pull) - t_publish
+    t_noop = bench(lambda: shared_weights.pull([local_net]))
+    print(f"{name:>22} {num_params:>8} {t_save:>16.1f} {t_publish:>13.1f} {t_pull:>10.1f} {t_noop:>15.2f}")
@@ -2,6 +2,8 @@ import mock
 import numpy as np
 import pytest
 
+from ai_traineree.types import TaskType
+
 
 class MockContinuousSpace:
     def __init__(self, *args):
@@ -38,3 +40,26 @@ def fix_env():
     mock_env.observation_space = np.array((4, 2))
     mock_env.action_space = MockContinuousSpace(2, 4)
     return mock_env
+
+
+class CountingTask(TaskType):
+    """Deterministic task; the state is a position which goes up for action 1 and down otherwise."""
+
+    name = "Counting"
+    state_size = 2
+    action_size = 2
+    is_discrete = True
+
+    def reset(self):
+        self.position = 0
+        return np.array([0., 1.], dtype=np.float32)
+
+    def step(self, action):
+        self.position += 1 if action == 1 else -1
+        done = abs(self.position) >= 5
+        return np.array([self.position/5, 1.], dtype=np.float32), float(action == 1), done, {}
+
+
+@pytest.fixture
+def fix_counting_task():
+    return CountingTask
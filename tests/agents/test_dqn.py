@@ -0,0 +1,20 @@
+import numpy as np
+import torch
+
+from ai_traineree.agents.dqn import DQNAgent
+
+
+def test_dqn_flat_parameters_clip_grads():
+    # Assign
+    agent = DQNAgent(4, 2, hidden_layers=(8, 8), batch_size=5, flat_parameters=True, max_grad_norm=1e-3)
+    net = agent.net
+
+    # Act
+    for _ in range(10):
+        state, next_state = np.random.random(4).astype(np.float32), np.random.random(4).astype(np.float32)
+        agent.step(state, np.random.randint(2), np.random.random(), next_state, False)
+
+    # Assert
+    assert net.flat_grads is not None and net.flat_grads.abs().sum() > 0
+    assert net.flat_grads.norm() <= 1e-3 + 1e-6
+    assert torch.equal(net.flat_grads, torch.cat([p.grad.view(-1) for p in net.parameters()]))
@@ -0,0 +1,77 @@
+import numpy as np
+import torch
+
+from ai_traineree.multi_agents.maddpg import MADDPGAgent
+
+STATE_SIZE, ACTION_SIZE, AGENTS_NUMBER = 5, 2, 3
+
+
+def fill_and_step(agent, steps: int):
+    for _ in range(steps):
+        states = np.random.random((AGENTS_NUMBER, STATE_SIZE)).astype(np.float32)
+        actions = agent.act(states, noise=1.0)
+        rewards = list(np.random.random(AGENTS_NUMBER))
+        next_states = np.random.random((AGENTS_NUMBER, STATE_SIZE)).astype(np.float32)
+        agent.step(states, actions, rewards, next_states, [False]*AGENTS_NUMBER)
+
+
+def test_maddpg_act_same_in_both_modes():
+    # Assign
+    agent = MADDPGAgent(None, STATE_SIZE, ACTION_SIZE, AGENTS_NUMBER, config={})
+    batched_agent = MADDPGAgent(None, STATE_SIZE, ACTION_SIZE, AGENTS_NUMBER, config={"batched": True})
+    with torch.no_grad():
+        for (idx, ddpg_agent) in enumerate(agent.maddpg_agent):
+            for (layer, batched_layer) in zip(ddpg_agent.actor.layers, batched_agent.actors.layers):
+                batched_layer.weight[idx].copy_(layer.weight.T)
+                batched_layer.bias[idx, 0].copy_(layer.bias)
+    states = np.random.random((AGENTS_NUMBER, STATE_SIZE))
+
+    # Act
+    actions = agent.act(states)
+    batched_actions = batched_agent.act(states)
+
+    # Assert
+    assert actions.shape == batched_actions.shape == (AGENTS_NUMBER, ACTION_SIZE)
+    assert np.allclose(actions, batched_actions, atol=1e-6)
+
+
+def test_maddpg_batched_learn_updates_all_actors():
+    # Assign
+    config = {"batched": True, "warm_up": 0, "batch_size": 8, "update_freq": 1, "number_updates": 1}
+    agent = MADDPGAgent(None, STATE_SIZE, ACTION_SIZE, AGENTS_NUMBER, config=config)
+    fill_and_step(agent, config["batch_size"])
+    weights = agent.actors.layers[0].weight.detach().clone()
+    critic_weights = agent.critic.layers[0].weight.detach().clone()
+
+    # Act
+    fill_and_step(agent, 1)
+
+    # Assert
+    for member in range(AGENTS_NUMBER):
+        assert not torch.equal(weights[member], agent.actors.layers[0].weight[member])
+    assert not torch.equal(critic_weights, agent.critic.layers[0].weight)
+    assert agent.critic_loss >= 0
+
+
+def test_maddpg_learn_both_modes():
+    for batched in (False, True):
+        # Assign
+        config = {"batched": batched, "warm_up": 0, "batch_size": 4, "update_freq": 1, "number_updates": 2}
+        agent = MADDPGAgent(None, STATE_SIZE, ACTION_SIZE, AGENTS_NUMBER, config=config)
+
+        # Act
+        fill_and_step(agent, 10)
+
+        # Assert
+        assert np.isfinite(agent.critic_loss) and np.isfinite(agent.actor_loss)
+
+
+def test_maddpg_batched_targets_start_as_copies():
+    # Act
+    agent = MADDPGAgent(None, STATE_SIZE, ACTION_SIZE, AGENTS_NUMBER, config={"batched": True})
+
+    # Assert
+    for (param, target_param) in zip(agent.actors.parameters(), agent.target_actors.parameters()):
+        assert torch.equal(param, target_param)
+    for (param, target_param) in zip(agent.critic.parameters(), agent.target_critic.parameters()):
+        assert torch.equal(param, target_param)
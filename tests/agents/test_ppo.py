@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+import torch
+
+from ai_traineree.agents.ppo import PPOAgent
+from ai_traineree.flat_checkpoint import load_modules
+
+
+def test_ppo_iter_covers_rollout_once():
+    # Assign
+    agent = PPOAgent(3, 2, config={"rollout_length": 10, "num_minibatches": 3})
+    states = torch.arange(10).float().unsqueeze(1)
+    returns = 2*torch.arange(10).float()
+
+    # Act
+    minibatches = list(agent.ppo_iter(states, returns))
+
+    # Assert
+    assert len(minibatches) == 3
+    assert [len(mb_states) for (mb_states, _) in minibatches] == [4, 3, 3]
+    all_states = torch.cat([mb_states for (mb_states, _) in minibatches]).view(-1)
+    assert sorted(all_states.tolist()) == list(range(10))
+    for (mb_states, mb_returns) in minibatches:
+        assert torch.equal(2*mb_states.view(-1), mb_returns)
+
+
+def test_ppo_iter_yields_num_minibatches():
+    # Assign
+    agent = PPOAgent(3, 2, config={"rollout_length": 9, "num_minibatches": 4})
+    states = torch.arange(9).float().unsqueeze(1)
+
+    # Act
+    minibatches = list(agent.ppo_iter(states))
+
+    # Assert
+    assert [len(mb_states) for (mb_states,) in minibatches] == [3, 2, 2, 2]
+
+
+def test_ppo_default_minibatches():
+    # Act
+    agent = PPOAgent(3, 2, config={"rollout_length": 48, "batch_size": 12, "num_envs": 2})
+
+    # Assert
+    assert agent.num_minibatches == 8
+
+
+def test_ppo_step_updates_after_rollout():
+    # Assign
+    rollout_length = 6
+    agent = PPOAgent(3, 2, config={"rollout_length": rollout_length})
+
+    # Act
+    for _ in range(rollout_length):
+        state = np.random.random(3).astype(np.float32)
+        action = agent.act(state)
+        agent.step(state, action, 1., state, False)
+
+    # Assert
+    assert agent.iteration == rollout_length
+    assert len(agent.memory) == 0
+    assert np.isfinite(agent.actor_loss) and np.isfinite(agent.critic_loss)
+
+
+def test_ppo_shared_trunk_step_updates_after_rollout():
+    # Assign
+    rollout_length = 6
+    agent = PPOAgent(3, 2, config={"rollout_length": rollout_length, "shared_trunk": True})
+    params_before = [p.detach().clone() for p in agent.actor_critic.parameters()]
+
+    # Act
+    for _ in range(rollout_length):
+        state = np.random.random(3).astype(np.float32)
+        action = agent.act(state)
+        agent.step(state, action, 1., state, False)
+
+    # Assert
+    assert len(agent.memory) == 0
+    assert np.isfinite(agent.actor_loss) and np.isfinite(agent.critic_loss)
+    assert any(not torch.equal(p, p_before) for (p, p_before) in zip(agent.actor_critic.parameters(), params_before))
+
+
+def test_ppo_shared_trunk_rejects_critic_lr():
+    with pytest.raises(ValueError):
+        PPOAgent(3, 2, config={"shared_trunk": True, "critic_lr": 1e-3})
+
+
+@pytest.mark.parametrize("shared_trunk, networks", [(False, ("actor", "critic")), (True, ("actor_critic",))])
+def test_ppo_save_and_load_modules(tmp_path, shared_trunk, networks):
+    # Assign
+    path = str(tmp_path / "ppo.agent")
+    agent = PPOAgent(3, 2, config={"shared_trunk": shared_trunk})
+    new_agent = PPOAgent(3, 2, config={"shared_trunk": shared_trunk})
+    agent.save_state(path)
+
+    # Act
+    load_modules(new_agent, path, networks)
+
+    # Assert
+    for name in networks:
+        for (param, new_param) in zip(getattr(agent, name).parameters(), getattr(new_agent, name).parameters()):
+            assert torch.equal(param, new_param)
+
+
+def test_ppo_deterministic_act_returns_mean():
+    # Assign
+    agent = PPOAgent(3, 2, config={"action_min": -10, "action_max": 10})
+    state = np.random.random(3).astype(np.float32)
+
+    # Act
+    actions = [agent.act(state, deterministic=True) for _ in range(2)]
+
+    # Assert
+    assert np.array_equal(actions[0], actions[1])
+    assert np.allclose(actions[0], agent.actor(torch.tensor(state).view(1, -1)).detach().numpy().flatten())
+    assert agent.local_memory_buffer == {}
@@ -0,0 +1,46 @@
+import numpy as np
+import torch
+
+from ai_traineree.agents.sac import SACAgent
+
+
+def test_sac_flat_parameters_clip_grads():
+    # Assign
+    agent = SACAgent(4, 2, hidden_layers=(8, 8), batch_size=5, flat_parameters=True, max_grad_norm_critic=1e-3)
+    critic = agent.double_critic
+    critic_step = agent.critic_optimizer.step
+    step_grad_norms = []
+
+    def recording_step():
+        step_grad_norms.append(critic.flat_grads.norm().item())
+        assert torch.equal(critic.flat_grads, torch.cat([p.grad.view(-1) for p in critic.parameters()]))
+        critic_step()
+
+    agent.critic_optimizer.step = recording_step
+
+    # Act
+    for _ in range(10):
+        state, next_state = np.random.random(4).astype(np.float32), np.random.random(4).astype(np.float32)
+        agent.step(state, np.random.random(2).astype(np.float32), np.random.random(), next_state, False)
+
+    # Assert
+    assert len(step_grad_norms) > 0
+    assert all(0 < norm <= 1e-3 + 1e-6 for norm in step_grad_norms)
+    assert torch.equal(agent.actor.flat_grads, torch.cat([p.grad.view(-1) for p in agent.actor.parameters()]))
+
+
+def test_sac_deterministic_act_squashed_within_bounds():
+    # Assign
+    agent = SACAgent(4, 2, hidden_layers=(8, 8), clip=(-2, 2), action_scale=2, diagonal_policy=True, tanh_squash=True)
+    agent.actor.gate_out = None
+    with torch.no_grad():
+        agent.actor.layers[-1].bias.fill_(5.)
+    state = np.random.random(4).astype(np.float32)
+    action_mu = agent.actor.act(torch.tensor(state).view(1, -1)).numpy().flatten()
+
+    # Act
+    action = agent.act(state, deterministic=True)
+
+    # Assert
+    assert np.all(np.abs(action) < 2)
+    assert np.allclose(action, 2*np.tanh(action_mu))
@@ -1,7 +1,10 @@
+import copy
 import numpy as np
+import pytest
 import torch
 
 from ai_traineree.agents import utils
+from ai_traineree.networks import DoubleCritic, QNetwork
 
 
 def test_to_np():
@@ -16,6 +19,78 @@ def test_to_np():
     assert all(out == expected)
 
 
+def test_soft_update():
+    # Assign
+    tau = 0.1
+    source = QNetwork(4, 2, (8, 8))
+    target = QNetwork(4, 2, (8, 8))
+    expected = [(1 - tau)*t.detach().clone() + tau*s.detach() for (t, s) in zip(target.parameters(), source.parameters())]
+
+    # Act
+    utils.soft_update(target, source, tau)
+
+    # Assert
+    for (param, expected_param) in zip(target.parameters(), expected):
+        assert torch.allclose(param, expected_param)
+
+
+def test_soft_update_keeps_parameters_and_grad():
+    # Assign
+    source = DoubleCritic(4, 2, (8, 8))
+    target = copy.deepcopy(source)
+    target_params = [p for p in target.parameters()]
+
+    # Act
+    utils.soft_update(target, source, 0.5)
+
+    # Assert
+    assert all(p is q for (p, q) in zip(target.parameters(), target_params))
+    assert all(p.requires_grad and p.grad is None for p in target.parameters())
+
+
+def test_hard_update():
+    # Assign
+    source = QNetwork(4, 2, (8, 8))
+    target = QNetwork(4, 2, (8, 8))
+
+    # Act
+    utils.hard_update(target, source)
+
+    # Assert
+    for (target_param, param) in zip(target.parameters(), source.parameters()):
+        assert torch.equal(target_param, param)
+        assert target_param is not param
+
+
+def test_scheduled_updates_single_steps():
+    # Assign
+    update_freq = 3
+
+    # Act
+    triggers = [utils.scheduled_updates(it - 1, it, update_freq) for it in range(1, 13)]
+
+    # Assert
+    assert triggers == [0, 0, 1, 0, 0, 1, 0, 0, 1, 0, 0, 1]
+
+
+def test_scheduled_updates_batches_keep_ratio():
+    # Assign
+    update_freq, batch = 4, 7
+
+    # Act
+    triggers = sum(utils.scheduled_updates(it, it + batch, update_freq) for it in range(0, 28*batch, batch))
+
+    # Assert
+    assert triggers == 28*batch // update_freq
+
+
+def test_scheduled_updates_warm_up():
+    # Act & Assert
+    assert utils.scheduled_updates(0, 10, update_freq=2, warm_up=6) == 3  # Iterations 6, 8, 10
+    assert utils.scheduled_updates(0, 5, update_freq=2, warm_up=6) == 0
+    assert utils.scheduled_updates(5, 6, update_freq=2, warm_up=6) == 1
+
+
 def test_revert_norm_returns_default():
     # Assign
     rewards = [0, 0, 0, 1, 0, 1]
@@ -40,3 +115,56 @@ def test_revert_norm_returns_gamma():
 
     # Assert
     assert all(torch.isclose(returns, expected, atol=1e-4))
+
+
+@pytest.mark.parametrize("length", [1, 7, 100, int(1e5)])
+def test_revert_norm_returns_tensor_same_as_list(length):
+    # Assign
+    rng = np.random.default_rng(length)
+    rewards = list(rng.normal(size=length))
+    dones = list(rng.random(length) < 0.05)
+
+    # Act
+    expected = utils.revert_norm_returns(rewards, dones, gamma=0.97).float()
+    returns = utils.revert_norm_returns_tensor(rewards, dones, gamma=0.97)
+
+    # Assert
+    assert returns.shape == (length,)
+    assert torch.allclose(returns, expected, atol=1e-4, equal_nan=True)
+
+
+@pytest.mark.parametrize("length", [1, 7, 100, int(1e5)])
+def test_compute_gae_tensor_same_as_list(length):
+    # Assign
+    rng = np.random.default_rng(length)
+    rewards, values = list(rng.normal(size=length)), list(rng.normal(size=length))
+    masks = list((rng.random(length) > 0.05).astype(float))
+    next_value = 0.5
+
+    # Act
+    expected = torch.tensor(utils.compute_gae(next_value, rewards, masks, values, gamma=0.95, tau=0.9), dtype=torch.float64)
+    returns = utils.compute_gae_tensor(
+        torch.tensor(next_value, dtype=torch.float64), torch.tensor(rewards), torch.tensor(masks), torch.tensor(values),
+        gamma=0.95, tau=0.9,
+    )
+
+    # Assert
+    assert returns.shape == (length,)
+    assert torch.allclose(returns, expected, atol=1e-8)
+
+
+def test_compute_gae_tensor_parallel_envs():
+    # Assign
+    length, num_envs = 50, 3
+    rewards, values = torch.rand(length, num_envs), torch.rand(length, num_envs)
+    masks = (torch.rand(length, num_envs) > 0.1).float()
+    next_value = torch.rand(num_envs)
+
+    # Act
+    returns = utils.compute_gae_tensor(next_value, rewards, masks, values)
+
+    # Assert
+    assert returns.shape == (length, num_envs)
+    for env in range(num_envs):
+        expected = utils.compute_gae(next_value[env], list(rewards[:, env]), list(masks[:, env]), list(values[:, env]))
+        assert torch.allclose(returns[:, env], torch.stack(expected), atol=1e-5)
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+import torch
+
+from ai_traineree.agents.dqn import DQNAgent
+from ai_traineree.agents.ppo import PPOAgent
+from ai_traineree.background_learner import BackgroundLearner
+from ai_traineree.env_runner import EnvRunner
+
+
+def step_task(learner, task, steps: int):
+    state = task.reset()
+    for _ in range(steps):
+        action = learner.act(state, 0.5)
+        next_state, reward, done, _ = task.step(action)
+        learner.step(state, action, reward, next_state, done)
+        state = task.reset() if done else next_state
+
+
+def test_background_learner_passes_all_transitions(fix_counting_task):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8), batch_size=8)
+    learner = BackgroundLearner(agent, queue_size=5)
+
+    # Act
+    learner.start()
+    step_task(learner, fix_counting_task(), 50)
+    learner.stop()
+
+    # Assert
+    assert agent.iteration == 50
+    assert len(agent.buffer) == 50
+    assert learner.learn_time > 0
+
+
+def test_background_learner_refreshes_acting_copy(fix_counting_task):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8), batch_size=8)
+    learner = BackgroundLearner(agent, publish_every=1, sync_every=1)
+
+    # Act
+    learner.start()
+    step_task(learner, fix_counting_task(), 30)
+    learner.stop()
+    learner.act(np.zeros(2, dtype=np.float32))
+
+    # Assert
+    assert learner.acting_agent.net is not agent.net
+    for (param, acting_param) in zip(agent.net.parameters(), learner.acting_agent.net.parameters()):
+        assert torch.equal(param, acting_param)
+
+
+def test_background_learner_raises_learner_errors(fix_counting_task):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8))
+    agent.step = lambda *args: 1/0
+    learner = BackgroundLearner(agent, queue_size=1)
+
+    # Act & Assert
+    learner.start()
+    with pytest.raises(RuntimeError):
+        step_task(learner, fix_counting_task(), 20)
+        learner.stop()
+
+
+def test_background_learner_rejects_on_policy_agents(fix_counting_task):
+    # Assign
+    agent = PPOAgent(2, 2, hidden_layers=(8, 8))
+
+    # Act & Assert
+    with pytest.raises(ValueError):
+        BackgroundLearner(agent)
+    with pytest.raises(ValueError):
+        EnvRunner(fix_counting_task(), agent, max_iterations=10, background_learning=True).run(max_episodes=1)
+
+
+def test_env_runner_background_learning(fix_counting_task):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8), batch_size=8)
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=20, background_learning=True)
+
+    # Act
+    scores = env_runner.run(reward_goal=1e9, max_episodes=3, log_every=1, force_new=True)
+
+    # Assert
+    assert len(scores) == 3
+    assert agent.iteration == sum(env_runner.all_iterations)
+    assert env_runner.background_learner is None
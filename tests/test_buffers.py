@@ -1,6 +1,8 @@
 import numpy as np
+import pytest
+import torch
 
-from ai_traineree.buffers import Experience, PERBuffer, ReplayBuffer
+from ai_traineree.buffers import Experience, PERBuffer, ReplayBuffer, RolloutBuffer
 
 
 def generate_sample_SARS(state_size: int=4, action_size: int=2):
@@ -204,3 +206,120 @@ def test_per_buffer_reset_alpha():
         assert new_sample.index == old_sample.index
         assert new_sample.weight != old_sample.weight
         assert new_sample.reward == old_sample.reward
+
+
+def test_buffer_add_batch():
+    # Assign
+    batch_size = 5
+    buffer = ReplayBuffer(batch_size=batch_size, buffer_size=10)
+    samples = [generate_sample_SARS() for _ in range(7)]
+    (states, actions, rewards, next_states, dones) = map(list, zip(*samples))
+
+    # Act
+    buffer.add_batch(state=states, action=actions, reward=rewards, next_state=next_states, done=dones)
+
+    # Assert
+    assert len(buffer) == 7
+    assert [exp.reward for exp in buffer.exp] == rewards
+    assert [exp.state for exp in buffer.exp] == states
+    assert len(buffer.sample_sars()[0]) == batch_size
+
+
+def test_per_buffer_add_batch():
+    # Assign
+    per_buffer = PERBuffer(2, 10)
+
+    # Act
+    per_buffer.add_batch(state=[range(5), range(3, 8)], reward=[1, 2], priority=[0.9, 0.1])
+
+    # Assert
+    assert len(per_buffer) == 2
+    experiences = per_buffer.sample_list()
+    assert experiences is not None
+    assert sorted([exp.reward for exp in experiences]) == [1, 2]
+
+
+def test_rollout_buffer_time_order():
+    # Assign
+    rollout_length, num_envs = 4, 3
+    buffer = RolloutBuffer(rollout_length, num_envs=num_envs)
+
+    # Act
+    for step in range(rollout_length):
+        buffer.add(state=np.full((num_envs, 5), step), reward=[step]*num_envs, done=[False]*num_envs)
+
+    # Assert
+    data = buffer.get()
+    assert buffer.full
+    assert len(buffer) == rollout_length*num_envs
+    assert data['state'].shape == (rollout_length, num_envs, 5)
+    assert data['reward'].shape == (rollout_length, num_envs, 1)
+    assert data['done'].dtype == torch.bool
+    assert torch.equal(data['reward'][:, 0, 0], torch.arange(rollout_length, dtype=torch.float32))
+
+
+def test_rollout_buffer_reuses_storage():
+    # Assign
+    buffer = RolloutBuffer(2)
+    buffer.add(state=np.random.random(3), reward=1.)
+    buffer.add(state=np.random.random(3), reward=2.)
+    storage_ptr = buffer.data['state'].data_ptr()
+
+    # Act
+    buffer.clear()
+    buffer.add(state=np.random.random(3), reward=3.)
+
+    # Assert
+    assert len(buffer) == 1
+    assert not buffer.full
+    assert buffer.data['state'].data_ptr() == storage_ptr
+    assert buffer.get()['reward'].view(-1).tolist() == [3.]
+
+
+def test_rollout_buffer_dtypes():
+    # Assign
+    buffer = RolloutBuffer(2, dtypes={'action': torch.int64})
+
+    # Act
+    buffer.add(state=np.random.random(3), action=1, reward=1., value=np.float64(0.5), done=False)
+
+    # Assert
+    data = buffer.get()
+    assert data['state'].dtype == torch.float32
+    assert data['reward'].dtype == torch.float32
+    assert data['value'].dtype == torch.float32
+    assert data['action'].dtype == torch.int64
+    assert data['done'].dtype == torch.bool
+
+
+def test_replay_buffer_snapshot_shares_experiences():
+    # Assign
+    buffer = ReplayBuffer(batch_size=2, buffer_size=3)
+    for idx in range(3):
+        buffer.add(state=np.full(2, idx), reward=idx)
+
+    # Act
+    snapshot = buffer.snapshot()
+    buffer.add(state=np.full(2, 3), reward=3)
+
+    # Assert
+    assert [exp.reward for exp in snapshot.exp] == [0, 1, 2]
+    assert [exp.reward for exp in buffer.exp] == [1, 2, 3]
+    assert snapshot.exp.maxlen == 3
+    assert snapshot.exp[1] is buffer.exp[0]
+
+
+def test_per_buffer_snapshot_keeps_priorities():
+    # Assign
+    buffer = PERBuffer(batch_size=1, buffer_size=4, alpha=1)
+    buffer.add(reward=1, priority=1)
+
+    # Act
+    snapshot = buffer.snapshot()
+    buffer.add(reward=2, priority=3)
+    buffer.priority_update([0], [10])
+
+    # Assert
+    assert len(snapshot) == 1
+    assert snapshot.tree[0] == pytest.approx(1.05)
+    assert snapshot.tree.data[0] is buffer.tree.data[0]
@@ -0,0 +1,144 @@
+import json
+import os
+import pytest
+import torch
+import torch.nn as nn
+
+from ai_traineree.agents.dqn import DQNAgent
+from ai_traineree.checkpointer import AsyncCheckpointer, atomic_save, cpu_snapshot
+from ai_traineree.env_runner import EnvRunner
+from ai_traineree.manifest import CheckpointManifest
+
+
+def test_cpu_snapshot_copies_state_dict():
+    # Assign
+    module = nn.Linear(3, 2)
+    state_dict = module.state_dict()
+
+    # Act
+    snapshot = cpu_snapshot(state_dict)
+    with torch.no_grad():
+        module.weight.add_(1)
+
+    # Assert
+    assert type(snapshot) is type(state_dict)
+    assert snapshot._metadata == state_dict._metadata
+    assert not torch.equal(snapshot['weight'], module.weight)
+    nn.Linear(3, 2).load_state_dict(snapshot)
+
+
+def test_atomic_save_leaves_no_temporary_files(tmp_path):
+    # Assign
+    agent_path, state_path = str(tmp_path / "a" / "state.agent"), str(tmp_path / "a" / "state.json")
+
+    # Act
+    atomic_save({'weight': torch.ones(2)}, agent_path)
+    atomic_save({'episode': 2}, state_path)
+
+    # Assert
+    assert sorted(os.listdir(tmp_path / "a")) == ["state.agent", "state.json"]
+    assert torch.equal(torch.load(agent_path)['weight'], torch.ones(2))
+    with open(state_path) as f:
+        assert json.load(f) == {'episode': 2}
+
+
+def test_async_checkpointer_writes_snapshot(tmp_path):
+    # Assign
+    path = str(tmp_path / "state.agent")
+    value = torch.zeros(3)
+    checkpointer = AsyncCheckpointer()
+
+    # Act
+    checkpointer.save({path: {'value': value}})
+    value += 1
+    checkpointer.close()
+
+    # Assert
+    assert torch.equal(torch.load(path)['value'], torch.zeros(3))
+
+
+def test_async_checkpointer_retention(tmp_path):
+    # Assign
+    checkpointer = AsyncCheckpointer(keep_last=2, keep_best=1)
+    scores = [5, 1, 9, 2, 3, 4]
+
+    # Act
+    for (episode, score) in enumerate(scores):
+        checkpointer.save({str(tmp_path / f"e{episode}.json"): {'score': score}}, score=score)
+    checkpointer.close()
+
+    # Assert
+    assert sorted(os.listdir(tmp_path)) == ["e2.json", "e4.json", "e5.json"]
+    assert [score for (score, _) in checkpointer.checkpoints] == [9, 3, 4]
+
+
+def test_async_checkpointer_raises_write_errors(tmp_path):
+    # Assign
+    checkpointer = AsyncCheckpointer()
+    checkpointer.save({str(tmp_path / "state.agent"): {'lambda': lambda: None}})
+
+    # Act & Assert
+    with pytest.raises(RuntimeError):
+        checkpointer.flush()
+    checkpointer.close()
+
+
+def test_env_runner_with_checkpointer(fix_counting_task, tmp_path):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8))
+    checkpointer = AsyncCheckpointer(keep_last=2)
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=10, checkpointer=checkpointer)
+    env_runner.state_dir = str(tmp_path)
+
+    # Act
+    env_runner.run(reward_goal=1e9, max_episodes=5, log_every=10, checkpoint_every=1, force_new=True)
+
+    # Assert
+    name = env_runner.model_path
+    expected = [f"{name}_e{episode}.{ext}" for episode in (4, 5) for ext in ("agent", "json")] + [f"{name}.manifest.jsonl"]
+    assert sorted(os.listdir(tmp_path)) == sorted(expected)
+
+    env_runner.load_state(name)
+    assert env_runner.episode == 5
+    checkpointer.close()
+
+
+def test_env_runner_checkpointer_prunes_resumed_run(fix_counting_task, tmp_path):
+    # Assign
+    def make_runner(checkpointer):
+        env_runner = EnvRunner(fix_counting_task(), DQNAgent(2, 2, hidden_layers=(8, 8)), max_iterations=10, checkpointer=checkpointer)
+        env_runner.state_dir = str(tmp_path)
+        return env_runner
+
+    first_checkpointer = AsyncCheckpointer(keep_last=2)
+    make_runner(first_checkpointer).run(reward_goal=1e9, max_episodes=4, log_every=10, checkpoint_every=1, force_new=True)
+    first_checkpointer.close()
+    checkpointer = AsyncCheckpointer(keep_last=2)
+    env_runner = make_runner(checkpointer)
+
+    # Act
+    env_runner.run(reward_goal=1e9, max_episodes=7, log_every=10, checkpoint_every=1)
+    checkpointer.close()
+
+    # Assert
+    name = env_runner.model_path
+    assert env_runner.episode == 7
+    expected = [f"{name}_e{episode}.{ext}" for episode in (6, 7) for ext in ("agent", "json")] + [f"{name}.manifest.jsonl"]
+    assert sorted(os.listdir(tmp_path)) == sorted(expected)
+
+
+def test_async_checkpointer_tracks_manifest(tmp_path):
+    # Assign
+    manifest = CheckpointManifest(str(tmp_path / "run.manifest.jsonl"))
+    for episode in range(3):
+        path = str(tmp_path / f"e{episode}.json")
+        atomic_save({'episode': episode}, path)
+        manifest.append(f"e{episode}", {'state': path}, average_score=float(episode))
+
+    # Act
+    checkpointer = AsyncCheckpointer(keep_last=2, manifest_path=manifest.path)
+    checkpointer.save({str(tmp_path / "e3.json"): {'episode': 3}}, score=3.)
+    checkpointer.close()
+
+    # Assert
+    assert sorted(os.listdir(tmp_path)) == ["e2.json", "e3.json", "run.manifest.jsonl"]
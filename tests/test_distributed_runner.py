@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+import torch
+
+from ai_traineree.agents.dqn import DQNAgent
+from ai_traineree.distributed_runner import DistributedRunner
+from functools import partial
+
+
+def make_runner(task_cls, agent_fn, **kwargs):
+    return DistributedRunner(task_cls, agent_fn, num_actors=2, start_method="fork", send_every=10, **kwargs)
+
+
+def test_distributed_runner_learns_from_actors(fix_counting_task):
+    # Assign
+    agent_fn = partial(DQNAgent, 2, 2, hidden_layers=(8, 8), batch_size=16)
+    runner = make_runner(fix_counting_task, agent_fn, publish_every=2)
+
+    # Act
+    scores = runner.run(max_steps=200)
+
+    # Assert
+    assert runner.total_steps >= 200
+    assert runner.agent.iteration == runner.total_steps
+    assert len(runner.agent.buffer) == runner.total_steps
+    assert runner.shared_weights.version > 2
+    assert len(scores) > 0
+
+
+def test_distributed_runner_publish_weights(fix_counting_task):
+    # Assign
+    runner = make_runner(fix_counting_task, partial(DQNAgent, 2, 2, hidden_layers=(8, 8)))
+    version = runner.shared_weights.version
+    with torch.no_grad():
+        for param in runner.agent.net.parameters():
+            param.fill_(0.5)
+
+    # Act
+    runner.publish_weights()
+
+    # Assert
+    assert runner.shared_weights.version == version + 1
+    assert torch.all(runner.shared_weights.slots[(version + 1) % 2] == 0.5)
+
+
+def test_distributed_runner_rejects_n_steps(fix_counting_task):
+    with pytest.raises(ValueError):
+        make_runner(fix_counting_task, partial(DQNAgent, 2, 2, n_steps=3))
+
+
+def test_dqn_compute_priorities():
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8))
+    states = np.random.random((5, 2)).astype(np.float32)
+
+    # Act
+    priorities = agent.compute_priorities(states, [0, 1, 0, 1, 0], [1.]*5, states, [False]*5)
+    agent.step_batch(states, [0, 1, 0, 1, 0], [1.]*5, states, [False]*5, priorities=priorities)
+
+    # Assert
+    assert priorities.shape == (5,)
+    assert np.all(priorities > 0)
+    assert len(agent.buffer) == 5
@@ -0,0 +1,102 @@
+import mock
+import time
+import torch
+
+from ai_traineree.agents.dqn import DQNAgent
+from ai_traineree.env_runner import EnvRunner
+from ai_traineree.evaluator import Evaluator, aggregate
+from functools import partial
+
+AGENT_FN = partial(DQNAgent, 2, 2, hidden_layers=(8, 8))
+
+
+def always_up(agent):
+    """Sets the agent's network so that it always picks action 1, i.e. gets 5 points in 5 steps of the counting task."""
+    with torch.no_grad():
+        for param in agent.net.parameters():
+            param.zero_()
+        list(agent.net.parameters())[-1].copy_(torch.tensor([0., 1.]))
+    return agent
+
+
+def make_evaluator(task_cls, **kwargs):
+    return Evaluator(task_cls, AGENT_FN, num_workers=2, max_iterations=20, start_method="fork", **kwargs)
+
+
+def test_aggregate():
+    # Act
+    stats = aggregate([1., 2., 6.], [10, 20, 30])
+
+    # Assert
+    assert stats == {
+        'mean_score': 3., 'std_score': stats['std_score'], 'min_score': 1., 'median_score': 2., 'max_score': 6.,
+        'mean_iterations': 20.,
+    }
+    assert abs(stats['std_score'] - 2.1602) < 1e-4
+
+
+def test_evaluator_uses_agent_snapshot(fix_counting_task):
+    # Assign
+    agent = always_up(AGENT_FN())
+
+    # Act
+    with make_evaluator(fix_counting_task, num_episodes=5) as evaluator:
+        result = evaluator.evaluate(agent, episode=3)
+
+    # Assert
+    assert result['episode'] == 3
+    assert result['num_episodes'] == 5
+    assert result['scores'] == [5.] * 5
+    assert result['mean_score'] == 5. and result['mean_iterations'] == 5.
+
+
+def test_evaluator_submit_and_poll(fix_counting_task):
+    # Assign
+    agent = always_up(AGENT_FN())
+    evaluator = make_evaluator(fix_counting_task, num_episodes=4, max_pending=1)
+
+    # Act
+    assert evaluator.submit(agent, episode=1)
+    assert not evaluator.submit(agent, episode=2)
+    results = []
+    for _ in range(100):
+        results += evaluator.poll()
+        if results:
+            break
+        time.sleep(0.05)
+    evaluator.close()
+
+    # Assert
+    assert [result['episode'] for result in results] == [1]
+    assert results[0]['scores'] == [5.] * 4
+
+
+def test_env_runner_evaluates_in_background(fix_counting_task):
+    # Assign
+    evaluator = make_evaluator(fix_counting_task, num_episodes=2, max_pending=10)
+    env_runner = EnvRunner(fix_counting_task(), AGENT_FN(), max_iterations=10, evaluator=evaluator)
+
+    # Act
+    env_runner.run(reward_goal=1e9, max_episodes=4, log_every=10, evaluate_every=2, force_new=True)
+    evaluator.close()
+
+    # Assert
+    assert [result['episode'] for result in env_runner.eval_results] == [2, 4]
+    assert all(result['num_episodes'] == 2 for result in env_runner.eval_results)
+
+
+def test_env_runner_evaluates_acting_copy_with_background_learning(fix_counting_task):
+    # Assign
+    evaluator = mock.Mock()
+    evaluator.poll.return_value = []
+    evaluator.wait.return_value = []
+    agent = AGENT_FN()
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=10, evaluator=evaluator, background_learning=True)
+
+    # Act
+    env_runner.run(reward_goal=1e9, max_episodes=2, log_every=10, evaluate_every=1, force_new=True)
+
+    # Assert
+    submitted = [call.args[0] for call in evaluator.submit.call_args_list]
+    assert len(submitted) == 2
+    assert all(submitted_agent is not agent and submitted_agent.net is not agent.net for submitted_agent in submitted)
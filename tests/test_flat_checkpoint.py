@@ -0,0 +1,114 @@
+import pytest
+import torch
+
+from ai_traineree.agents.ddpg import DDPGAgent
+from ai_traineree.flat_checkpoint import is_flat, load_checkpoint, load_flat, load_modules, read_header, save_flat
+
+
+def test_flat_checkpoint_round_trip(tmp_path):
+    # Assign
+    path = str(tmp_path / "state.flat")
+    state = {
+        'net': {'weight': torch.rand(3, 5), 'bias': torch.rand(3).double(), 'steps': torch.tensor(7)},
+        'mask': torch.tensor([True, False]),
+        'empty': torch.zeros(0, 2),
+    }
+
+    # Act
+    save_flat(state, path, metadata={'episode': 3})
+    loaded = load_flat(path)
+
+    # Assert
+    assert is_flat(path)
+    assert read_header(path)['metadata'] == {'episode': 3}
+    for (name, value) in state['net'].items():
+        assert loaded['net'][name].dtype == value.dtype
+        assert torch.equal(loaded['net'][name], value)
+    assert torch.equal(loaded['mask'], state['mask'])
+    assert loaded['empty'].shape == (0, 2)
+
+
+def test_load_flat_is_copy_on_write(tmp_path):
+    # Assign
+    path = str(tmp_path / "state.flat")
+    save_flat({'weight': torch.zeros(4)}, path)
+
+    # Act
+    load_flat(path)['weight'] += 1
+
+    # Assert
+    assert torch.equal(load_flat(path)['weight'], torch.zeros(4))
+
+
+def test_load_flat_partial(tmp_path):
+    # Assign
+    path = str(tmp_path / "state.flat")
+    save_flat({'actor': {'w': torch.ones(2)}, 'critic': {'w': torch.zeros(2)}}, path)
+
+    # Act
+    loaded = load_flat(path, keys=('actor',))
+
+    # Assert
+    assert list(loaded) == ['actor']
+
+
+def test_save_flat_rejects_non_tensors(tmp_path):
+    with pytest.raises(TypeError):
+        save_flat({'net': {'steps': 1}}, str(tmp_path / "state.flat"))
+
+
+@pytest.mark.parametrize("flat", [True, False])
+def test_agent_loads_either_format(tmp_path, flat):
+    # Assign
+    path = str(tmp_path / "agent.state")
+    agent, other_agent = DDPGAgent(4, 2), DDPGAgent(4, 2)
+    if flat:
+        save_flat(agent.get_state(), path)
+    else:
+        agent.save_state(path)
+
+    # Act
+    other_agent.load_state(path)
+    state = load_checkpoint(path, keys=('actor',))
+
+    # Assert
+    assert list(state) == ['actor']
+    for (param, other_param) in zip(agent.critic.parameters(), other_agent.critic.parameters()):
+        assert torch.equal(param, other_param)
+
+
+def test_load_modules_actor_only(tmp_path):
+    # Assign
+    path = str(tmp_path / "agent.flat")
+    agent, other_agent = DDPGAgent(4, 2), DDPGAgent(4, 2)
+    save_flat(agent.get_state(), path)
+
+    # Act
+    load_modules(other_agent, path, ('actor',))
+
+    # Assert
+    for (param, other_param) in zip(agent.actor.parameters(), other_agent.actor.parameters()):
+        assert torch.equal(param, other_param)
+    assert not all(torch.equal(p, o) for (p, o) in zip(agent.critic.parameters(), other_agent.critic.parameters()))
+    with pytest.raises(KeyError):
+        load_modules(other_agent, path, ('policy',))
+
+
+def test_load_checkpoint_without_mmap_support(tmp_path, monkeypatch):
+    # Assign
+    path = str(tmp_path / "state.agent")
+    torch.save({'actor': {'weight': torch.ones(2)}}, path)
+    torch_load = torch.load
+
+    def old_torch_load(*args, **kwargs):
+        if 'mmap' in kwargs:
+            raise TypeError("load() got an unexpected keyword argument 'mmap'")
+        return torch_load(*args, **kwargs)
+
+    monkeypatch.setattr(torch, "load", old_torch_load)
+
+    # Act
+    state = load_checkpoint(path)
+
+    # Assert
+    assert torch.equal(state['actor']['weight'], torch.ones(2))
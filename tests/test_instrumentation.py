@@ -0,0 +1,98 @@
+import mock
+
+from ai_traineree.agents.dqn import DQNAgent
+from ai_traineree.env_runner import EnvRunner
+from ai_traineree.instrumentation import PerfCounters
+
+
+def test_perf_counters_stats():
+    # Assign
+    perf = PerfCounters(window_len=2)
+
+    # Act
+    with mock.patch("time.perf_counter_ns", return_value=0):
+        perf.reset()
+        perf.add(steps=10, updates=5, env=int(4e8), act=int(1e8))
+    with mock.patch("time.perf_counter_ns", return_value=int(1e9)):
+        stats = perf.stats()
+        perf.start_episode()
+    with mock.patch("time.perf_counter_ns", return_value=int(2e9)):
+        perf.add(steps=30)
+        rolling_stats = perf.stats()
+
+    # Assert
+    assert stats['steps_per_sec'] == 10 and stats['updates_per_sec'] == 5
+    assert stats['env_frac'] == 0.4 and stats['act_frac'] == 0.1 and stats['render_frac'] == 0
+    assert rolling_stats['steps_per_sec'] == 30
+    assert rolling_stats['rolling_steps_per_sec'] == 20
+    assert rolling_stats['rolling_updates_per_sec'] == 2.5
+    assert perf.total_steps == 40 and perf.total_updates == 5
+
+
+def test_perf_counters_attach_counts_updates():
+    # Assign
+    perf = PerfCounters()
+    agent = mock.Mock()
+    agent.learn.return_value = None
+
+    # Act
+    perf.attach(agent)
+    agent.learn("batch")
+    agent.learn("batch")
+
+    # Assert
+    assert perf.total_updates == 2
+    assert perf.episode_ns['learn'] > 0
+
+
+def test_env_runner_perf_counters(fix_counting_task):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8), batch_size=8)
+    writer = mock.Mock()
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=20, writer=writer)
+
+    # Act
+    env_runner.run(reward_goal=1e9, max_episodes=6, log_every=3, force_new=True)
+
+    # Assert
+    assert env_runner.perf.total_steps == sum(env_runner.all_iterations)
+    assert env_runner.perf.total_updates > 0
+    assert len(env_runner.perf.window) == 6
+    written = {call[0][0] for call in writer.add_scalar.call_args_list}
+    assert {"perf/steps_per_sec", "perf/rolling_updates_per_sec", "perf/env_frac", "perf/checkpoint_frac"} <= written
+
+
+def test_env_runners_sharing_agent_count_updates_once(fix_counting_task):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8), batch_size=8)
+    learn_calls = []
+    learn = agent.learn
+    agent.learn = lambda *args: learn_calls.append(1) or learn(*args)
+    wrapped_learn = agent.learn
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=20)
+    other_runner = EnvRunner(fix_counting_task(), agent, max_iterations=20)
+
+    # Act
+    env_runner.run(reward_goal=1e9, max_episodes=4, log_every=10, force_new=True)
+    first_run_calls = len(learn_calls)
+    other_runner.run(reward_goal=1e9, max_episodes=4, log_every=10, force_new=True)
+
+    # Assert
+    assert env_runner.perf.total_updates == first_run_calls > 0
+    assert other_runner.perf.total_updates == len(learn_calls) - first_run_calls
+    assert agent.learn is wrapped_learn
+
+
+def test_perf_counters_detach_restores_learn():
+    # Assign
+    perf = PerfCounters()
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8))
+
+    # Act
+    perf.attach(agent)
+    perf.attach(agent)
+    perf.detach()
+
+    # Assert
+    assert 'learn' not in vars(agent)
+    assert agent.learn.__func__ is DQNAgent.learn
@@ -0,0 +1,132 @@
+import logging
+import os
+import pytest
+
+from ai_traineree.agents.dqn import DQNAgent
+from ai_traineree.env_runner import EnvRunner
+from ai_traineree.manifest import CheckpointManifest, file_sha256
+
+
+def write_checkpoint(manifest, tmp_path, episode, average_score):
+    path = str(tmp_path / f"run_e{episode}.json")
+    with open(path, "w") as f:
+        f.write(str(episode))
+    return manifest.append(f"run_e{episode}", {"state": path}, episode=episode, average_score=average_score)
+
+
+def test_manifest_append_and_entries(tmp_path):
+    # Assign
+    manifest = CheckpointManifest(str(tmp_path / "run.manifest.jsonl"))
+
+    # Act
+    entry = write_checkpoint(manifest, tmp_path, 1, 2.)
+
+    # Assert
+    assert manifest.entries() == [entry]
+    assert entry["files"]["state"]["path"] == "run_e1.json"
+    assert entry["files"]["state"]["size"] == 1
+    assert entry["files"]["state"]["sha256"] == file_sha256(str(tmp_path / "run_e1.json"))
+
+
+def test_manifest_select_latest_and_best(tmp_path):
+    # Assign
+    manifest = CheckpointManifest(str(tmp_path / "run.manifest.jsonl"))
+    for (episode, average_score) in [(1, 1.), (2, 5.), (3, 3.)]:
+        write_checkpoint(manifest, tmp_path, episode, average_score)
+
+    # Act & Assert
+    assert manifest.select("latest")["episode"] == 3
+    assert manifest.select("best")["episode"] == 2
+    with pytest.raises(ValueError):
+        manifest.select("first")
+
+
+def test_manifest_skips_removed_checkpoints_and_partial_lines(tmp_path):
+    # Assign
+    manifest = CheckpointManifest(str(tmp_path / "run.manifest.jsonl"))
+    for (episode, average_score) in [(1, 1.), (2, 5.), (3, 3.)]:
+        write_checkpoint(manifest, tmp_path, episode, average_score)
+
+    # Act
+    os.remove(tmp_path / "run_e2.json")
+    with open(manifest.path, "a") as f:
+        f.write('{"name": "run_e4", "epis')
+
+    # Assert
+    assert len(manifest.entries()) == 3
+    assert manifest.select("best")["episode"] == 3
+
+
+def test_manifest_skips_corrupted_checkpoints(tmp_path):
+    # Assign
+    manifest = CheckpointManifest(str(tmp_path / "run.manifest.jsonl"))
+    for (episode, average_score) in [(1, 1.), (2, 5.), (3, 2.)]:
+        write_checkpoint(manifest, tmp_path, episode, average_score)
+
+    # Act
+    with open(tmp_path / "run_e3.json", "w") as f:
+        f.write("truncated")
+    with open(tmp_path / "run_e2.json", "w") as f:
+        f.write("9")  # Same size
+
+    # Assert
+    assert manifest.select("latest")["episode"] == 2
+    assert manifest.select("latest", check_hash=True)["episode"] == 1
+
+
+def test_manifest_select_without_manifest(tmp_path):
+    assert CheckpointManifest(str(tmp_path / "missing.manifest.jsonl")).select() is None
+
+
+def test_env_runner_resumes_from_manifest(fix_counting_task, tmp_path):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8))
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=10)
+    env_runner.state_dir = str(tmp_path)
+    env_runner.run(reward_goal=1e9, max_episodes=4, log_every=10, checkpoint_every=2, force_new=True)
+    entries = CheckpointManifest(env_runner.manifest_path(env_runner.model_path)).entries()
+
+    # Act
+    env_runner.reset()
+    env_runner.load_state(env_runner.model_path, which="latest")
+
+    # Assert
+    assert [entry["episode"] for entry in entries] == [2, 4]
+    assert env_runner.episode == 4
+
+
+def test_env_runner_load_state_without_manifest(fix_counting_task, tmp_path, caplog):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8))
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=10)
+    env_runner.state_dir = str(tmp_path)
+    env_runner.run(reward_goal=1e9, max_episodes=4, log_every=10, checkpoint_every=2, force_new=True)
+    os.remove(env_runner.manifest_path(env_runner.model_path))
+
+    # Act
+    env_runner.reset()
+    with caplog.at_level(logging.WARNING):
+        env_runner.load_state(env_runner.model_path, which="best")
+
+    # Assert
+    assert env_runner.episode == 4
+    assert "looking for the latest state instead" in caplog.text
+
+
+def test_env_runner_load_state_doesnt_scan_with_corrupted_manifest(fix_counting_task, tmp_path, caplog):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8))
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=10)
+    env_runner.state_dir = str(tmp_path)
+    env_runner.run(reward_goal=1e9, max_episodes=2, log_every=10, checkpoint_every=2, force_new=True)
+    with open(tmp_path / f"{env_runner.model_path}_e2.agent", "ab") as f:
+        f.write(b"garbage")
+
+    # Act
+    env_runner.reset()
+    with caplog.at_level(logging.WARNING):
+        env_runner.load_state(env_runner.model_path)
+
+    # Assert
+    assert env_runner.episode == 0
+    assert "Forcing restart" in caplog.text
@@ -0,0 +1,129 @@
+import json
+import mock
+import torch
+
+from ai_traineree.agents.sac import SACAgent
+from ai_traineree.metrics import JSONLBackend, MetricsBackend, MetricsWriter, TensorBoardBackend, read_jsonl
+
+
+class ListBackend(MetricsBackend):
+    def __init__(self):
+        self.batches = []
+
+    def write(self, scalars):
+        self.batches.append(scalars)
+
+
+def test_metrics_writer_flush_writes_batch():
+    # Assign
+    backend = ListBackend()
+    writer = MetricsWriter([backend], flush_secs=60)
+
+    # Act
+    writer.add_scalar("loss", 0.5, 1)
+    writer.add_scalar("loss", torch.tensor(0.25), 2)
+    writer.flush()
+
+    # Assert
+    assert len(backend.batches) == 1
+    assert [(s.tag, s.value, s.step) for s in backend.batches[0]] == [("loss", 0.5, 1), ("loss", 0.25, 2)]
+    assert all(isinstance(s.value, float) for s in backend.batches[0])
+    writer.close()
+
+
+def test_metrics_writer_copies_tensors():
+    # Assign
+    backend = ListBackend()
+    writer = MetricsWriter([backend], flush_secs=60)
+    value = torch.tensor(1.)
+
+    # Act
+    writer.add_scalar("value", value, 0)
+    value += 1
+    writer.close()
+
+    # Assert
+    assert backend.batches[0][0].value == 1.
+
+
+def test_metrics_writer_flushes_in_background_when_queue_full():
+    # Assign
+    backend = ListBackend()
+    writer = MetricsWriter([backend], flush_secs=60, max_queue=3)
+
+    # Act
+    for step in range(3):
+        writer.add_scalar("value", step, step)
+    writer.close()
+
+    # Assert
+    assert sum(len(batch) for batch in backend.batches) == 3
+    assert not writer.worker.thread.is_alive()
+
+
+def test_metrics_writer_tensorboard_backend():
+    # Assign
+    summary_writer = mock.Mock()
+    writer = MetricsWriter([TensorBoardBackend(summary_writer)], flush_secs=60)
+
+    # Act
+    writer.add_scalar("score", 2., 5, walltime=10.)
+    writer.close()
+
+    # Assert
+    summary_writer.add_scalar.assert_called_once_with("score", 2., 5, walltime=10.)
+    summary_writer.close.assert_called_once()
+
+
+def test_jsonl_backend_round_trip(tmp_path):
+    # Assign
+    path = str(tmp_path / "metrics.jsonl")
+    writer = MetricsWriter([JSONLBackend(path)], flush_secs=60)
+
+    # Act
+    writer.add_scalar("loss/actor", 1., 1)
+    writer.add_scalar("loss/critic", 2., 1)
+    writer.flush()
+    writer.add_scalar("loss/actor", 3., 2)
+    writer.close()
+
+    # Assert
+    with open(path) as f:
+        assert len(f.readlines()) == 2
+    columns = read_jsonl(path)
+    assert columns["loss/actor"]["step"] == [1, 2]
+    assert columns["loss/actor"]["value"] == [1., 3.]
+    assert columns["loss/critic"]["value"] == [2.]
+
+
+def test_jsonl_backend_writes_non_finite_as_null(tmp_path):
+    # Assign
+    path = str(tmp_path / "metrics.jsonl")
+    writer = MetricsWriter([JSONLBackend(path)], flush_secs=60)
+
+    # Act
+    writer.add_scalar("loss/actor", float("nan"), 1)
+    writer.add_scalar("loss/actor", torch.tensor(float("inf")), 2)
+    writer.add_scalar("loss/actor", 1., 3)
+    writer.close()
+
+    # Assert
+    with open(path) as f:
+        json.loads(f.readline())  # Strict JSON without NaN or Infinity
+    assert read_jsonl(path)["loss/actor"]["value"] == [None, None, 1.]
+
+
+def test_sac_log_writer_passes_detached_tensors():
+    # Assign
+    agent = SACAgent(4, 2)
+    writer = mock.Mock()
+
+    # Act
+    agent.log_writer(writer, 1)
+
+    # Assert
+    tags = [call.args[0] for call in writer.add_scalar.call_args_list]
+    assert tags == ["loss/actor", "loss/critic", "loss/alpha", "policy/std_0", "policy/std_1"]
+    values = [call.args[1] for call in writer.add_scalar.call_args_list[2:]]
+    assert all(isinstance(value, torch.Tensor) and not value.requires_grad for value in values)
+    assert torch.equal(torch.stack(values[1:]), agent.policy.std.detach())
@@ -0,0 +1,148 @@
+import torch
+import torch.nn as nn
+
+from ai_traineree.networks import ActorBody, BatchedActorBody, CriticBody, DuelingNet, EnsembleCritic, FcNet, QNetwork
+
+
+def test_inference_same_as_act():
+    # Assign
+    state = torch.rand(3, 4)
+    networks = [QNetwork(4, 2, (8, 8)), DuelingNet(4, 2, (8, 8)), ActorBody(4, 2, (8, 8))]
+
+    # Act & Assert
+    for net in networks:
+        assert torch.allclose(net.act(state), net.inference(state))
+        assert net.training
+
+
+def test_inference_mode_dependent_layers():
+    # Assign
+    net = FcNet(4, 2, (8,))
+    net.layers.insert(1, nn.Dropout(p=0.9))
+    state = torch.rand(3, 4)
+
+    # Act
+    out = net.inference(state)
+
+    # Assert
+    assert net._mode_dependent is True
+    assert net.training
+    assert torch.allclose(out, net.act(state))
+
+
+def test_use_flat_storage_keeps_values():
+    # Assign
+    net = ActorBody(4, 2, (8, 8))
+    state = torch.rand(3, 4)
+    expected = net(state).detach()
+
+    # Act
+    net.use_flat_storage()
+
+    # Assert
+    assert net.flat_params is not None and net.flat_grads is not None
+    assert net.flat_params.numel() == sum(p.numel() for p in net.parameters())
+    assert torch.allclose(net(state), expected)
+
+
+def test_use_flat_storage_shares_memory():
+    # Assign
+    net = CriticBody(4, 2, (8, 8)).use_flat_storage()
+    assert net.flat_params is not None and net.flat_grads is not None
+
+    # Act
+    net.flat_params.fill_(0.5)
+    net.zero_grad()
+    net(torch.rand(3, 4), torch.rand(3, 2)).sum().backward()
+
+    # Assert
+    assert all(torch.all(p == 0.5) for p in net.parameters())
+    assert net.flat_grads.abs().sum() > 0
+    assert torch.equal(net.flat_grads, torch.cat([p.grad.view(-1) for p in net.parameters()]))
+
+
+def test_flat_storage_clip_grad_norm():
+    # Assign
+    net = FcNet(4, 2, (8, 8))
+    flat_net = FcNet(4, 2, (8, 8))
+    flat_net.load_state_dict(net.state_dict())
+    flat_net.use_flat_storage()
+    state = torch.rand(5, 4)
+
+    # Act
+    for _net in (net, flat_net):
+        _net.zero_grad()
+        _net(state).pow(2).sum().backward()
+        _net.clip_grad_norm_(1e-3)
+
+    # Assert
+    for (param, flat_param) in zip(net.parameters(), flat_net.parameters()):
+        assert torch.allclose(param.grad, flat_param.grad, atol=1e-7)
+
+
+def test_flat_parameters_roundtrip():
+    # Assign
+    net = QNetwork(4, 2, (8, 8))
+    flat_net = QNetwork(4, 2, (8, 8)).use_flat_storage()
+
+    # Act
+    flat_net.set_flat_parameters(net.get_flat_parameters())
+
+    # Assert
+    assert torch.equal(flat_net.get_flat_parameters(), net.get_flat_parameters())
+    for (param, flat_param) in zip(net.parameters(), flat_net.parameters()):
+        assert torch.equal(param, flat_param)
+
+
+def test_ensemble_critic_members_same_as_critic_body():
+    # Assign
+    num_critics = 4
+    ensemble = EnsembleCritic(5, 2, (8, 6), num_critics=num_critics)
+    critic = CriticBody(5, 2, (8, 6))
+    states, actions = torch.rand(3, 5), torch.rand(3, 2)
+
+    # Act
+    out = ensemble(states, actions)
+
+    # Assert
+    assert out.shape == (num_critics, 3, 1)
+    for member in range(num_critics):
+        with torch.no_grad():
+            for (layer, batched_layer) in zip(critic.layers, ensemble.layers):
+                layer.weight.copy_(batched_layer.weight[member].T)
+                layer.bias.copy_(batched_layer.bias[member, 0])
+        assert torch.allclose(critic(states, actions), out[member], atol=1e-6)
+
+
+def test_ensemble_critic_members_independent():
+    # Assign
+    ensemble = EnsembleCritic(5, 2, (8, 6), num_critics=3)
+    states, actions = torch.rand(3, 5), torch.rand(3, 2)
+
+    # Act
+    ensemble(states, actions)[1].sum().backward()
+
+    # Assert
+    for layer in ensemble.layers:
+        assert torch.all(layer.weight.grad[0] == 0) and torch.all(layer.weight.grad[2] == 0)
+        assert layer.weight.grad[1].abs().sum() > 0
+
+
+def test_batched_actor_body_members_same_as_actor_body():
+    # Assign
+    num_members = 3
+    actors = BatchedActorBody(num_members, 5, 2, (8, 6))
+    actor = ActorBody(5, 2, (8, 6))
+    states = torch.rand(4, 5)
+
+    # Act
+    out = actors(states)
+
+    # Assert
+    assert out.shape == (num_members, 4, 2)
+    for member in range(num_members):
+        with torch.no_grad():
+            for (layer, batched_layer) in zip(actor.layers, actors.layers):
+                layer.weight.copy_(batched_layer.weight[member].T)
+                layer.bias.copy_(batched_layer.bias[member, 0])
+        assert torch.allclose(actor(states), out[member], atol=1e-6)
@@ -0,0 +1,58 @@
+import torch
+
+from ai_traineree.noise import GaussianNoiseBank, OUNoiseBank
+
+
+def test_gaussian_noise_bank_shape_and_stats():
+    # Assign
+    noise = GaussianNoiseBank(3, mu=1., sigma=2., num_envs=4, block_size=100, device="cpu", seed=0)
+
+    # Act
+    samples = torch.stack([noise.sample().clone() for _ in range(1000)])
+
+    # Assert
+    assert samples.shape == (1000, 4, 3)
+    assert abs(samples.mean().item() - 1.) < 0.1
+    assert abs(samples.std().item() - 2.) < 0.1
+
+
+def test_gaussian_noise_bank_no_allocation_per_sample():
+    # Assign
+    noise = GaussianNoiseBank((2,), block_size=10, device="cpu", seed=0)
+    noise.sample()
+
+    # Act
+    samples = [noise.sample() for _ in range(9)]
+
+    # Assert
+    assert all(sample.data_ptr() >= noise.bank.data_ptr() for sample in samples)
+    assert noise.bank.data_ptr() == samples[0].data_ptr() - samples[0].element_size() * 2
+
+
+def test_gaussian_noise_bank_seed():
+    # Assign
+    noise_1 = GaussianNoiseBank(2, block_size=5, device="cpu", seed=123)
+    noise_2 = GaussianNoiseBank(2, block_size=5, device="cpu", seed=123)
+
+    # Act & Assert
+    for _ in range(12):
+        assert torch.equal(noise_1.sample(), noise_2.sample())
+
+
+def test_ou_noise_bank_same_as_sequential():
+    # Assign
+    theta, sigma, block_size = 0.15, 0.2, 7
+    noise = OUNoiseBank(2, theta=theta, sigma=sigma, block_size=block_size, device="cpu", seed=0)
+    generator = torch.Generator().manual_seed(0)
+
+    # Act
+    samples = torch.stack([noise.sample().clone() for _ in range(3*block_size)])
+
+    # Assert
+    x, expected = torch.zeros(2), []
+    for _ in range(3):
+        increments = torch.empty(block_size, 2).normal_(0, sigma, generator=generator)
+        for increment in increments:
+            x = (1 - theta)*x + increment
+            expected.append(x)
+    assert torch.allclose(samples, torch.stack(expected), atol=1e-6)
@@ -0,0 +1,48 @@
+import torch
+from torch.distributions import Independent, Normal, TransformedDistribution
+from torch.distributions.transforms import TanhTransform
+
+from ai_traineree.policies import DiagGaussianPolicy, DiagonalGaussian
+
+
+def test_diagonal_gaussian_same_as_independent_normal():
+    # Assign
+    loc, scale = torch.rand(5, 3), torch.rand(3) + 0.1
+    expected = Independent(Normal(loc, scale), 1)
+    dist = DiagonalGaussian(loc, scale)
+    value = torch.rand(5, 3)
+
+    # Act & Assert
+    assert torch.allclose(dist.log_prob(value), expected.log_prob(value), atol=1e-5)
+    assert torch.allclose(dist.entropy(), expected.entropy(), atol=1e-5)
+    assert dist.rsample().shape == (5, 3)
+    assert dist.sample((2,)).shape == (2, 5, 3)
+
+
+def test_diagonal_gaussian_squashed_log_prob():
+    # Assign
+    loc, scale = torch.rand(5, 3), torch.rand(3) + 0.1
+    expected = TransformedDistribution(Independent(Normal(loc, scale), 1), [TanhTransform()])
+    dist = DiagonalGaussian(loc, scale, squash=True)
+
+    # Act
+    sample = dist.rsample()
+
+    # Assert
+    assert torch.all(sample.abs() < 1)
+    assert torch.allclose(dist.log_prob(sample), expected.log_prob(sample), atol=1e-3)
+    assert torch.allclose(dist.log_prob(sample.clone()), expected.log_prob(sample), atol=1e-3)
+
+
+def test_diag_gaussian_policy_rsample_has_grad():
+    # Assign
+    policy = DiagGaussianPolicy(2)
+    action_mu = torch.rand(4, 2, requires_grad=True)
+
+    # Act
+    dist = policy(action_mu)
+    dist.log_prob(dist.rsample()).sum().backward()
+
+    # Assert
+    assert action_mu.grad is not None
+    assert policy.std.grad is not None
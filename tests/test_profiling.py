@@ -0,0 +1,103 @@
+import mock
+import pytest
+import torch
+
+from ai_traineree.agents.dqn import DQNAgent
+from ai_traineree.env_runner import EnvRunner
+from ai_traineree.networks import ActorBody, CriticBody
+from ai_traineree.profiling import EpisodeProfiler, ModuleTimers
+
+
+def test_module_timers_forward_and_backward():
+    # Assign
+    agent = mock.Mock(spec=[])
+    agent.actor, agent.critic = ActorBody(4, 2, (8, 8)), CriticBody(4, 2, (8, 8))
+    timers = ModuleTimers()
+    states = torch.rand(5, 4)
+
+    # Act
+    timers.attach(agent)
+    agent.critic(states, agent.actor(states)).mean().backward()
+    agent.actor.act(states)
+    stats = timers.stats()
+
+    # Assert
+    assert timers.forward_calls == {"actor": 1, "critic": 1}
+    assert timers.backward_calls == {"actor": 1, "critic": 1}
+    assert set(stats) == {"actor_forward_ms", "actor_backward_ms", "critic_forward_ms", "critic_backward_ms"}
+    assert all(value > 0 for value in stats.values())
+
+
+def test_module_timers_detach():
+    # Assign
+    agent = mock.Mock(spec=[])
+    agent.net = ActorBody(4, 2, (8,))
+    timers = ModuleTimers()
+    timers.attach(agent)
+
+    # Act
+    timers.detach()
+    agent.net(torch.rand(2, 4)).sum().backward()
+
+    # Assert
+    assert timers.stats() == {}
+
+
+def test_episode_profiler_window(tmp_path):
+    # Assign
+    profiler = EpisodeProfiler("cprofile", 2, 3, str(tmp_path / "profile"))
+
+    # Act & Assert
+    profiler.episode_start(1)
+    assert not profiler.active
+    profiler.episode_end(1)
+    profiler.episode_start(2)
+    assert profiler.active
+    profiler.episode_end(2)
+    assert profiler.active
+    profiler.episode_start(3)
+    profiler.episode_end(3)
+    assert not profiler.active
+    assert (tmp_path / "profile.prof").exists()
+
+
+def test_episode_profiler_unknown_kind():
+    with pytest.raises(ValueError):
+        EpisodeProfiler("perf", 1, 1, "profile")
+
+
+def test_env_runner_profiling(fix_counting_task, tmp_path):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8), batch_size=8)
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=20)
+    env_runner.profile_dir = str(tmp_path)
+    perf_stats = []
+    env_runner.info = lambda **kwargs: perf_stats.append(kwargs['perf'])
+
+    # Act
+    env_runner.run(
+        reward_goal=1e9, max_episodes=4, log_every=4, force_new=True,
+        profiler="torch", profile_episodes=(2, 3), module_timing=True,
+    )
+
+    # Assert
+    assert (tmp_path / "Counting_DQN_e2-3.json").exists()
+    assert (tmp_path / "Counting_DQN_e2-3.txt").exists()
+    assert "net_forward_ms" in perf_stats[0] and "net_backward_ms" in perf_stats[0]
+    assert env_runner.module_timers is None
+
+
+def test_env_runner_profiling_resumed_run(fix_counting_task, tmp_path):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8), batch_size=8)
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=10)
+    env_runner.state_dir = str(tmp_path / "states")
+    env_runner.profile_dir = str(tmp_path / "profiles")
+    env_runner.run(reward_goal=1e9, max_episodes=4, log_every=10, checkpoint_every=4, force_new=True)
+
+    # Act
+    env_runner.run(reward_goal=1e9, max_episodes=6, log_every=10, checkpoint_every=4, profiler="cprofile")
+
+    # Assert
+    assert env_runner.episode == 6
+    assert (tmp_path / "profiles" / "Counting_DQN_e5-5.prof").exists()
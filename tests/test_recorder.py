@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from ai_traineree.agents.dqn import DQNAgent
+from ai_traineree.env_runner import EnvRunner
+from ai_traineree.recorder import EpisodeRecorder
+
+
+def frames(num: int):
+    return [np.full((8, 6, 3), idx * 10, dtype=np.uint8) for idx in range(num)]
+
+
+def test_recorder_npz(tmp_path):
+    # Assign
+    path = str(tmp_path / "episode.npz")
+
+    # Act
+    with EpisodeRecorder(path, downscale=2) as recorder:
+        for frame in frames(5):
+            recorder.add(frame)
+
+    # Assert
+    with np.load(path) as data:
+        assert sorted(data.files) == [f"frame_{idx:06d}" for idx in range(5)]
+        assert data["frame_000003"].shape == (4, 3, 3)
+        assert (data["frame_000003"] == 30).all()
+    assert recorder.num_frames == 5
+
+
+def test_recorder_gif(tmp_path):
+    # Assign
+    Image = pytest.importorskip("PIL.Image")
+    path = str(tmp_path / "episode.gif")
+
+    # Act
+    with EpisodeRecorder(path, downscale=1, duration=50) as recorder:
+        for frame in frames(4):
+            recorder.add(frame)
+
+    # Assert
+    with Image.open(path) as gif:
+        assert gif.n_frames == 4
+        assert gif.size == (6, 8)
+        gif.seek(2)
+        assert np.allclose(np.array(gif.convert("RGB")), 20, atol=1)
+
+
+def test_recorder_queue_is_bounded(tmp_path):
+    # Assign
+    recorder = EpisodeRecorder(str(tmp_path / "episode.npz"), queue_size=2)
+
+    # Act
+    for frame in frames(20):
+        recorder.add(frame)
+        assert recorder.worker.queue.qsize() <= 2
+    recorder.close()
+
+    # Assert
+    assert recorder.num_frames == 20
+
+
+def test_recorder_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        EpisodeRecorder(str(tmp_path / "episode.mp4"))
+
+
+def test_env_runner_records_episodes(fix_counting_task, tmp_path, monkeypatch):
+    # Assign
+    monkeypatch.chdir(tmp_path)
+    task = fix_counting_task()
+    task.render = lambda mode=None: np.zeros((8, 8, 3), dtype=np.uint8)
+    env_runner = EnvRunner(task, DQNAgent(2, 2, hidden_layers=(8, 8)), max_iterations=10, recording_format="npz")
+
+    # Act
+    env_runner.run(reward_goal=1e9, max_episodes=4, log_every=10, gif_every_episodes=2, force_new=True)
+
+    # Assert
+    assert sorted(p.name for p in (tmp_path / "gifs").iterdir()) == [f"{env_runner.model_path}_e{e}.npz" for e in (2, 4)]
+    assert env_runner.recorder is None
+    with np.load(tmp_path / "gifs" / f"{env_runner.model_path}_e2.npz") as data:
+        assert len(data.files) == env_runner.all_iterations[1]
@@ -0,0 +1,108 @@
+import pytest
+
+from ai_traineree.agents.dqn import DQNAgent
+from ai_traineree.agents.ppo import PPOAgent
+from ai_traineree.env_runner import EnvRunner
+from ai_traineree.replay_ratio import ReplayRatioScheduler
+
+
+def test_replay_ratio_fractional_ratio():
+    # Assign
+    scheduler = ReplayRatioScheduler(mode="ratio", target_ratio=0.25)
+
+    # Act
+    updates = [scheduler.updates() for _ in range(100)]
+
+    # Assert
+    assert sum(updates) == 25
+    assert max(updates) == 1
+    assert scheduler.total_steps == 100
+
+
+def test_replay_ratio_throughput_balances_times():
+    # Assign
+    scheduler = ReplayRatioScheduler(mode="throughput", target_ratio=2, max_ratio=8)
+    scheduler.record("env", 0.008)
+    scheduler.record("act", 0.002)
+
+    # Act
+    ratio_before_learn = scheduler.ratio
+    scheduler.record("learn", 0.02)
+    ratio_slow_learn = scheduler.ratio
+    scheduler.times["learn"] = 0.0001
+    ratio_fast_learn = scheduler.ratio
+
+    # Assert
+    assert ratio_before_learn == 2
+    assert ratio_slow_learn == pytest.approx(0.5)
+    assert ratio_fast_learn == 8
+
+
+def test_replay_ratio_ema():
+    # Assign
+    scheduler = ReplayRatioScheduler(ema_decay=0.5)
+
+    # Act
+    scheduler.record("env", 1.)
+    scheduler.record("env", 3.)
+
+    # Assert
+    assert scheduler.times["env"] == 2.
+
+
+def test_replay_ratio_invalid_mode():
+    with pytest.raises(ValueError):
+        ReplayRatioScheduler(mode="fastest")
+
+
+def test_env_runner_replay_ratio(fix_counting_task):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8), batch_size=8, update_freq=4, number_updates=3)
+    learn_calls = []
+    learn = agent.learn
+    agent.learn = lambda *args: learn_calls.append(1) or learn(*args)
+    scheduler = ReplayRatioScheduler(mode="ratio", target_ratio=0.5)
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=20, replay_ratio_scheduler=scheduler)
+
+    # Act
+    env_runner.run(reward_goal=1e9, max_episodes=10, log_every=5, force_new=True)
+
+    # Assert
+    steps = sum(env_runner.all_iterations)
+    assert (agent.update_freq, agent.number_updates) == (4, 3)
+    assert scheduler.total_steps == steps
+    assert 0 < len(learn_calls) <= steps // 2
+    assert scheduler.total_updates == len(learn_calls)
+    assert scheduler.times["learn"] is not None and scheduler.times["env"] is not None
+
+
+def test_env_runner_replay_ratio_background_learning(fix_counting_task):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8), batch_size=8, warm_up=30, number_updates=3)
+    learn_calls = []
+    learn = agent.learn
+    agent.learn = lambda *args: learn_calls.append(1) or learn(*args)
+    scheduler = ReplayRatioScheduler(mode="ratio", target_ratio=2)
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=20, replay_ratio_scheduler=scheduler, background_learning=True)
+
+    # Act
+    env_runner.run(reward_goal=1e9, max_episodes=5, log_every=5, force_new=True)
+
+    # Assert
+    steps = sum(env_runner.all_iterations)
+    assert agent.number_updates == 3
+    assert scheduler.total_steps == steps
+    assert len(learn_calls) == 2 * (steps - 29)  # Learns from the `warm_up` iteration on
+    assert scheduler.total_updates == len(learn_calls)
+
+
+def test_env_runner_replay_ratio_rejects_on_policy_agents(fix_counting_task):
+    # Assign
+    agent = PPOAgent(2, 2, hidden_layers=(8, 8))
+    number_updates = agent.number_updates
+
+    # Act & Assert
+    with pytest.raises(ValueError):
+        EnvRunner(fix_counting_task(), agent, max_iterations=10, replay_ratio_scheduler=ReplayRatioScheduler())
+    assert agent.number_updates == number_updates
+    assert not hasattr(agent, 'update_freq')
@@ -0,0 +1,87 @@
+import torch
+import torch.multiprocessing as mp
+
+from ai_traineree.networks import ActorBody, QNetwork
+from ai_traineree.shared_weights import SharedWeights
+
+
+def test_shared_weights_pull_latest_version():
+    # Assign
+    actor, local_actor = ActorBody(4, 2, (8, 8)), ActorBody(4, 2, (8, 8))
+    shared_weights = SharedWeights([actor])
+
+    # Act
+    with torch.no_grad():
+        actor.layers[0].weight.add_(1)
+    version = shared_weights.publish([actor])
+    updated = shared_weights.pull([local_actor])
+    updated_again = shared_weights.pull([local_actor])
+
+    # Assert
+    assert version == shared_weights.version == 2
+    assert updated and not updated_again
+    for (param, local_param) in zip(actor.parameters(), local_actor.parameters()):
+        assert torch.equal(param, local_param)
+
+
+def test_shared_weights_pull_doesnt_alias_shared_memory():
+    # Assign
+    net, local_net = QNetwork(4, 2, (8,)), QNetwork(4, 2, (8,))
+    shared_weights = SharedWeights([net])
+    shared_weights.pull([local_net])
+    weights = [param.clone() for param in local_net.parameters()]
+
+    # Act
+    with torch.no_grad():
+        for param in net.parameters():
+            param.fill_(1)
+    shared_weights.publish([net])
+    shared_weights.publish([net])
+
+    # Assert
+    for (param, weight) in zip(local_net.parameters(), weights):
+        assert torch.equal(param, weight)
+
+
+def test_shared_weights_flat_and_regular_storage_compatible():
+    # Assign
+    actor = ActorBody(4, 2, (8, 8)).use_flat_storage()
+    local_actor = ActorBody(4, 2, (8, 8))
+    shared_weights = SharedWeights([actor])
+
+    # Act
+    shared_weights.pull([local_actor])
+
+    # Assert
+    assert torch.equal(actor.flat_params, torch.cat([p.view(-1) for p in local_actor.parameters()]))
+
+
+def _keep_publishing(shared_weights, actor, num_versions):
+    for value in range(num_versions):
+        with torch.no_grad():
+            for param in actor.parameters():
+                param.fill_(value)
+        shared_weights.publish([actor])
+
+
+def test_shared_weights_no_torn_reads():
+    # Assign
+    actor, local_actor = ActorBody(16, 4, (256, 256)), ActorBody(16, 4, (256, 256))
+    with torch.no_grad():
+        for param in actor.parameters():
+            param.fill_(-1)
+    shared_weights = SharedWeights([actor], max_retries=1)
+    writer = mp.get_context("fork").Process(target=_keep_publishing, args=(shared_weights, actor, 2000))
+
+    # Act
+    writer.start()
+    pulled = []
+    while writer.is_alive():
+        if shared_weights.pull([local_actor]):
+            pulled.append(torch.cat([p.view(-1) for p in local_actor.parameters()]))
+    writer.join()
+
+    # Assert
+    assert len(pulled) > 0
+    for weights in pulled:
+        assert torch.all(weights == weights[0])
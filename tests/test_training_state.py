@@ -0,0 +1,151 @@
+import numpy as np
+import random
+import torch
+
+from ai_traineree.agents.ddpg import DDPGAgent
+from ai_traineree.agents.dqn import DQNAgent
+from ai_traineree.agents.ppo import PPOAgent
+from ai_traineree.agents.sac import SACAgent
+from ai_traineree.checkpointer import cpu_snapshot
+from ai_traineree.env_runner import EnvRunner
+from ai_traineree.noise import OUNoiseBank
+from ai_traineree.training_state import (
+    get_rng_state, get_training_state, load_training_state, save_training_state, set_rng_state, set_training_state,
+)
+
+
+def transitions(num: int, seed: int):
+    rng = np.random.default_rng(seed)
+    return [
+        (rng.random(4, dtype=np.float32), rng.random(2, dtype=np.float32), float(rng.random()), rng.random(4, dtype=np.float32), False)
+        for _ in range(num)
+    ]
+
+
+def train(agent, steps):
+    for (state, _, reward, next_state, done) in steps:
+        action = agent.act(state)
+        agent.step(state, action, reward, next_state, done)
+
+
+def test_rng_state_round_trip():
+    # Assign
+    state = get_rng_state()
+    expected = (random.random(), np.random.rand(), torch.rand(1))
+
+    # Act
+    set_rng_state(state)
+
+    # Assert
+    assert (random.random(), np.random.rand(), torch.rand(1)) == expected
+
+
+def test_training_state_contents():
+    # Assign
+    agent = SACAgent(4, 2, batch_size=8)
+    train(agent, transitions(20, seed=0))
+
+    # Act
+    state = get_training_state(agent, include_buffer=True)
+
+    # Assert
+    assert set(state['agent']) == {'actor', 'double_critic', 'target_double_critic'}
+    assert {'actor_optimizer', 'critic_optimizer', 'policy'} <= set(state['stateful'])
+    assert set(state['tensors']) == {'log_alpha'}
+    assert state['counters'] == {'iteration': 20}
+    assert len(state['buffers']['memory']) == 20
+
+
+def test_ppo_training_state_mid_rollout():
+    # Assign
+    agent = PPOAgent(3, 2, config={"rollout_length": 8})
+    new_agent = PPOAgent(3, 2, config={"rollout_length": 8})
+    for _ in range(3):
+        state = np.random.random(3).astype(np.float32)
+        agent.step(state, agent.act(state), 1., state, False)
+    agent.act(np.zeros(3, dtype=np.float32))
+
+    # Act
+    state = cpu_snapshot(get_training_state(agent, include_buffer=True))
+    set_training_state(new_agent, state)
+
+    # Assert
+    assert new_agent.memory.cursor == 3
+    assert torch.equal(new_agent.memory.get()['logprob'], agent.memory.get()['logprob'])
+    assert torch.equal(new_agent.local_memory_buffer['value'], agent.local_memory_buffer['value'])
+
+
+def test_sac_resumes_bit_for_bit(tmp_path):
+    # Assign
+    path = str(tmp_path / "sac.agent")
+    agent = SACAgent(4, 2, batch_size=8, alpha_lr=1e-3)
+    train(agent, transitions(30, seed=0))
+    save_training_state(agent, path, include_buffer=True)
+    train(agent, transitions(20, seed=1))
+
+    # Act
+    resumed_agent = SACAgent(4, 2, batch_size=8, alpha_lr=1e-3)
+    load_training_state(resumed_agent, path)
+    train(resumed_agent, transitions(20, seed=1))
+
+    # Assert
+    assert resumed_agent.iteration == agent.iteration
+    assert torch.equal(resumed_agent.log_alpha, agent.log_alpha)
+    for (param, resumed_param) in zip(agent.actor.parameters(), resumed_agent.actor.parameters()):
+        assert torch.equal(param, resumed_param)
+    for (param, resumed_param) in zip(agent.double_critic.parameters(), resumed_agent.double_critic.parameters()):
+        assert torch.equal(param, resumed_param)
+
+
+def test_ddpg_noise_bank_state_is_restored(tmp_path):
+    # Assign
+    path = str(tmp_path / "ddpg.agent")
+    agent = DDPGAgent(4, 2, config={"noise_type": "ou_bank"})
+    for _ in range(5):
+        agent.noise.sample()
+    save_training_state(agent, path)
+    expected = agent.noise.sample().clone()
+
+    # Act
+    resumed_agent = DDPGAgent(4, 2, config={"noise_type": "ou_bank"})
+    load_training_state(resumed_agent, path)
+
+    # Assert
+    assert isinstance(agent.noise, OUNoiseBank) and isinstance(resumed_agent.noise, OUNoiseBank)
+    assert 'noise' in get_training_state(agent)['stateful']
+    assert torch.equal(resumed_agent.noise.sample(), expected)
+
+
+def test_load_training_state_of_agent_only_file(tmp_path):
+    # Assign
+    path = str(tmp_path / "ddpg.agent")
+    agent, resumed_agent = DDPGAgent(4, 2), DDPGAgent(4, 2)
+    agent.save_state(path)
+
+    # Act
+    load_training_state(resumed_agent, path)
+
+    # Assert
+    for (param, resumed_param) in zip(agent.actor.parameters(), resumed_agent.actor.parameters()):
+        assert torch.equal(param, resumed_param)
+
+
+def test_env_runner_full_state(fix_counting_task, tmp_path):
+    # Assign
+    agent = DQNAgent(2, 2, hidden_layers=(8, 8), batch_size=8)
+    env_runner = EnvRunner(fix_counting_task(), agent, max_iterations=10, full_state=True, include_buffer=True)
+    env_runner.state_dir = str(tmp_path)
+    env_runner.run(reward_goal=1e9, max_episodes=4, log_every=10, checkpoint_every=4, force_new=True)
+
+    # Act
+    resumed_agent = DQNAgent(2, 2, hidden_layers=(8, 8), batch_size=8)
+    resumed_runner = EnvRunner(fix_counting_task(), resumed_agent, max_iterations=10, full_state=True)
+    resumed_runner.state_dir = str(tmp_path)
+    resumed_runner.reset()
+    resumed_runner.load_state(env_runner.model_path)
+
+    # Assert
+    assert resumed_runner.episode == 4
+    assert resumed_agent.iteration == agent.iteration
+    assert len(resumed_agent.buffer) == len(agent.buffer)
+    assert resumed_agent.optimizer.state_dict() == agent.optimizer.state_dict()
@@ -0,0 +1,56 @@
+import pytest
+
+from ai_traineree.utils import QueueWorker
+
+
+def test_queue_worker_handles_items_in_order():
+    # Assign
+    handled, closed = [], []
+    worker = QueueWorker(handled.append, name="Worker", error_message="Worker has failed", queue_size=2, on_close=lambda: closed.append(True))
+    worker.start()
+
+    # Act
+    for item in range(10):
+        worker.put(item)
+    worker.close()
+
+    # Assert
+    assert handled == list(range(10))
+    assert closed == [True]
+    assert not worker.thread.is_alive()
+
+
+def test_queue_worker_raises_errors_of_thread():
+    # Assign
+    handled, closed = [], []
+
+    def handle(item):
+        if item == 1:
+            raise ValueError("Failed")
+        handled.append(item)
+
+    worker = QueueWorker(handle, name="Worker", error_message="Worker has failed", on_close=lambda: closed.append(True))
+    worker.start()
+    worker.put(1)
+    worker.put(2)
+
+    # Act & Assert
+    with pytest.raises(RuntimeError) as error:
+        worker.join()
+    assert isinstance(error.value.__cause__, ValueError)
+    with pytest.raises(RuntimeError):
+        worker.put(3)
+    worker.close()  # Already raised
+    assert handled == []
+    assert closed == [True]
+
+
+def test_queue_worker_close_raises_unreported_error():
+    # Assign
+    worker = QueueWorker(lambda item: 1/0, name="Worker", error_message="Worker has failed")
+    worker.start()
+    worker.put(1)
+
+    # Act & Assert
+    with pytest.raises(RuntimeError):
+        worker.close()